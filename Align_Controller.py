@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import time
+
+from EDlogger import logger
+
+"""
+File:Align_Controller.py
+
+Description:
+  Closed loop alignment to the nav point on the compass. Each step takes the latest nav offset,
+  runs a PID controller per axis (roll, pitch and yaw) and holds the axis keys for a fraction of
+  the control period in proportion to the wanted turn rate (pulse width modulation of the keys).
+  A key needing the full period stays held into the next step, so large turns are continuous.
+
+  The controller output is the wanted turn rate in deg/s, which is divided by the ship's turn rate
+  (the same rates used by the hold-time alignment) to give the fraction of the period to hold.
+  The gains are per ship, see AlignKp, AlignKi and AlignKd in ship_configs.json.
+"""
+
+# Keys for each axis, for the negative and positive directions
+AXIS_KEYS = {
+    'roll': ('RollLeftButton', 'RollRightButton'),
+    'pitch': ('PitchDownButton', 'PitchUpButton'),
+    'yaw': ('YawLeftButton', 'YawRightButton'),
+}
+
+DEFAULT_KP = 2.5  # deg/s of turn per deg of error
+DEFAULT_KI = 0.0
+DEFAULT_KD = 0.1
+
+
+class PID:
+    def __init__(self, kp: float, ki: float = 0.0, kd: float = 0.0, i_limit: float = 20.0):
+        """ A PID controller.
+        @param kp: Proportional gain.
+        @param ki: Integral gain.
+        @param kd: Derivative gain.
+        @param i_limit: Limit of the integral term, in output units, to stop wind up.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.i_limit = i_limit
+        self._integral = 0.0
+        self._last_error = None
+
+    def reset(self):
+        self._integral = 0.0
+        self._last_error = None
+
+    def update(self, error: float, dt: float) -> float:
+        """ Get the output for the error.
+        @param error: The current error.
+        @param dt: The time since the last update in seconds.
+        @return: The controller output.
+        """
+        derivative = 0.0
+        if self._last_error is not None and dt > 0:
+            derivative = (error - self._last_error) / dt
+        self._last_error = error
+
+        if self.ki:
+            self._integral += error * dt
+            limit = self.i_limit / self.ki
+            self._integral = max(min(self._integral, limit), -limit)
+
+        return self.kp * error + self.ki * self._integral + self.kd * derivative
+
+
+def nav_axis_errors(off, close: float, fine_zone: float) -> dict:
+    """ Get the error of each axis in degrees from the nav offset, positive being roll right, pitch up
+    and yaw right. Outside the fine zone the nav point is rolled to the vertical and pitched to,
+    as yawing is slow. Inside it, pitch and yaw only.
+    @param off: The nav offset from get_nav_offset().
+    @param close: Errors within this (deg) are treated as aligned.
+    @param fine_zone: Within this many degrees of centre, use pitch and yaw only.
+    """
+    errors = {'roll': 0.0, 'pitch': off['pit'], 'yaw': off['yaw']}
+
+    # Roll if the nav point is not directly behind us.
+    can_roll = ((-180 + close) < off['yaw'] < (180 - close) and
+                (-180 + close) < off['pit'] < (180 - close))
+    if can_roll and max(abs(off['pit']), abs(off['yaw'])) > fine_zone:
+        if off['pit'] > 0:
+            # Roll to put the nav point straight up
+            errors['roll'] = off['roll']
+        elif off['yaw'] > 0:
+            # Roll left to put the nav point straight down
+            errors['roll'] = off['roll'] - 180
+        else:
+            # Roll right to put the nav point straight down
+            errors['roll'] = off['roll'] + 180
+        errors['yaw'] = 0.0  # Rolling brings the yaw in
+
+    for axis in errors:
+        if abs(errors[axis]) < close:
+            errors[axis] = 0.0
+    return errors
+
+
+class Align_Controller:
+    def __init__(self, keys, period: float = 0.1):
+        """ Closed loop alignment controller.
+        @param keys: The EDKeys to send the axis keys with.
+        @param period: The control period in seconds, about the vision frame interval.
+        """
+        self.keys = keys
+        self.period = period
+        self.fine_zone = 10.0  # deg
+        self.min_duty = 0.1  # Key presses shorter than this fraction of the period are skipped
+        self.rates = {'roll': 80.0, 'pitch': 33.0, 'yaw': 8.0}
+        self.pids = {axis: PID(DEFAULT_KP, DEFAULT_KI, DEFAULT_KD) for axis in AXIS_KEYS}
+        self._held = set()  # Keys currently held down
+        self._last_step = None
+
+    def set_ship(self, roll_rate: float, pitch_rate: float, yaw_rate: float,
+                 kp: float = DEFAULT_KP, ki: float = DEFAULT_KI, kd: float = DEFAULT_KD):
+        """ Set the ship's turn rates (deg/s) and the controller gains. """
+        self.rates = {'roll': roll_rate, 'pitch': pitch_rate, 'yaw': yaw_rate}
+        for pid in self.pids.values():
+            pid.kp, pid.ki, pid.kd = kp, ki, kd
+        self.reset()
+
+    def reset(self):
+        """ Release all keys and reset the controllers. Call when alignment ends or is interrupted. """
+        for key in list(self._held):
+            self.keys.send(key, state=0, delay=False)
+        self._held.clear()
+        for pid in self.pids.values():
+            pid.reset()
+        self._last_step = None
+
+    def step(self, off, close: float) -> bool:
+        """ Run one control period from the nav offset.
+        @param off: The nav offset from get_nav_offset().
+        @param close: The alignment tolerance in degrees.
+        @return: True if aligned within close, with all keys released.
+        """
+        now = time.perf_counter()
+        dt = now - self._last_step if self._last_step is not None else self.period
+        self._last_step = now
+
+        if abs(off['pit']) < close and abs(off['yaw']) < close:
+            self.reset()
+            return True
+
+        errors = nav_axis_errors(off, close, self.fine_zone)
+
+        duties = {}
+        for axis, error in errors.items():
+            if error == 0.0:
+                self.pids[axis].reset()
+                continue
+            rate = self.pids[axis].update(error, dt)
+            duties[axis] = max(min(rate / self.rates[axis], 1.0), -1.0)
+
+        logger.debug(f"align ctrl: err {errors} duty {duties}")
+        self._pulse(duties)
+        return False
+
+    def _pulse(self, duties):
+        """ Hold the keys for their fraction of the period. Keys at full duty stay held. """
+        start = time.perf_counter()
+        wanted = {}  # key -> hold time, None to keep held
+        for axis, duty in duties.items():
+            if abs(duty) < self.min_duty:
+                continue
+            key = AXIS_KEYS[axis][1] if duty > 0 else AXIS_KEYS[axis][0]
+            wanted[key] = None if abs(duty) >= 1.0 else abs(duty) * self.period
+
+        # Release keys no longer wanted, i.e. the axis is aligned or changed direction
+        for key in list(self._held):
+            if key not in wanted:
+                self.keys.send(key, state=0, delay=False)
+                self._held.discard(key)
+        # Time each key from its own press, keys already held from the start of the period
+        release_at = {}
+        for key, hold in wanted.items():
+            pressed = start
+            if key not in self._held:
+                pressed = time.perf_counter()
+                self.keys.send(key, state=1, delay=False)
+                self._held.add(key)
+            if hold is not None:
+                release_at[key] = pressed + hold
+
+        # Release the part period keys at their times
+        for key, at in sorted(release_at.items(), key=lambda ka: ka[1]):
+            remaining = at - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            self.keys.send(key, state=0, delay=False)
+            self._held.discard(key)
+
+        remaining = self.period - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
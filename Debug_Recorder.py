@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+
+import cv2
+
+from EDlogger import logger
+
+"""
+File:Debug_Recorder.py
+
+Description:
+  Saves the intermediate images of an image processing step (i.e. finding the highlighted item for
+  OCR) for debugging, without slowing the step. Off by default. When on, a call is saved if it is
+  every Nth call, or if it failed and on_failure is set. The images are only kept in memory until
+  the outcome is known, and the PNG encoding and writing is done on a background thread. If the
+  writer falls behind, samples are dropped. The oldest files are deleted to keep the folder under
+  max_bytes.
+
+  sample = recorder.sample('highlighted_item')
+  sample.add('1-masked', masked_image)
+  ...
+  sample.finish(success)
+"""
+
+
+class _Null_Sample:
+    """ A sample that keeps nothing, used when the recorder is off. """
+    active = False
+
+    def add(self, step: str, image):
+        pass
+
+    def finish(self, success: bool = True):
+        pass
+
+
+_NULL_SAMPLE = _Null_Sample()
+
+
+class Debug_Sample:
+    active = True
+
+    def __init__(self, recorder: Debug_Recorder, name: str, count: int, sampled: bool):
+        self._recorder = recorder
+        self._name = name
+        self._count = count
+        self._sampled = sampled  # Save whatever the outcome
+        self._images = []
+
+    def add(self, step: str, image):
+        """ Keep an image of a step. The image must not be changed after. """
+        self._images.append((step, image))
+
+    def finish(self, success: bool = True):
+        """ Save the images if this call was sampled or failed. """
+        if self._sampled or (not success and self._recorder.on_failure):
+            self._recorder._queue_write(self._name, self._count, success, self._images)
+        self._images = []
+
+
+class Debug_Recorder:
+    def __init__(self, out_dir: str = 'debug-output/ocr', every_n: int = 0, on_failure: bool = False,
+                 max_bytes: int = 50 * 1024 * 1024, max_queue: int = 8):
+        """
+        @param out_dir: The folder to write the images to.
+        @param every_n: Save every Nth call, 0 for none.
+        @param on_failure: Save the calls that failed.
+        @param max_bytes: The maximum total size of the files in out_dir.
+        @param max_queue: The number of samples waiting to be written before dropping samples.
+        """
+        self.out_dir = out_dir
+        self.every_n = every_n
+        self.on_failure = on_failure
+        self.max_bytes = max_bytes
+        self.dropped = 0
+
+        self._counts = {}  # Calls by name
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._files = None  # [path, size] of the files written, oldest first
+        self._total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.every_n > 0 or self.on_failure
+
+    def sample(self, name: str):
+        """ Start a sample of a call.
+        @param name: The name of the processing step, used in the file names.
+        @return: The sample to add the images to, which does nothing if the recorder is off.
+        """
+        if not self.enabled:
+            return _NULL_SAMPLE
+        with self._lock:
+            count = self._counts.get(name, 0) + 1
+            self._counts[name] = count
+        sampled = self.every_n > 0 and count % self.every_n == 0
+        if not sampled and not self.on_failure:
+            return _NULL_SAMPLE
+        return Debug_Sample(self, name, count, sampled)
+
+    def flush(self, timeout: float = 5.0):
+        """ Wait for the queued samples to be written. """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _queue_write(self, name, count, success, images):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._writer, name="Debug_Recorder", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((name, count, success, images))
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            name, count, success, images = item
+            try:
+                self._write(name, count, success, images)
+            except Exception as e:
+                logger.warning(f"Debug_Recorder error: {e}")
+
+    def _write(self, name, count, success, images):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self._files is None:
+            self._scan()
+        result = 'ok' if success else 'fail'
+        for step, image in images:
+            ok, buf = cv2.imencode('.png', image)
+            if not ok:
+                continue
+            path = os.path.join(self.out_dir, f"{name}_{count:06d}_{result}_{step}.png")
+            with open(path, 'wb') as fp:
+                fp.write(buf.tobytes())
+            self._files.append([path, len(buf)])
+            self._total_bytes += len(buf)
+        self._trim()
+
+    def _scan(self):
+        """ Find the files already in the folder, oldest first. """
+        files = []
+        for entry in os.scandir(self.out_dir):
+            if entry.is_file() and entry.name.endswith('.png'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        files.sort()
+        self._files = [[path, size] for _, path, size in files]
+        self._total_bytes = sum(size for _, size in self._files)
+
+    def _trim(self):
+        """ Delete the oldest files to keep under max_bytes. """
+        while self._files and self._total_bytes > self.max_bytes:
+            path, size = self._files.pop(0)
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import cv2
+
+from EDlogger import logger
+
+"""
+File:Debug_Viewer.py
+
+Description:
+  Shows the cv_view debug images on a separate thread, so the vision checks do not wait on
+  cv2.imshow() and cv2.waitKey(). show() only stores the image and returns. Only the latest image
+  of each window is kept, older ones not yet shown are dropped, so a slow display never builds up
+  a backlog or slows the caller.
+
+  If record_dir is set, the images are written to rolling video files there instead of shown in
+  windows, for use without a display (i.e. on Linux). Each window gets its own files, a new file is
+  started every segment_secs seconds, and only the last keep_segments files are kept.
+"""
+
+
+class Debug_Viewer:
+    def __init__(self, record_dir: str = "", fps: float = 10.0, segment_secs: float = 60.0,
+                 keep_segments: int = 5):
+        """
+        @param record_dir: Write video files to this folder instead of showing windows, empty for windows.
+        @param fps: The maximum display or record rate per window.
+        @param segment_secs: The length of each video file in seconds.
+        @param keep_segments: The number of video files to keep per window.
+        """
+        self.record_dir = record_dir
+        self.fps = fps
+        self.segment_secs = segment_secs
+        self.keep_segments = keep_segments
+        self.dropped = 0  # Number of images replaced before they were shown
+
+        self._cond = threading.Condition()
+        self._pending = {}  # Window name -> (image, x, y)
+        self._close = False
+        self._positions = {}  # Window name -> (x, y) it was moved to
+        self._writers = {}  # Window name -> [VideoWriter, size, start time, segment number]
+        self._thread = None
+        self._run = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._run = True
+        self._thread = threading.Thread(target=self._loop, name="Debug_Viewer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._run = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def show(self, name: str, image, x: int = 0, y: int = 0):
+        """ Queue an image to show. Returns without waiting. The image must not be changed after.
+        @param name: The window name.
+        @param image: The image (BGR or gray).
+        @param x: The window position.
+        @param y: The window position.
+        """
+        if image is None or image.size == 0:
+            return
+        self.start()
+        with self._cond:
+            if name in self._pending:
+                self.dropped += 1
+            self._pending[name] = (image, x, y)
+            self._cond.notify_all()
+
+    def close_windows(self):
+        """ Close all the windows and drop any queued images. """
+        with self._cond:
+            self._pending.clear()
+            self._close = True
+            self._cond.notify_all()
+
+    def _loop(self):
+        period = 1.0 / self.fps if self.fps > 0 else 0.0
+        while self._run:
+            start = time.perf_counter()
+            with self._cond:
+                while self._run and not self._pending and not self._close:
+                    # Keep the windows responsive while there is nothing new to show
+                    if self._positions and not self.record_dir:
+                        break
+                    self._cond.wait()
+                pending = self._pending
+                self._pending = {}
+                close = self._close
+                self._close = False
+            if not self._run:
+                break
+
+            try:
+                if close:
+                    self._close_all()
+                for name, (image, x, y) in pending.items():
+                    if self.record_dir:
+                        self._record(name, image)
+                    else:
+                        self._show(name, image, x, y)
+                if self._positions:
+                    cv2.waitKey(1)
+            except Exception as e:
+                logger.warning(f"Debug_Viewer error: {e}")
+
+            elapsed = time.perf_counter() - start
+            if period > elapsed:
+                time.sleep(period - elapsed)
+
+        self._close_all()
+
+    def _show(self, name, image, x, y):
+        cv2.imshow(name, image)
+        if self._positions.get(name) != (x, y):
+            cv2.moveWindow(name, x, y)
+            self._positions[name] = (x, y)
+
+    def _close_all(self):
+        if self._positions:
+            cv2.destroyAllWindows()
+            cv2.waitKey(1)
+            self._positions.clear()
+        for writer, _, _, _ in self._writers.values():
+            writer.release()
+        self._writers.clear()
+
+    def _record(self, name, image):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        size = (image.shape[1], image.shape[0])
+        now = time.time()
+
+        entry = self._writers.get(name)
+        # Start a new file when the segment is full or the image size changes
+        if entry is None or entry[1] != size or now - entry[2] > self.segment_secs:
+            segment = 0
+            if entry is not None:
+                entry[0].release()
+                segment = entry[3] + 1
+            os.makedirs(self.record_dir, exist_ok=True)
+            path = os.path.join(self.record_dir, f"{name}_{segment:05d}.avi")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), self.fps, size)
+            entry = [writer, size, now, segment]
+            self._writers[name] = entry
+
+            old = os.path.join(self.record_dir, f"{name}_{segment - self.keep_segments:05d}.avi")
+            if os.path.exists(old):
+                os.remove(old)
+
+        entry[0].write(image)
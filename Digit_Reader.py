@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from EDlogger import logger
+
+"""
+File:Digit_Reader.py
+
+Description:
+  Fast reader for fields that only hold digits and a slash, i.e. the commodity quantity '12/200'.
+  Each character is cut out of the image as a connected blob and matched against glyph templates,
+  which takes well under a millisecond, where the full OCR takes tens of milliseconds or more.
+
+  The templates are calibrated from the game's own font: when the full OCR reads a field with high
+  confidence, learn() stores each character image under the character read. The templates are
+  saved to a file so they carry over between runs. Until every character has been seen, or when a
+  glyph does not match well, read() returns a low confidence and the caller should use the full OCR.
+
+  text, conf = reader.read(image)
+  if conf < reader.min_conf:
+      ... full OCR, then reader.learn(image, text)
+"""
+
+CHARS = '0123456789/'
+GLYPH_SIZE = 16  # Glyphs are scaled to a square of this size
+
+
+def binarize(image):
+    """ Get a binary image of the text, with the text 255 on a 0 background. """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # Text is the minority class, dark on light or light on dark
+    if np.count_nonzero(binary) > binary.size / 2:
+        binary = 255 - binary
+    return binary
+
+
+def segment(binary, min_area: int = 4) -> list[tuple[int, int, int, int]]:
+    """ Find the characters in a binary image of one line of text.
+    @param binary: The image, text 255 on 0.
+    @param min_area: Blobs with fewer pixels are noise.
+    @return: The (x, y, w, h) box of each character, left to right. Blobs overlapping in x (i.e. the
+    parts of a broken glyph) are joined.
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    boxes = sorted(tuple(int(v) for v in stats[i][:4]) for i in range(1, count) if stats[i][4] >= min_area)
+    joined = []
+    for x, y, w, h in boxes:
+        if joined:
+            jx, jy, jw, jh = joined[-1]
+            if x < jx + jw:
+                right = max(jx + jw, x + w)
+                bottom = max(jy + jh, y + h)
+                top = min(jy, y)
+                joined[-1] = (jx, top, right - jx, bottom - top)
+                continue
+        joined.append((x, y, w, h))
+    return joined
+
+
+class Digit_Reader:
+    def __init__(self, path: str = 'configs/digit_glyphs.json', min_conf: float = 0.9, min_margin: float = 0.05,
+                 max_variants: int = 4):
+        """
+        @param path: The file the templates are loaded from and saved to, empty to not save.
+        @param min_conf: The confidence below which a read should not be trusted.
+        @param min_margin: A glyph whose best two characters score closer than this has no confidence.
+        @param max_variants: The number of templates kept for each character.
+        """
+        self.path = path
+        self.min_conf = min_conf
+        self.min_margin = min_margin
+        self.max_variants = max_variants
+        self.enabled = True
+
+        self._templates = {}  # Character -> list of normalized glyph vectors
+        self._matrix = None  # All templates stacked, for one matrix product per read
+        self._labels = []  # The character of each row of _matrix
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def calibrated(self) -> bool:
+        """ All the characters have templates. """
+        return all(c in self._templates for c in CHARS)
+
+    def read(self, image) -> tuple[str, float]:
+        """ Read the digits and slashes in the image. Other small marks (i.e. thousand separators) are skipped.
+        @param image: The image of one line of text, BGR or gray.
+        @return: The text and the confidence, the lowest of the character matches. The confidence is
+        0.0 if there are no templates or no characters.
+        """
+        if self._matrix is None:
+            return '', 0.0
+        glyphs = self._glyphs(binarize(image))
+        if not glyphs:
+            return '', 0.0
+
+        with self._lock:
+            matrix, labels = self._matrix, self._labels
+        scores = np.stack(glyphs) @ matrix.T
+        text = ''
+        conf = 1.0
+        for row in scores:
+            order = np.argsort(row)[::-1]
+            best = labels[order[0]]
+            score = float(row[order[0]])
+            # A close second best of another character is as bad as a poor match
+            others = [float(row[i]) for i in order[1:] if labels[i] != best]
+            if others and score - others[0] < self.min_margin:
+                score = 0.0
+            text += best
+            conf = min(conf, score)
+        return text, max(conf, 0.0)
+
+    def learn(self, image, text: str) -> bool:
+        """ Add the characters of an image whose text is known (i.e. read by the full OCR) as templates.
+        Nothing is learned if the number of characters found does not match the text.
+        @param image: The image of one line of text.
+        @param text: The text of the image. Characters other than digits and slash are ignored.
+        @return: True if a new template was added.
+        """
+        chars = [c for c in text if c in CHARS]
+        glyphs = self._glyphs(binarize(image))
+        if not chars or len(glyphs) != len(chars):
+            return False
+
+        added = False
+        with self._lock:
+            for char, glyph in zip(chars, glyphs):
+                variants = self._templates.setdefault(char, [])
+                # Skip glyphs close to one already kept
+                if any(float(glyph @ t) > 0.97 for t in variants):
+                    continue
+                if len(variants) >= self.max_variants:
+                    variants.pop(0)
+                variants.append(glyph)
+                added = True
+            if added:
+                self._rebuild()
+        if added:
+            logger.debug(f"Digit_Reader learned '{text}', have '{''.join(sorted(self._templates))}'")
+            self.save()
+        return added
+
+    def clear(self):
+        with self._lock:
+            self._templates = {}
+            self._rebuild()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as fp:
+                data = json.load(fp)
+            templates = {}
+            for char, variants in data['glyphs'].items():
+                templates[char] = [np.array(v, dtype=np.float32) for v in variants]
+            with self._lock:
+                self._templates = templates
+                self._rebuild()
+        except Exception as e:
+            logger.warning(f"Digit_Reader could not load '{self.path}': {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {'size': GLYPH_SIZE,
+                    'glyphs': {c: [[round(float(v), 4) for v in t] for t in variants]
+                               for c, variants in self._templates.items()}}
+        try:
+            with open(self.path, 'w') as fp:
+                json.dump(data, fp)
+        except OSError as e:
+            logger.warning(f"Digit_Reader could not save '{self.path}': {e}")
+
+    def _rebuild(self):
+        """ Stack the templates for read(). Call with the lock held. """
+        labels = []
+        rows = []
+        for char, variants in self._templates.items():
+            for t in variants:
+                labels.append(char)
+                rows.append(t)
+        self._labels = labels
+        self._matrix = np.stack(rows) if rows else None
+
+    def _glyphs(self, binary) -> list:
+        """ Cut out the characters and scale each to a zero mean, unit length vector. Marks much
+        shorter than the tallest character (i.e. commas and dots) are skipped. """
+        boxes = segment(binary)
+        if not boxes:
+            return []
+        line_h = max(h for _, _, _, h in boxes)
+
+        glyphs = []
+        for x, y, w, h in boxes:
+            if h < line_h * 0.6:
+                continue
+            # Keep the glyph's shape, centered on a square canvas
+            size = max(h, w)
+            canvas = np.zeros((size, size), dtype=np.uint8)
+            x0 = (size - w) // 2
+            y0 = (size - h) // 2
+            canvas[y0:y0 + h, x0:x0 + w] = binary[y:y + h, x:x + w]
+            small = cv2.resize(canvas, (GLYPH_SIZE, GLYPH_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+            small = small.ravel() - small.mean()
+            norm = np.linalg.norm(small)
+            if norm == 0:
+                continue
+            glyphs.append(small / norm)
+        return glyphs
@@ -327,6 +327,11 @@ class APGui():
         # Send a log entry which will flush out the buffer.
         self.callback('log', 'ED Autopilot loaded successfully.')
 
+        # Load the OCR model in the background now the GUI is up
+        self.update_ocr_state(self.ed_ap.ocr.state)
+        if self.ed_ap.config['OCRWarmUp']:
+            self.ed_ap.ocr.warm_up()
+
     # callback from the EDAP, to configure GUI items
     def callback(self, msg, body=None):
         if msg == 'log':
@@ -420,6 +425,8 @@ class APGui():
             self.update_jumpcount(body)
         elif msg == 'update_ship_cfg':
             self.update_ship_cfg()
+        elif msg == 'ocr_state':
+            self.update_ocr_state(body)
         elif msg == 'update_wing_mining_mission_count':
             self.completed_missions_var.set(str(body))
             self.entries['wing_mining_mission_count'].delete(0, tk.END)
@@ -636,6 +643,9 @@ class APGui():
     def update_jumpcount(self, txt):
         self.jumpcount.configure(text=txt)
 
+    def update_ocr_state(self, state):
+        self.ocr_state.configure(text="OCR: " + state)
+
     def update_statusline(self, txt):
         self.status.configure(text="Status: " + txt)
         self.log_msg(f"Status update: {txt}")
@@ -1709,8 +1719,10 @@ class APGui():
         statusbar.grid(row=4, column=0)
         self.status = ttk.Label(win, text="Status: ", relief=tk.SUNKEN, anchor=tk.W, justify=tk.LEFT, width=29)
         self.jumpcount = ttk.Label(statusbar, text="<info> ", relief=tk.SUNKEN, anchor=tk.W, justify=tk.LEFT, width=40)
+        self.ocr_state = ttk.Label(statusbar, text="OCR: ", relief=tk.SUNKEN, anchor=tk.W, justify=tk.LEFT, width=17)
         self.status.pack(in_=statusbar, side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.jumpcount.pack(in_=statusbar, side=tk.RIGHT, fill=tk.Y, expand=False)
+        self.ocr_state.pack(in_=statusbar, side=tk.RIGHT, fill=tk.Y, expand=False)
 
         return mylist
 
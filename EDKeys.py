@@ -274,7 +274,17 @@ class EDKeys:
         else:
             PressKey(key)
 
-    def send(self, key_binding, hold=None, repeat=1, repeat_delay=None, state=None, fast=False):
+    def send(self, key_binding, hold=None, repeat=1, repeat_delay=None, state=None, fast=False, delay=True):
+        """ Send a key binding.
+        @param key_binding: The binding name, i.e. 'PitchUpButton'.
+        @param hold: The time to hold the key for, when state is None.
+        @param repeat: The number of times to send the key.
+        @param repeat_delay: The delay after each send, instead of the release delay.
+        @param state: None to press and release, 1 to press only, 0 to release only.
+        @param fast: Use short press and release delays.
+        @param delay: False to not sleep after the key is pressed or released, when the caller times
+        the key itself (i.e. pulse width modulated keys).
+        """
         key = self.keys.get(key_binding)
         if key is None:
             logger.warning('SEND=NONE !!!!!!!!')
@@ -310,7 +320,7 @@ class EDKeys:
                 else:
                     sleep(press_delay)
 
-            if 'hold' in key:
+            if delay and 'hold' in key:
                 sleep(0.1)
 
             if state is None or state == 0:
@@ -320,6 +330,8 @@ class EDKeys:
                     sleep(self.key_mod_delay)
                     ReleaseKey(mod)
 
+            if not delay:
+                continue
             if repeat_delay:
                 sleep(repeat_delay)
             else:
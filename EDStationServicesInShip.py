@@ -141,6 +141,14 @@ class EDStationServicesInShip:
                 return int(numbers[0])
         return 0
 
+    def _read_quantity(self, scl_reg_qty) -> int:
+        """ Read the quantity field of the buy/sell panel. """
+        img_qty = self.ocr.capture_region_pct(scl_reg_qty)
+        gray_image = cv2.cvtColor(img_qty, cv2.COLOR_BGR2GRAY)
+        _, processed_img = cv2.threshold(gray_image, 128, 255, cv2.THRESH_BINARY_INV)
+        ocr_text = self.ocr.image_digits_ocr(processed_img)
+        return self._parse_quantity(ocr_text)
+
     def _parse_number_with_ocr_errors(self, s: str) -> int:
         s = s.upper().replace('O', '0').replace('I', '1').replace('L', '1').replace('S', '5').replace('B', '8')
         try:
@@ -190,13 +198,9 @@ class EDStationServicesInShip:
             keys.send('UI_Left', state=1) # Press and hold left
             try:
                 start_time = time()
-                qty_is_one = False
+                qty_is_zero = False
                 while time() - start_time < 4: # 4 second timeout
-                    img_qty = self.ocr.capture_region_pct(scl_reg_qty)
-                    gray_image = cv2.cvtColor(img_qty, cv2.COLOR_BGR2GRAY)
-                    _, processed_img = cv2.threshold(gray_image, 128, 255, cv2.THRESH_BINARY_INV)
-                    ocr_text = self.ocr.image_simple_ocr(processed_img)
-                    current_qty = self._parse_quantity(ocr_text)
+                    current_qty = self._read_quantity(scl_reg_qty)
                     if current_qty == 0:
                         qty_is_zero = True
                         break
@@ -220,11 +224,7 @@ class EDStationServicesInShip:
             return True
 
         # Final verification
-        img_qty = self.ocr.capture_region_pct(scl_reg_qty)
-        gray_image = cv2.cvtColor(img_qty, cv2.COLOR_BGR2GRAY)
-        _, processed_img = cv2.threshold(gray_image, 128, 255, cv2.THRESH_BINARY_INV)
-        ocr_text = self.ocr.image_simple_ocr(processed_img)
-        current_qty = self._parse_quantity(ocr_text)
+        current_qty = self._read_quantity(scl_reg_qty)
 
         if self.ap.debug_overlay:
             self.ap.overlay.overlay_floating_text('commodity_quantity_text', f'Target: {act_qty}, OCR: {current_qty}', abs_rect_qty[0], abs_rect_qty[1] - 25, (0, 255, 0))
@@ -243,11 +243,7 @@ class EDStationServicesInShip:
                     keys.send('UI_Left', repeat=-diff, fast=True)
                 sleep(0.5)
 
-                img_qty = self.ocr.capture_region_pct(scl_reg_qty)
-                gray_image = cv2.cvtColor(img_qty, cv2.COLOR_BGR2GRAY)
-                _, processed_img = cv2.threshold(gray_image, 128, 255, cv2.THRESH_BINARY_INV)
-                ocr_text = self.ocr.image_simple_ocr(processed_img)
-                current_qty = self._parse_quantity(ocr_text)
+                current_qty = self._read_quantity(scl_reg_qty)
 
                 if self.ap.debug_overlay:
                     self.ap.overlay.overlay_floating_text('commodity_quantity_text', f'Target: {act_qty}, OCR: {current_qty}', abs_rect_qty[0], abs_rect_qty[1] - 25, (0, 255, 0))
@@ -741,7 +737,7 @@ class EDStationServicesInShip:
                         commodity_candidate = parts[1].strip().split()[0]
                         
                         # Fuzzy match commodity
-                        matched_commodity = self.ocr.find_best_match_in_list(list(commodities.keys()), commodity_candidate, threshold=0.7)
+                        matched_commodity = self.ocr.find_best_match_in_vocabulary(list(commodities.keys()), commodity_candidate, threshold=0.7)
 
                         if matched_commodity:
                             min_ton, max_ton = commodities[matched_commodity]
@@ -865,8 +861,8 @@ class EDStationServicesInShip:
                         commodity_candidate = parts[1].strip().split()[0]
 
                         # Fuzzy match commodity
-                        matched_commodity = self.ocr.find_best_match_in_list(list(commodities.keys()),
-                                                                            commodity_candidate, threshold=0.7)
+                        matched_commodity = self.ocr.find_best_match_in_vocabulary(list(commodities.keys()),
+                                                                                   commodity_candidate, threshold=0.7)
 
                         if matched_commodity:
                             min_ton, max_ton = commodities[matched_commodity]
@@ -1042,8 +1038,8 @@ class EDStationServicesInShip:
                         commodity_candidate = parts[1].strip().split()[0]
 
                         # Fuzzy match commodity
-                        matched_commodity = self.ocr.find_best_match_in_list(list(commodities.keys()),
-                                                                             commodity_candidate, threshold=0.7)
+                        matched_commodity = self.ocr.find_best_match_in_vocabulary(list(commodities.keys()),
+                                                                                   commodity_candidate, threshold=0.7)
 
                         if matched_commodity:
                             min_ton, max_ton = commodities[matched_commodity]
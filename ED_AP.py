@@ -21,6 +21,15 @@ from DiscordBot import DiscordBot
 import Image_Templates
 import Screen
 import Screen_Regions
+from Screen_Frame import union_rect
+from Template_Calibration import Template_Calibration
+from PerceptionFrame import PerceptionFrame
+from Vision_Worker import Vision_Worker
+from Hazard_Monitor import Hazard_Monitor, INTERDICTED, OCCLUDED
+from Jump_Timing import Jump_Timer
+from Rate_Learner import Rate_Learner
+from Debug_Viewer import Debug_Viewer
+from Align_Controller import Align_Controller, DEFAULT_KP, DEFAULT_KI, DEFAULT_KD
 from EDWayPoint import *
 from EDJournal import *
 from EDKeys import *
@@ -105,6 +114,29 @@ class EDAutopilot:
             "EDMesgEventsPort": 15571,
             "DebugOverlay": False,
             "DisableLogFile": False,
+            "CaptureThreadEnable": False,  # Grab the screen on a background thread for the vision checks
+            "CaptureThreadFPS": 30,        # Maximum capture rate of the background capture thread
+            "MatchTracking": True,         # Search near the last compass/target match before the whole region
+            "TargetPyramidLevel": 0,       # Coarse to fine target matching, 0 = off, 1 = 1/2 scale, 2 = 1/4 scale
+            "X3AdaptiveChannels": True,    # Match the usually best HSV channel first and skip the others if clear
+            "ContinuousAlign": False,      # Compass align with the closed loop controller instead of timed key holds
+            "VisionWorkerEnable": False,   # Measure the compass and target on a background thread during alignment
+            "VisionWorkerRate": 10,        # Maximum measurements per second of the vision worker
+            "HazardCheckMinPeriod": 0.1,   # Interdiction check period and first occlusion check period during waits (s)
+            "HazardCheckMaxPeriod": 0.5,   # Occlusion check period backs off to this while the target is clear (s)
+            "JumpTimingFile": "",          # Write the jump phase timings here after each jump, .json or .csv, empty = off
+            "LearnTurnRates": False,       # Learn the ship's roll/pitch/yaw rates from the compass during nav align
+            "CVViewRecordDir": "",         # Write the CV View images to rolling video files here instead of windows
+            "OCRCacheSize": 256,           # Number of OCR results cached by image, 0 = off
+            "OCRCacheTTL": 30.0,           # Cached OCR results older than this (s) are not used
+            "OCRRecOnlyHighlighted": True, # OCR highlighted items with recognition only, no text detection
+            "OCRBatchSize": 6,             # Number of text lines recognized per OCR model batch
+            "OCRWorkers": 0,               # Run OCR in this many worker processes, 0 = in the AP process
+            "OCRDebugImageEvery": 0,       # Save the highlighted item search images every Nth search, 0 = off
+            "OCRDebugImageOnFailure": False,  # Save the highlighted item search images when no item is found
+            "OCRDebugImageMaxMB": 50,      # Maximum size of the saved search images, oldest deleted first
+            "OCRWarmUp": True,             # Load the OCR model in the background once the GUI is up, else on first use
+            "OCRDigitReader": True,        # Read quantity fields with learned glyph templates, OCR only when unsure
         }
         # NOTE!!! When adding a new config value above, add the same after read_config() to set
         # a default value or an error will occur reading the new value!
@@ -120,6 +152,7 @@ class EDAutopilot:
         self._single_waypoint_system = None
         self._prev_star_system = None
         self.honk_thread = None
+        self.jump_timer = Jump_Timer()
         self._tce_integration = None
 
         # used this to write the self.config table to the json file
@@ -155,6 +188,52 @@ class EDAutopilot:
                 cnf['DebugOverlay'] = False
             if 'DisableLogFile' not in cnf:
                 cnf['DisableLogFile'] = False
+            if 'CaptureThreadEnable' not in cnf:
+                cnf['CaptureThreadEnable'] = False
+            if 'CaptureThreadFPS' not in cnf:
+                cnf['CaptureThreadFPS'] = 30
+            if 'MatchTracking' not in cnf:
+                cnf['MatchTracking'] = True
+            if 'TargetPyramidLevel' not in cnf:
+                cnf['TargetPyramidLevel'] = 0
+            if 'X3AdaptiveChannels' not in cnf:
+                cnf['X3AdaptiveChannels'] = True
+            if 'ContinuousAlign' not in cnf:
+                cnf['ContinuousAlign'] = False
+            if 'VisionWorkerEnable' not in cnf:
+                cnf['VisionWorkerEnable'] = False
+            if 'VisionWorkerRate' not in cnf:
+                cnf['VisionWorkerRate'] = 10
+            if 'HazardCheckMinPeriod' not in cnf:
+                cnf['HazardCheckMinPeriod'] = 0.1
+            if 'HazardCheckMaxPeriod' not in cnf:
+                cnf['HazardCheckMaxPeriod'] = 0.5
+            if 'JumpTimingFile' not in cnf:
+                cnf['JumpTimingFile'] = ""
+            if 'LearnTurnRates' not in cnf:
+                cnf['LearnTurnRates'] = False
+            if 'CVViewRecordDir' not in cnf:
+                cnf['CVViewRecordDir'] = ""
+            if 'OCRCacheSize' not in cnf:
+                cnf['OCRCacheSize'] = 256
+            if 'OCRCacheTTL' not in cnf:
+                cnf['OCRCacheTTL'] = 30.0
+            if 'OCRRecOnlyHighlighted' not in cnf:
+                cnf['OCRRecOnlyHighlighted'] = True
+            if 'OCRBatchSize' not in cnf:
+                cnf['OCRBatchSize'] = 6
+            if 'OCRWorkers' not in cnf:
+                cnf['OCRWorkers'] = 0
+            if 'OCRDebugImageEvery' not in cnf:
+                cnf['OCRDebugImageEvery'] = 0
+            if 'OCRDebugImageOnFailure' not in cnf:
+                cnf['OCRDebugImageOnFailure'] = False
+            if 'OCRDebugImageMaxMB' not in cnf:
+                cnf['OCRDebugImageMaxMB'] = 50
+            if 'OCRWarmUp' not in cnf:
+                cnf['OCRWarmUp'] = True
+            if 'OCRDigitReader' not in cnf:
+                cnf['OCRDigitReader'] = True
             self.config = cnf
             logger.debug("read AP json:"+str(cnf))
         else:
@@ -214,11 +293,35 @@ class EDAutopilot:
         self.scr.scaleX = self.config['TargetScale']
         self.scr.scaleY = self.config['TargetScale']
 
-        self.ocr = OCR(self.scr, self.config['OCRLanguage'], use_gpu=use_gpu_ocr)
+        self.ocr = OCR(self.scr, self.config['OCRLanguage'], use_gpu=use_gpu_ocr,
+                       cache_size=self.config['OCRCacheSize'], cache_ttl=self.config['OCRCacheTTL'],
+                       rec_only=self.config['OCRRecOnlyHighlighted'], rec_batch_size=self.config['OCRBatchSize'],
+                       workers=self.config['OCRWorkers'])
+        self.ocr.debug_recorder.every_n = self.config['OCRDebugImageEvery']
+        self.ocr.debug_recorder.on_failure = self.config['OCRDebugImageOnFailure']
+        self.ocr.debug_recorder.max_bytes = self.config['OCRDebugImageMaxMB'] * 1024 * 1024
+        self.ocr.digit_reader.enabled = self.config['OCRDigitReader']
+        self.ocr.on_state = lambda state: self.ap_ckb('ocr_state', state)
         self.templ = Image_Templates.Image_Templates(self.scr.scaleX, self.scr.scaleY, self.scr.scaleX)
+        self.calibrator = Template_Calibration(self.templ)
         self.scrReg = Screen_Regions.Screen_Regions(self.scr, self.templ)
+        self.scrReg.tracker.enabled = self.config['MatchTracking']
+        self.scrReg.x3_adaptive = self.config['X3AdaptiveChannels']
+        if self.config['TargetPyramidLevel'] > 0:
+            for key in ['target', 'target_occluded']:
+                self.scrReg.pyramid_levels[key] = self.config['TargetPyramidLevel']
+        if self.config['CaptureThreadEnable']:
+            # Only capture the area used by the vision checks, OCR regions are grabbed as needed
+            vision_rect = union_rect([self.scrReg.reg[key]['rect'] for key in
+                                      ['compass', 'target', 'target_occluded', 'sun', 'disengage']])
+            self.scr.start_capture_thread(vision_rect, fps=self.config['CaptureThreadFPS'])
         self.jn = EDJournal(cb)
         self.keys = EDKeys(cb)
+        self.align_ctrl = Align_Controller(self.keys)
+        self.vision_worker = None
+        if self.config['VisionWorkerEnable']:
+            self.vision_worker = Vision_Worker(self, self.scrReg, rate=self.config['VisionWorkerRate'])
+            self.vision_worker.start()
         self.keys.activate_window = self.config['ActivateEliteEachKey']
         self.afk_combat = AFK_Combat(self.keys, self.jn, self.vce)
         self.ap_ckb = cb
@@ -226,6 +329,9 @@ class EDAutopilot:
         self.robigo = Robigo(self)
         self.wing_mining = WingMining(self)
         self.status = StatusParser()
+        self.hazard_monitor = Hazard_Monitor(self, min_period=self.config['HazardCheckMinPeriod'],
+                                             max_period=self.config['HazardCheckMaxPeriod'])
+        self.hazard_monitor.start()
         self.nav_route = NavRouteParser()
         self.ship_control = EDShipControl(self, self.scr, self.keys, cb)
         self.internal_panel = EDInternalStatusPanel(self, self.scr, self.keys, cb)
@@ -256,6 +362,12 @@ class EDAutopilot:
         self.autodock_boost = False
         self.autodock_forward_time = 2
         self.autodock_delay_time = 12
+        # Closed loop alignment gains, see Align_Controller
+        self.align_kp = DEFAULT_KP
+        self.align_ki = DEFAULT_KI
+        self.align_kd = DEFAULT_KD
+        self.rate_learner = Rate_Learner(self.rollrate, self.pitchrate, self.yawrate)
+        self._last_turn = None  # (axis, deg, hold time) of the last timed turn, for rate learning
 
         self.jump_cnt = 0
         self.total_dist_jumped = 0
@@ -281,6 +393,7 @@ class EDAutopilot:
         self.cv_view = self.config['Enable_CV_View']
         self.cv_view_x = 10
         self.cv_view_y = 10
+        self.debug_viewer = Debug_Viewer(record_dir=self.config['CVViewRecordDir'])
 
         #start the engine thread
         self.terminate = False  # terminate used by the thread to exit its loop
@@ -349,6 +462,9 @@ class EDAutopilot:
             self.ship_configs['Ship_Configs'][self.current_ship_type]['AutoDockBoost'] = self.autodock_boost
             self.ship_configs['Ship_Configs'][self.current_ship_type]['AutoDockForwardTime'] = self.autodock_forward_time
             self.ship_configs['Ship_Configs'][self.current_ship_type]['AutoDockDelayTime'] = self.autodock_delay_time
+            self.ship_configs['Ship_Configs'][self.current_ship_type]['AlignKp'] = self.align_kp
+            self.ship_configs['Ship_Configs'][self.current_ship_type]['AlignKi'] = self.align_ki
+            self.ship_configs['Ship_Configs'][self.current_ship_type]['AlignKd'] = self.align_kd
 
             self.write_ship_configs(self.ship_configs)
             logger.debug(f"Saved ship config for: {self.current_ship_type}")
@@ -371,7 +487,7 @@ class EDAutopilot:
         if ship_type in self.ship_configs['Ship_Configs']:
             current_ship_cfg = self.ship_configs['Ship_Configs'][ship_type]
             # Check if the custom config has actual values (not just empty dict)
-            if any(key in current_ship_cfg for key in ['compass_scale', 'RollRate', 'PitchRate', 'YawRate', 'SunPitchUp+Time', 'AutoDockBoost', 'AutoDockForwardTime', 'AutoDockDelayTime']):
+            if any(key in current_ship_cfg for key in ['compass_scale', 'RollRate', 'PitchRate', 'YawRate', 'SunPitchUp+Time', 'AutoDockBoost', 'AutoDockForwardTime', 'AutoDockDelayTime', 'AlignKp', 'AlignKi', 'AlignKd']):
                 # Use custom configuration - this means it's been modified and saved to ship_configs.json
                 self.compass_scale = current_ship_cfg.get('compass_scale', self.scr.scaleX)
                 self.rollrate = current_ship_cfg.get('RollRate', 80.0)
@@ -381,6 +497,9 @@ class EDAutopilot:
                 self.autodock_boost = current_ship_cfg.get('AutoDockBoost', False)
                 self.autodock_forward_time = current_ship_cfg.get('AutoDockForwardTime', 2)
                 self.autodock_delay_time = current_ship_cfg.get('AutoDockDelayTime', 12)
+                self.align_kp = current_ship_cfg.get('AlignKp', DEFAULT_KP)
+                self.align_ki = current_ship_cfg.get('AlignKi', DEFAULT_KI)
+                self.align_kd = current_ship_cfg.get('AlignKd', DEFAULT_KD)
                 logger.info(f"Loaded your custom configuration for {ship_type} from ship_configs.json")
                 return
         
@@ -396,6 +515,9 @@ class EDAutopilot:
             self.autodock_boost = ship_defaults.get('AutoDockBoost', False)
             self.autodock_forward_time = ship_defaults.get('AutoDockForwardTime', 2)
             self.autodock_delay_time = ship_defaults.get('AutoDockDelayTime', 12)
+            self.align_kp = ship_defaults.get('AlignKp', DEFAULT_KP)
+            self.align_ki = ship_defaults.get('AlignKi', DEFAULT_KI)
+            self.align_kd = ship_defaults.get('AlignKd', DEFAULT_KD)
             logger.info(f"Loaded default configuration for {ship_type} from default ship cfg file")
             return
 
@@ -408,6 +530,9 @@ class EDAutopilot:
         self.autodock_boost = False
         self.autodock_forward_time = 2
         self.autodock_delay_time = 12
+        self.align_kp = DEFAULT_KP
+        self.align_ki = DEFAULT_KI
+        self.align_kd = DEFAULT_KD
         logger.info(f"Using hardcoded default configuration for {ship_type}")
         
         # Add empty entry to ship_configs for future customization
@@ -518,68 +643,53 @@ class EDAutopilot:
             # right tic
             cv2.line(img, (int(pt2[0]), int(pt1[1]+half_hgt)), (int(pt2[0]+tic_len), int(pt1[1]+half_hgt)), color, thick)
 
-    def calibrate_region(self, range_low, range_high, range_step, threshold: float, reg_name: str, templ_name: str):
-        """ Find the best scale value in the given range of scales with the passed in threshold
-        @param reg_name:
-        @param range_low:
-        @param range_high:
-        @param range_step:
+    def calibrate_region(self, reg_name: str, templ_name: str, threshold: float = 0.5, frame_count: int = 3):
+        """ Find the best scale value for the template in the region with the passed in threshold.
+        The region is captured once as a short burst, then all the scales are matched in parallel,
+        first over the wide scaling range at 1% increments and then over a small scaling range
+        at 0.1% increments around the best.
+        @param reg_name: The region name i.e. 'compass' or 'target'
+        @param templ_name: The template name i.e. 'compass' or 'target'
         @param threshold: The minimum threshold to match (0.0 - 1.0)
-        @param templ_name: The region name i.i 'compass' or 'target'
-        @return:
+        @param frame_count: The number of frames to capture and average the match over.
+        @return: The Calibration_Result, with scale 0 if nothing matched.
         """
-        scale = 0
-        max_pick = 0
-        i = range_low
-        while i <= range_high:
-            self.scr.scaleX = float(i / 100)
-            self.scr.scaleY = self.scr.scaleX
-
-            # reload the templates with this scale value
-            self.templ.reload_templates(self.scr.scaleX, self.scr.scaleY, self.scr.scaleX)
-
-            # do image matching on the compass and the target
-            image, (minVal, maxVal, minLoc, maxLoc), match = self.scrReg.match_template_in_region_x3(reg_name, templ_name)
-
+        reg_pos = self.scrReg.reg[reg_name]['rect']
+        images = []
+        for i in range(frame_count):
+            frame = self.scrReg.capture_frame([reg_name])
+            images.append(frame.get_region_as(reg_pos, 'HSV'))
+            if i < frame_count - 1:
+                sleep(0.05)
+
+        start = time.perf_counter()
+        result = self.calibrator.calibrate_coarse_fine(images, templ_name, threshold)
+        logger.debug(f"Calibrate {templ_name}: {len(result.curve)} scales in {time.perf_counter() - start:.2f}s, "
+                     f"best {result.max_val:5.4f} at {result.scale}")
+        logger.debug(f"Calibrate {templ_name} curve: " +
+                     ", ".join(f"{sc}:{val:.3f}" for sc, val in result.curve))
+
+        if result.scale != 0:
             border = 10  # border to prevent the box from interfering with future matches
-            reg_pos = self.scrReg.reg[reg_name]['rect']
-            width = self.scrReg.templates.template[templ_name]['width'] + border + border
-            height = self.scrReg.templates.template[templ_name]['height'] + border + border
-            left = reg_pos[0] + maxLoc[0] - border
-            top = reg_pos[1] + maxLoc[1] - border
-
-            if maxVal > threshold and maxVal > max_pick:
-                # Draw box around region
-                self.overlay.overlay_rect(20, (left, top), (left + width, top + height), (0, 255, 0), 2)
-                self.overlay.overlay_floating_text(20, f'Match: {maxVal:5.4f}', left, top - 25, (0, 255, 0))
-            else:
-                # Draw box around region
-                self.overlay.overlay_rect(21, (left, top), (left + width, top + height), (255, 0, 0), 2)
-                self.overlay.overlay_floating_text(21, f'Match: {maxVal:5.4f}', left, top - 25, (255, 0, 0))
-
+            width = result.width + border + border
+            height = result.height + border + border
+            left = reg_pos[0] + result.max_loc[0] - border
+            top = reg_pos[1] + result.max_loc[1] - border
+
+            # Draw box around region
+            self.overlay.overlay_rect(20, (left, top), (left + width, top + height), (0, 255, 0), 2)
+            self.overlay.overlay_floating_text(20, f'Match: {result.max_val:5.4f}', left, top - 25, (0, 255, 0))
             self.overlay.overlay_paint()
 
-            # Check the match percentage
-            if maxVal > threshold:
-                if maxVal > max_pick:
-                    max_pick = maxVal
-                    scale = i
-                    #self.ap_ckb('log', 'Cal: Found match:' + f'{max_pick:5.4f}' + "% with scale:" + f'{self.scr.scaleX:5.4f}')
-
-            # Next range
-            i = i + range_step
+            # Leave the results for the user for a couple of seconds
+            sleep(2)
 
-        # Leave the results for the user for a couple of seconds
-        sleep(2)
-
-        # Clean up screen
-        self.overlay.overlay_remove_rect(20)
-        self.overlay.overlay_remove_floating_text(20)
-        self.overlay.overlay_remove_rect(21)
-        self.overlay.overlay_remove_floating_text(21)
-        self.overlay.overlay_paint()
+            # Clean up screen
+            self.overlay.overlay_remove_rect(20)
+            self.overlay.overlay_remove_floating_text(20)
+            self.overlay.overlay_paint()
 
-        return scale, max_pick
+        return result
 
     def calibrate_target(self):
         """ Routine to find the optimal scaling values for the template images. """
@@ -639,26 +749,11 @@ class EDAutopilot:
 
     def calibrate_target_worker(self):
         """ Calibrate target """
-        range_low = 30
-        range_high = 200
-        range_step = 1
-        scale_max = 0
-        max_val = 0
-
-        # loop through the test twice. Once over the wide scaling range at 1% increments and once over a
-        # small scaling range at 0.1% increments.
         # Find out which scale factor meets the highest threshold value.
-        for i in range(2):
-            threshold = 0.5  # Minimum match is constant. Result will always be the highest match.
-            scale, max_pick = self.calibrate_region(range_low, range_high, range_step, threshold, 'target', 'target')
-            if scale != 0:
-                scale_max = scale
-                max_val = max_pick
-                range_low = scale - 5
-                range_high = scale + 5
-                range_step = 0.1
-            else:
-                break  # no match found with threshold
+        threshold = 0.5  # Minimum match is constant. Result will always be the highest match.
+        result = self.calibrate_region('target', 'target', threshold)
+        scale_max = result.scale
+        max_val = result.max_val
 
         # if we found a scaling factor that meets our criteria, then save it to the resolution.json file
         if max_val != 0:
@@ -675,29 +770,15 @@ class EDAutopilot:
 
         # reload the templates with the new (or previous value)
         self.templ.reload_templates(self.scr.scaleX, self.scr.scaleY, self.compass_scale)
+        self.scrReg.tracker.reset()
 
     def calibrate_compass_worker(self):
         """ Calibrate Compass """
-        range_low = 30
-        range_high = 200
-        range_step = 1
-        scale_max = 0
-        max_val = 0
-
-        # loop through the test twice. Once over the wide scaling range at 1% increments and once over a
-        # small scaling range at 0.1% increments.
         # Find out which scale factor meets the highest threshold value.
-        for i in range(2):
-            threshold = 0.5  # Minimum match is constant. Result will always be the highest match.
-            scale, max_pick = self.calibrate_region(range_low, range_high, range_step, threshold, 'compass','compass')
-            if scale != 0:
-                scale_max = scale
-                max_val = max_pick
-                range_low = scale - 5
-                range_high = scale + 5
-                range_step = 0.1
-            else:
-                break  # no match found with threshold
+        threshold = 0.5  # Minimum match is constant. Result will always be the highest match.
+        result = self.calibrate_region('compass', 'compass', threshold)
+        scale_max = result.scale
+        max_val = result.max_val
 
         # if we found a scaling factor that meets our criteria, then save it to the resolution.json file
         if max_val != 0:
@@ -713,6 +794,7 @@ class EDAutopilot:
 
         # reload the templates with the new (or previous value)
         self.templ.reload_templates(self.scr.scaleX, self.scr.scaleY, self.compass_scale)
+        self.scrReg.tracker.reset()
 
     # Go into FSS, check to see if we have a signal waveform in the Earth, Water or Ammonia zone
     #  if so, announce finding and log the type of world found
@@ -747,9 +829,7 @@ class EDAutopilot:
             #self.draw_match_rect(elw_image_d, maxLoc, (maxLoc[0]+15,maxLoc[1]+15), (255,255,255), 1)
             self.draw_match_rect(elw_image_d, maxLoc1, (maxLoc1[0]+15, maxLoc1[1]+25), (0, 0, 255), 1)
             cv2.putText(elw_image_d, f'{maxVal1:5.2f}> .70', (1, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.30, (255, 255, 255), 1, cv2.LINE_AA)
-            cv2.imshow('fss', elw_image_d)
-            cv2.moveWindow('fss', self.cv_view_x, self.cv_view_y+100)
-            cv2.waitKey(30)
+            self.debug_viewer.show('fss', elw_image_d, self.cv_view_x, self.cv_view_y+100)
 
         logger.info("elw detected:{0:6.2f} ".format(maxVal)+" sig:{0:6.2f}".format(maxVal1))
 
@@ -779,9 +859,14 @@ class EDAutopilot:
 
         return
 
-    def have_destination(self, scr_reg) -> bool:
-        """ Check to see if the compass is on the screen. """
-        icompass_image, (minVal, maxVal, minLoc, maxLoc), match = scr_reg.match_template_in_region_x3('compass', 'compass')
+    def have_destination(self, scr_reg, frame=None, compass_match=None) -> bool:
+        """ Check to see if the compass is on the screen.
+        @param frame: Optional frame from scr_reg.capture_frame() to use instead of grabbing the screen.
+        @param compass_match: Optional result of match_compass() to use instead of matching again.
+        """
+        if compass_match is None:
+            compass_match = self.match_compass(scr_reg, frame)
+        icompass_image, (minVal, maxVal, minLoc, maxLoc), match, origin = compass_match
 
         logger.debug("has_destination:"+str(maxVal))
 
@@ -837,7 +922,15 @@ class EDAutopilot:
         self.jn.ship_state()['interdicted'] = False  # reset flag
         return True
 
-    def get_nav_offset(self, scr_reg):
+    def match_compass(self, scr_reg, frame=None):
+        """ Match the compass in its region, as used by have_destination() and get_nav_offset().
+        @param frame: Optional frame from scr_reg.capture_frame() to use instead of grabbing the screen.
+        @return: The result of scr_reg.match_template_in_region_tracked().
+        """
+        return scr_reg.match_template_in_region_tracked('compass', 'compass', scr_reg.compass_match_thresh,
+                                                        x3=True, frame=frame)
+
+    def get_nav_offset(self, scr_reg, frame=None, compass_match=None):
         """ Determine the x,y offset from center of the compass of the nav point.
          Returns the x,y,z value as x,y in degrees (-90 to 90) and z as 1 or -1.
          {'roll': r, 'pit': p, 'yaw': y}
@@ -845,10 +938,12 @@ class EDAutopilot:
             -180deg (6 o'clock anticlockwise) to
              0deg (12 o'clock) to
              180deg (6 o'clock clockwise)
+         @param frame: Optional frame from scr_reg.capture_frame() to use instead of grabbing the screen.
+         @param compass_match: Optional result of match_compass() to use instead of matching again.
          """
-
-        icompass_image, (minVal, maxVal, minLoc, maxLoc), match = (
-            scr_reg.match_template_in_region_x3('compass', 'compass'))
+        if compass_match is None:
+            compass_match = self.match_compass(scr_reg, frame)
+        icompass_image, (minVal, maxVal, minLoc, maxLoc), match, origin = compass_match
 
         pt = maxLoc
 
@@ -861,12 +956,12 @@ class EDAutopilot:
         # cut out the compass from the region
         pad = 5
         compass_image = icompass_image[abs(pt[1]-pad): pt[1]+c_hgt+pad, abs(pt[0]-pad): pt[0]+c_wid+pad].copy()
-        #compass_image_gray = cv2.cvtColor(compass_image, cv2.COLOR_BGR2GRAY)
-        compass_image_gray =  self.scrReg.equalize(compass_image)
+        # Convert once for both the navpoint and navpoint-behind matches
+        compass_hsv = cv2.cvtColor(compass_image, cv2.COLOR_BGR2HSV)
 
         # find the nav point within the compass box
         navpt_image, (n_minVal, n_maxVal, n_minLoc, n_maxLoc), match = (
-            scr_reg.match_template_in_image_x3(compass_image, 'navpoint'))
+            scr_reg.match_template_in_image_x3(compass_image, 'navpoint', img_hsv=compass_hsv))
         n_pt = n_maxLoc
 
         compass_x_min = pad
@@ -879,7 +974,7 @@ class EDAutopilot:
 
             # find the nav point within the compass box using the -behind template
             navpt_image, (n_minVal, n_maxVal, n_minLoc, n_maxLoc), match = (
-                scr_reg.match_template_in_image_x3(compass_image, 'navpoint-behind'))
+                scr_reg.match_template_in_image_x3(compass_image, 'navpoint-behind', img_hsv=compass_hsv))
             n_pt = n_maxLoc
         else:
             final_z_pct = 1.0  # Ahead
@@ -930,7 +1025,8 @@ class EDAutopilot:
 
         if self.cv_view:
             #icompass_image_d = cv2.cvtColor(compass_image_gray, cv2.COLOR_GRAY2RGB)
-            icompass_image_d = icompass_image
+            # Copy, as the image may be a view into a shared frame
+            icompass_image_d = icompass_image.copy()
             self.draw_match_rect(icompass_image_d, pt, (pt[0]+c_wid, pt[1]+c_hgt), (0, 0, 255), 2)
             #cv2.rectangle(icompass_image_display, pt, (pt[0]+c_wid, pt[1]+c_hgt), (0, 0, 255), 2)
             #self.draw_match_rect(compass_image, n_pt, (n_pt[0] + wid, n_pt[1] + hgt), (255,255,255), 2)
@@ -946,19 +1042,18 @@ class EDAutopilot:
             #cv2.putText(icompass_image_d, f'Result: {result}', (1, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
             cv2.putText(icompass_image_d, f'x: {final_x_pct:5.2f} y: {final_y_pct:5.2f} z: {final_z_pct:5.2f}', (1, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
             cv2.putText(icompass_image_d, f'r: {final_roll_deg:5.2f}deg p: {final_pit_deg:5.2f}deg y: {final_yaw_deg:5.2f}deg', (1, 55), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
-            cv2.imshow('compass', icompass_image_d)
-            cv2.moveWindow('compass', self.cv_view_x - 400, self.cv_view_y + 600)
-            cv2.waitKey(30)
+            self.debug_viewer.show('compass', icompass_image_d, self.cv_view_x - 400, self.cv_view_y + 600)
 
         return result
 
-    def is_destination_occluded(self, scr_reg) -> bool:
+    def is_destination_occluded(self, scr_reg, frame=None) -> bool:
         """ Looks to see if the 'dashed' line of the target is present indicating the target
         is occluded by the planet.
         @param scr_reg: The screen region to check.
+        @param frame: Optional frame from scr_reg.capture_frame() to use instead of grabbing the screen.
         @return: True if target occluded (meets threshold), else False.
         """
-        dst_image, (minVal, maxVal, minLoc, maxLoc), match = scr_reg.match_template_in_region('target_occluded', 'target_occluded', inv_col=False)
+        dst_image, (minVal, maxVal, minLoc, maxLoc), match = scr_reg.match_template_in_region('target_occluded', 'target_occluded', inv_col=False, frame=frame)
 
         pt = maxLoc
 
@@ -976,11 +1071,9 @@ class EDAutopilot:
                 img = cv2.resize(dst_image_d, dim, interpolation=cv2.INTER_AREA)
                 img = cv2.rectangle(img, (0, 0), (1000, 25), (0, 0, 0), -1)
                 cv2.putText(img, f'{maxVal:5.4f} > {scr_reg.target_occluded_thresh:5.2f}', (1, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
-                cv2.imshow('occluded', img)
-                cv2.moveWindow('occluded', self.cv_view_x, self.cv_view_y+650)
+                self.debug_viewer.show('occluded', img, self.cv_view_x, self.cv_view_y+650)
             except Exception as e:
                 print("exception in getdest: "+str(e))
-            cv2.waitKey(30)
 
         if maxVal > scr_reg.target_occluded_thresh:
             logger.debug(f"Target is occluded ({maxVal:5.4f} > {scr_reg.target_occluded_thresh:5.2f})")
@@ -989,10 +1082,13 @@ class EDAutopilot:
             #logger.debug(f"Target is not occluded ({maxVal:5.4f} < {scr_reg.target_occluded_thresh:5.2f})")
             return False
 
-    def get_destination_offset(self, scr_reg):
+    def get_destination_offset(self, scr_reg, frame=None):
         """ Determine how far off we are from the target being in the middle of the screen
-        (in this case the specified region). """
-        dst_image, (minVal, maxVal, minLoc, maxLoc), match = scr_reg.match_template_in_region('target', 'target')
+        (in this case the specified region).
+        @param frame: Optional frame from scr_reg.capture_frame() to use instead of grabbing the screen.
+        """
+        dst_image, (minVal, maxVal, minLoc, maxLoc), match, origin = scr_reg.match_template_in_region_tracked(
+            'target', 'target', scr_reg.target_thresh, frame=frame)
 
         pt = maxLoc
 
@@ -1013,18 +1109,18 @@ class EDAutopilot:
         if self.cv_view:
             dst_image_d = cv2.cvtColor(dst_image, cv2.COLOR_GRAY2RGB)
             try:
-                self.draw_match_rect(dst_image_d, pt, (pt[0]+width, pt[1]+height), (0, 0, 255), 2)
-                dim = (int(destination_width/2), int(destination_height/2))
+                # The image may be only the part of the region searched, starting at origin
+                img_pt = (pt[0] - origin[0], pt[1] - origin[1])
+                self.draw_match_rect(dst_image_d, img_pt, (img_pt[0]+width, img_pt[1]+height), (0, 0, 255), 2)
+                dim = (int(dst_image_d.shape[1]/2), int(dst_image_d.shape[0]/2))
 
                 img = cv2.resize(dst_image_d, dim, interpolation=cv2.INTER_AREA)
                 img = cv2.rectangle(img, (0, 0), (1000, 25), (0, 0, 0), -1)
                 cv2.putText(img, f'{maxVal:5.4f} > {scr_reg.target_thresh:5.2f}', (1, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
-                cv2.imshow('target', img)
+                self.debug_viewer.show('target', img, self.cv_view_x, self.cv_view_y+425)
                 #cv2.imshow('tt', scr_reg.templates.template['target']['image'])
-                cv2.moveWindow('target', self.cv_view_x, self.cv_view_y+425)
             except Exception as e:
                 print("exception in getdest: "+str(e))
-            cv2.waitKey(30)
 
         #print (maxVal)
         # must be > x to have solid hit, otherwise we are facing wrong way (empty circle)
@@ -1035,12 +1131,14 @@ class EDAutopilot:
 
         return result
 
-    def sc_disengage_label_up(self, scr_reg) -> bool:
+    def sc_disengage_label_up(self, scr_reg, frame=None) -> bool:
         """ look for messages like "PRESS [J] TO DISENGAGE" or "SUPERCRUISE OVERCHARGE ACTIVE",
          if in this region then return true.
         The aim of this function is to return that a message is there, and then use OCR to determine
-        what the message is. This will only use the high CPU usage OCR when necessary."""
-        dis_image, (minVal, maxVal, minLoc, maxLoc), match = scr_reg.match_template_in_region('disengage', 'disengage')
+        what the message is. This will only use the high CPU usage OCR when necessary.
+        @param frame: Optional frame from scr_reg.capture_frame() to use instead of grabbing the screen.
+        """
+        dis_image, (minVal, maxVal, minLoc, maxLoc), match = scr_reg.match_template_in_region('disengage', 'disengage', frame=frame)
 
         pt = maxLoc
 
@@ -1059,9 +1157,7 @@ class EDAutopilot:
             self.draw_match_rect(dis_image, pt, (pt[0] + width, pt[1] + height), (0,255,0), 2)
             dis_image = cv2.rectangle(dis_image, (0, 0), (1000, 25), (0, 0, 0), -1)
             cv2.putText(dis_image, f'{maxVal:5.4f} > {scr_reg.disengage_thresh}', (1, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
-            cv2.imshow('sc_disengage_label_up', dis_image)
-            cv2.moveWindow('sc_disengage_label_up', self.cv_view_x-460,self.cv_view_y+575)
-            cv2.waitKey(1)
+            self.debug_viewer.show('sc_disengage_label_up', dis_image, self.cv_view_x-460,self.cv_view_y+575)
 
         if maxVal > scr_reg.disengage_thresh:
             return True
@@ -1083,9 +1179,7 @@ class EDAutopilot:
             self.draw_match_rect(dis_image, pt, (pt[0] + width, pt[1] + height), (0,255,0), 2)
             dis_image = cv2.rectangle(dis_image, (0, 0), (1000, 25), (0, 0, 0), -1)
             cv2.putText(dis_image, f'{maxVal:5.4f} > {scr_reg.disengage_thresh}', (1, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
-            cv2.imshow('disengage', dis_image)
-            cv2.moveWindow('disengage', self.cv_view_x-460,self.cv_view_y+575)
-            cv2.waitKey(1)
+            self.debug_viewer.show('disengage', dis_image, self.cv_view_x-460,self.cv_view_y+575)
 
         #logger.debug("Disenage = "+str(maxVal))
 
@@ -1098,10 +1192,10 @@ class EDAutopilot:
 
     def sc_disengage_active(self, scr_reg) -> bool:
         """ look for the "SUPERCRUISE OVERCHARGE ACTIVE" text using OCR, if in this region then return true. """
-        image = self.scr.get_screen_region(scr_reg.reg['disengage']['rect'])
-        # TODO delete this line when COLOR_RGB2BGR is removed from get_screen()
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        mask = scr_reg.capture_region_filtered(self.scr, 'disengage')
+        # One grab for both the image and the mask
+        frame = scr_reg.capture_frame(['disengage'])
+        image = frame.get_region_as(scr_reg.reg['disengage']['rect'], 'BGR')
+        mask = scr_reg.capture_region_filtered(self.scr, 'disengage', frame=frame)
         masked_image = cv2.bitwise_and(image, image, mask=mask)
         image = masked_image
 
@@ -1124,9 +1218,7 @@ class EDAutopilot:
             image = cv2.rectangle(image, (0, 0), (1000, 30), (0, 0, 0), -1)
             cv2.putText(image, f'Text: {str(ocr_textlist)}', (1, 10), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
             cv2.putText(image, f'Similarity: {sim:5.4f} > {sim_match}', (1, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
-            cv2.imshow('disengage2', image)
-            cv2.moveWindow('disengage2', self.cv_view_x - 460, self.cv_view_y + 650)
-            cv2.waitKey(30)
+            self.debug_viewer.show('disengage2', image, self.cv_view_x - 460, self.cv_view_y + 650)
 
         if sim > sim_match:
             logger.info("'PRESS [] TO DISENGAGE' detected. Disengaging Supercruise")
@@ -1339,6 +1431,10 @@ class EDAutopilot:
 
         self.ap_ckb('log+vce', 'Compass Align')
 
+        if self.config['ContinuousAlign']:
+            self.nav_align_continuous(scr_reg, close)
+            return
+
         # try multiple times to get aligned.  If the sun is shining on console, this it will be hard to match
         # the vehicle should be positioned with the sun below us via the sun_avoid() routine after a jump
         for ii in range(self.config['NavAlignTries']):
@@ -1369,7 +1465,8 @@ class EDAutopilot:
                             # bottom left quad, then roll right
                             self.rotateRight(180 + off['roll'])
                         sleep(1)
-                        off = self.get_nav_offset(scr_reg)
+                        prev_off, off = off, self.get_nav_offset(scr_reg)
+                        self.learn_turn_rate(prev_off, off)
                     else:
                         break
 
@@ -1381,7 +1478,8 @@ class EDAutopilot:
                     else:
                         self.pitchUp(abs(off['pit']))
                     sleep(0.5)
-                    off = self.get_nav_offset(scr_reg)
+                    prev_off, off = off, self.get_nav_offset(scr_reg)
+                    self.learn_turn_rate(prev_off, off)
                 else:
                     break
 
@@ -1393,13 +1491,66 @@ class EDAutopilot:
                     else:
                         self.yawRight(abs(off['yaw']))
                     sleep(0.5)
-                    off = self.get_nav_offset(scr_reg)
+                    prev_off, off = off, self.get_nav_offset(scr_reg)
+                    self.learn_turn_rate(prev_off, off)
                 else:
                     break
 
             sleep(.1)
             logger.debug("final x:"+str(off['x'])+" y:"+str(off['y']))
 
+        self.apply_learned_rates()
+
+    def get_perception(self, scr_reg, disengage=False, last=None, captured_after: float = 0.0) -> PerceptionFrame:
+        """ Get the state of the compass and target. Uses the next sample from the vision worker if
+        running, else grabs the screen now.
+        @param disengage: Check for the supercruise disengage label.
+        @param last: The last PerceptionFrame used, so the same sample is not used twice.
+        @param captured_after: The time (time.time()) the last key was released. A worker sample grabbed
+        before then does not show the move and is not used.
+        @return: The PerceptionFrame.
+        """
+        if (self.vision_worker is not None and scr_reg is self.scrReg and
+                self.vision_worker.is_running()):
+            pf = self.vision_worker.wait_for_new(last.seq if last is not None else 0, timeout=1.0,
+                                                 captured_after=captured_after)
+            if pf is not None:
+                return pf
+            logger.debug("Vision worker timed out, grabbing the screen")
+        return PerceptionFrame.capture(self, scr_reg, disengage=disengage)
+
+    def start_align_ctrl(self):
+        """ Set up the closed loop alignment controller for the current ship. """
+        self.align_ctrl.set_ship(self.rollrate, self.pitchrate, self.yawrate,
+                                 self.align_kp, self.align_ki, self.align_kd)
+
+    def nav_align_continuous(self, scr_reg, close, timeout=30.0) -> bool:
+        """ Use the compass to put the nav point in the middle of the compass, with the closed loop
+        controller re-measuring every control period (see Align_Controller).
+        @param close: The alignment tolerance in degrees.
+        @param timeout: Give up after this many seconds.
+        @return: True if aligned, False if timed out.
+        """
+        self.start_align_ctrl()
+        start = time.time()
+        pf = None
+        try:
+            while time.time() - start < timeout:
+                pf = self.get_perception(scr_reg, last=pf)
+                off = pf.nav_offset
+                if off is None:
+                    # Compass not found
+                    self.align_ctrl.reset()
+                    sleep(0.1)
+                    continue
+                if self.align_ctrl.step(off, close):
+                    logger.debug("final x:"+str(off['x'])+" y:"+str(off['y']))
+                    return True
+            logger.debug('align= continuous align timed out')
+            return False
+        finally:
+            self.align_ctrl.reset()
+
     def rough_nav_align(self, scr_reg):
         """ A rough alignment using the compass. """
         close = 2  # in degrees
@@ -1409,11 +1560,19 @@ class EDAutopilot:
 
         self.ap_ckb('log+vce', 'Rough Compass Align')
 
+        if self.config['ContinuousAlign']:
+            self.nav_align_continuous(scr_reg, close)
+            return
+
+        off = None
+        self._last_turn = None
         for _ in range(10):  # Loop a few times to get closer
-            off = self.get_nav_offset(scr_reg)
+            prev_off, off = off, self.get_nav_offset(scr_reg)
+            if prev_off is not None:
+                self.learn_turn_rate(prev_off, off)  # The yaw of the last loop
 
             if abs(off['yaw']) < close and abs(off['pit']) < close:
-                return  # We are aligned enough
+                break  # We are aligned enough
 
             # Roll
             if ((-180 + close) < off['yaw'] < (180 - close) and
@@ -1428,7 +1587,8 @@ class EDAutopilot:
                     else:
                         self.rotateRight(180 + off['roll'])
                     sleep(1)
-                    off = self.get_nav_offset(scr_reg)
+                    prev_off, off = off, self.get_nav_offset(scr_reg)
+                    self.learn_turn_rate(prev_off, off)
 
             # Pitch
             if abs(off['pit']) > close:
@@ -1437,7 +1597,8 @@ class EDAutopilot:
                 else:
                     self.pitchUp(abs(off['pit']))
                 sleep(0.5)
-                off = self.get_nav_offset(scr_reg)
+                prev_off, off = off, self.get_nav_offset(scr_reg)
+                self.learn_turn_rate(prev_off, off)
 
             # Yaw
             if abs(off['yaw']) > close:
@@ -1449,6 +1610,8 @@ class EDAutopilot:
             
             sleep(1) # Give time for ship to move
 
+        self.apply_learned_rates()
+
     def fsd_target_align(self, scr_reg):
         """ A unified alignment function for FSD jumps.
         """
@@ -1458,85 +1621,117 @@ class EDAutopilot:
         close_enough_for_target_align = 5
         nav_close = 3
         target_close = 6
+        self.start_align_ctrl()
+        pf = None
+        released = 0.0  # Time the last blocking move ended, see get_perception()
+        coarse_off = None  # The nav offset the last coarse move was calculated from, for rate learning
 
-        while True:
-            # Check for interdiction first
-            if self.interdiction_check():
-                self.keys.send('SetSpeed50')
-                self.status.wait_for_flag_on(FlagsSupercruise, timeout=30)
-                continue  # Restart alignment loop
-
-            # Check for hyperspace charging, if so we are done
-            if self.jn.ship_state()['status'] == 'starting_hyperspace':
-                return
+        try:
+            while True:
+                # Check for interdiction first
+                if self.status.get_flag(FlagsBeingInterdicted):
+                    self.align_ctrl.reset()  # Release any keys held by the controller
+                if self.interdiction_check():
+                    self.keys.send('SetSpeed50')
+                    self.status.wait_for_flag_on(FlagsSupercruise, timeout=30)
+                    coarse_off = None
+                    continue  # Restart alignment loop
+
+                # Check for hyperspace charging, if so we are done
+                if self.jn.ship_state()['status'] == 'starting_hyperspace':
+                    self.align_ctrl.reset()
+                    self.apply_learned_rates()
+                    return
 
-            # Check for compass visibility
-            if not self.have_destination(scr_reg):
-                logger.debug("Compass not found, cannot align.")
-                sleep(1)
-                continue
+                # Get sensor data, all from one screen grab
+                pf = self.get_perception(scr_reg, last=pf, captured_after=released)
 
-            # Get sensor data
-            nav_offset = self.get_nav_offset(scr_reg)
-            target_offset = self.get_destination_offset(scr_reg)
-            is_occluded = self.is_destination_occluded(scr_reg)
+                # Check for compass visibility
+                if not pf.compass_found:
+                    logger.debug("Compass not found, cannot align.")
+                    self.align_ctrl.reset()
+                    sleep(1)
+                    continue
 
-            # Check if we are aligned
-            is_aligned_on_compass = abs(nav_offset['yaw']) < nav_close and abs(nav_offset['pit']) < nav_close
-            is_aligned_on_target = target_offset and abs(target_offset['x']) < target_close and abs(
-                target_offset['y']) < target_close
+                nav_offset = pf.nav_offset
+                target_offset = pf.target_offset
+                is_occluded = pf.occluded
+                if coarse_off is not None:
+                    self.learn_turn_rate(coarse_off, nav_offset)
+                    coarse_off = None
+
+                # Check if we are aligned
+                is_aligned_on_compass = abs(nav_offset['yaw']) < nav_close and abs(nav_offset['pit']) < nav_close
+                is_aligned_on_target = target_offset and abs(target_offset['x']) < target_close and abs(
+                    target_offset['y']) < target_close
+
+                use_target_align = target_offset and abs(nav_offset['yaw']) < close_enough_for_target_align and abs(
+                    nav_offset['pit']) < close_enough_for_target_align
+                if (is_aligned_on_compass and (is_aligned_on_target or not target_offset)) or is_occluded or use_target_align:
+                    # Not in coarse alignment, so release any keys held by the controller
+                    self.align_ctrl.reset()
+
+                if is_aligned_on_compass and (is_aligned_on_target or not target_offset):
+                    logger.debug('align=complete')
+                    self.apply_learned_rates()
+                    return  # We are aligned, exit the function
+
+                # Alignment logic
+                if is_occluded:
+                    self.occluded_reposition(scr_reg)
+                elif use_target_align:
+                    # Fine-grained alignment using visual target
+                    # This uses blocking moves with very short hold times
+                    hold_yaw = 0.09
+                    if abs(target_offset['x']) > 25: hold_yaw = 0.2
+                    hold_pitch = 0.075
+                    if abs(target_offset['y']) > 25: hold_pitch = 0.15
 
-            if is_aligned_on_compass and (is_aligned_on_target or not target_offset):
-                logger.debug('align=complete')
-                return  # We are aligned, exit the function
+                    if target_offset['x'] > target_close: self.keys.send('YawRightButton', hold=hold_yaw)
+                    if target_offset['x'] < -target_close: self.keys.send('YawLeftButton', hold=hold_yaw)
+                    if target_offset['y'] > target_close: self.keys.send('PitchUpButton', hold=hold_pitch)
+                    if target_offset['y'] < -target_close: self.keys.send('PitchDownButton', hold=hold_pitch)
+                    released = time.time()
+                    sleep(0.02)  # Mimic old sc_target_align timing
+                elif self.config['ContinuousAlign']:
+                    # Coarse alignment using compass, one period of the closed loop controller
+                    self.align_ctrl.step(nav_offset, nav_close)
+                else:
+                    # Coarse alignment using compass
+                    # This uses blocking moves with long hold times
+                    sleep_duration = 0.5
+                    self._last_turn = None
+                    coarse_off = nav_offset
+                    # Roll if the nav point is not directly behind us.
+                    can_roll = ((-180 + nav_close) < nav_offset['yaw'] < (180 - nav_close) and
+                                (-180 + nav_close) < nav_offset['pit'] < (180 - nav_close))
 
-            # Alignment logic
-            if is_occluded:
-                self.occluded_reposition(scr_reg)
-            elif target_offset and abs(nav_offset['yaw']) < close_enough_for_target_align and abs(
-                    nav_offset['pit']) < close_enough_for_target_align:
-                # Fine-grained alignment using visual target
-                # This uses blocking moves with very short hold times
-                hold_yaw = 0.09
-                if abs(target_offset['x']) > 25: hold_yaw = 0.2
-                hold_pitch = 0.075
-                if abs(target_offset['y']) > 25: hold_pitch = 0.15
-
-                if target_offset['x'] > target_close: self.keys.send('YawRightButton', hold=hold_yaw)
-                if target_offset['x'] < -target_close: self.keys.send('YawLeftButton', hold=hold_yaw)
-                if target_offset['y'] > target_close: self.keys.send('PitchUpButton', hold=hold_pitch)
-                if target_offset['y'] < -target_close: self.keys.send('PitchDownButton', hold=hold_pitch)
-                sleep(0.02)  # Mimic old sc_target_align timing
-            else:
-                # Coarse alignment using compass
-                # This uses blocking moves with long hold times
-                sleep_duration = 0.5
-                # Roll if the nav point is not directly behind us.
-                can_roll = ((-180 + nav_close) < nav_offset['yaw'] < (180 - nav_close) and
-                            (-180 + nav_close) < nav_offset['pit'] < (180 - nav_close))
-
-                if can_roll and abs(nav_offset['roll']) > nav_close and (180 - abs(nav_offset['roll']) > nav_close):
-                    sleep_duration = 1.0
-                    if nav_offset['yaw'] > 0 and nav_offset['pit'] > 0:
-                        self.rotateRight(nav_offset['roll'])
-                    elif nav_offset['yaw'] > 0 > nav_offset['pit']:
-                        self.rotateLeft(180 - nav_offset['roll'])
-                    elif nav_offset['yaw'] < 0 < nav_offset['pit']:
-                        self.rotateLeft(-nav_offset['roll'])
-                    else:
-                        self.rotateRight(180 + nav_offset['roll'])
-                elif abs(nav_offset['pit']) > nav_close:
-                    if nav_offset['pit'] < 0:
-                        self.pitchDown(abs(nav_offset['pit']))
-                    else:
-                        self.pitchUp(abs(nav_offset['pit']))
-                elif abs(nav_offset['yaw']) > nav_close:
-                    if nav_offset['yaw'] < 0:
-                        self.yawLeft(abs(nav_offset['yaw']))
-                    else:
-                        self.yawRight(abs(nav_offset['yaw']))
+                    if can_roll and abs(nav_offset['roll']) > nav_close and (180 - abs(nav_offset['roll']) > nav_close):
+                        sleep_duration = 1.0
+                        if nav_offset['yaw'] > 0 and nav_offset['pit'] > 0:
+                            self.rotateRight(nav_offset['roll'])
+                        elif nav_offset['yaw'] > 0 > nav_offset['pit']:
+                            self.rotateLeft(180 - nav_offset['roll'])
+                        elif nav_offset['yaw'] < 0 < nav_offset['pit']:
+                            self.rotateLeft(-nav_offset['roll'])
+                        else:
+                            self.rotateRight(180 + nav_offset['roll'])
+                    elif abs(nav_offset['pit']) > nav_close:
+                        if nav_offset['pit'] < 0:
+                            self.pitchDown(abs(nav_offset['pit']))
+                        else:
+                            self.pitchUp(abs(nav_offset['pit']))
+                    elif abs(nav_offset['yaw']) > nav_close:
+                        if nav_offset['yaw'] < 0:
+                            self.yawLeft(abs(nav_offset['yaw']))
+                        else:
+                            self.yawRight(abs(nav_offset['yaw']))
 
-                sleep(sleep_duration)  # Use normal sleep, as per user directive not to change movement funcs
+                    released = time.time()
+                    sleep(sleep_duration)  # Use normal sleep, as per user directive not to change movement funcs
+        finally:
+            # Release any keys held by the controller, also when stopped (EDAP_Interrupt)
+            self.align_ctrl.reset()
 
     def mnvr_to_target(self, scr_reg):
         logger.debug('align')
@@ -1544,46 +1739,34 @@ class EDAutopilot:
             logger.error('align() not in sc or space')
             raise Exception('align() not in sc or space')
 
-        self.sun_avoid(scr_reg)
+        with self.jump_timer.span('sun_avoid'):
+            self.sun_avoid(scr_reg)
         self.keys.send('SetSpeed100')
 
-        self.fsd_target_align(scr_reg)
+        with self.jump_timer.span('fsd_target_align'):
+            self.fsd_target_align(scr_reg)
 
     def smart_sleep(self, duration, scr_reg):
-        """ Sleeps for a given duration, but wakes up periodically to check for critical events.
+        """ Sleeps for a given duration, but wakes up as soon as the hazard monitor sees a critical event.
         Returns True if the sleep was completed, False if it was interrupted by an event.
         """
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            if self.interdiction_check():
-                # Interdiction handled. As per user request, we consider the
-                # wait complete and continue the sequence.
-                return True
-
-            if self.is_destination_occluded(scr_reg):
-                # Occlusion should also interrupt and be handled by the main loop.
-                return False
+        hazard = self.hazard_monitor.wait(duration, scr_reg)
+        if hazard == INTERDICTED:
+            # Interdiction handled. As per user request, we consider the
+            # wait complete and continue the sequence.
+            self.interdiction_check()
+            return True
 
-            sleep(0.05)
+        if hazard == OCCLUDED:
+            # Occlusion should also interrupt and be handled by the main loop.
+            return False
         return True
 
     def smart_sleep_fsd(self, duration, scr_reg):
-        """ Sleeps for a given duration, but wakes up periodically to check for critical events.
+        """ Sleeps for a given duration, but wakes up as soon as the hazard monitor sees a critical event.
         Returns True if the sleep was completed, False if it was interrupted by an event.
         """
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            if self.interdiction_check():
-                # Interdiction handled. As per user request, we consider the
-                # wait complete and continue the sequence.
-                return True
-
-            if self.is_destination_occluded(scr_reg):
-                # Occlusion should also interrupt and be handled by the main loop.
-                return False
-
-            sleep(0.05)
-        return True
+        return self.smart_sleep(duration, scr_reg)
 
     def sc_align(self, scr_reg) -> bool:
         """ A unified alignment function for supercruise, mimicking old timing but with constant event checking.
@@ -1592,6 +1775,8 @@ class EDAutopilot:
         nav_close = 6
         target_close = 6
         compass_align_count = 0
+        pf = None
+        released = 0.0  # Time the last move ended, see get_perception()
 
         while True:
             # Check ship status first
@@ -1610,27 +1795,29 @@ class EDAutopilot:
                 self.status.wait_for_flag_on(FlagsSupercruise, timeout=30)
                 continue  # Restart loop to re-evaluate
 
-            # Get sensor data
-            nav_offset = self.get_nav_offset(scr_reg)
-            target_offset = self.get_destination_offset(scr_reg)
+            # Get sensor data, all from one screen grab
+            pf = self.get_perception(scr_reg, disengage=True, last=pf, captured_after=released)
+            nav_offset = pf.nav_offset
+            target_offset = pf.target_offset
 
             # Main alignment decision logic
-            use_target_align = target_offset and abs(nav_offset['yaw']) < close_enough_for_target_align and abs(
-                nav_offset['pit']) < close_enough_for_target_align
+            use_target_align = (target_offset and pf.compass_found and
+                                abs(nav_offset['yaw']) < close_enough_for_target_align and
+                                abs(nav_offset['pit']) < close_enough_for_target_align)
 
-            if self.sc_disengage_label_up(scr_reg) and use_target_align:
+            if pf.disengage_up and use_target_align:
                 if self.sc_disengage_active(scr_reg):
                     self.ap_ckb('log+vce', 'Disengage Supercruise')
                     self.keys.send('HyperSuperCombination')
                     self.stop_sco_monitoring()
                     return True  # Success
 
-            if self.is_destination_occluded(scr_reg):
+            if pf.occluded:
                 self.occluded_reposition(scr_reg)
                 continue  # Restart loop to re-evaluate
 
             # Check for compass visibility before proceeding
-            if not self.have_destination(scr_reg):
+            if not pf.compass_found:
                 logger.debug("Compass not found, cannot align.")
                 sleep(1)
                 continue
@@ -1649,6 +1836,7 @@ class EDAutopilot:
                     if target_offset['x'] < -target_close: self.keys.send('YawLeftButton', hold=hold_yaw)
                     if target_offset['y'] > target_close: self.keys.send('PitchUpButton', hold=hold_pitch)
                     if target_offset['y'] < -target_close: self.keys.send('PitchDownButton', hold=hold_pitch)
+                    released = time.time()
 
                 sleep_interrupted = not self.smart_sleep(0.02, scr_reg)
                 if sleep_interrupted:
@@ -1692,6 +1880,7 @@ class EDAutopilot:
                             self.yawLeft(abs(nav_offset['yaw']))
                         else:
                             self.yawRight(abs(nav_offset['yaw']))
+                    released = time.time()
 
                 sleep_interrupted = not self.smart_sleep(0.02, scr_reg)
                 if sleep_interrupted:
@@ -1724,7 +1913,10 @@ class EDAutopilot:
 
     def honk(self):
         # Do the Discovery Scan (Honk)
+        with self.jump_timer.span('honk'):
+            self._honk()
 
+    def _honk(self):
         if self.status.get_flag(FlagsAnalysisMode):
             if self.config['DSSButton'] == 'Primary':
                 logger.debug('position=scanning')
@@ -1813,17 +2005,18 @@ class EDAutopilot:
             sleep(0.5)
             logger.debug('jump= start fsd')
 
-            self.keys.send('HyperSuperCombination', hold=1)
+            with self.jump_timer.span('fsd_charge'):
+                self.keys.send('HyperSuperCombination', hold=1)
 
-            # Start SCO monitoring ready when we drop back to SC.
-            self.start_sco_monitoring()
+                # Start SCO monitoring ready when we drop back to SC.
+                self.start_sco_monitoring()
 
-            res = self.status.wait_for_flag_on(FlagsFsdCharging, 5)
-            if not res:
-                logger.error('FSD failed to charge.')
-                continue
+                res = self.status.wait_for_flag_on(FlagsFsdCharging, 5)
+                if not res:
+                    logger.error('FSD failed to charge.')
+                    continue
 
-            res = self.status.wait_for_flag_on(FlagsFsdJump, 30)
+                res = self.status.wait_for_flag_on(FlagsFsdJump, 30)
             if not res:
                 logger.warning('FSD failure to start jump timeout.')
                 self.mnvr_to_target(scr_reg)  # attempt realign to target
@@ -1831,7 +2024,8 @@ class EDAutopilot:
 
             logger.debug('jump= in jump')
             # Wait for jump to complete. Should never err
-            res = self.status.wait_for_flag_off(FlagsFsdJump, 360)
+            with self.jump_timer.span('jump'):
+                res = self.status.wait_for_flag_off(FlagsFsdJump, 360)
             if not res:
                 logger.error('FSD failure to complete jump timeout.')
                 continue
@@ -1851,28 +2045,68 @@ class EDAutopilot:
     #
     def rotateLeft(self, deg):
         htime = deg/self.rollrate
+        self._last_turn = ('roll', deg, htime)
         self.keys.send('RollLeftButton', hold=htime)
 
     def rotateRight(self, deg):
         htime = deg/self.rollrate
+        self._last_turn = ('roll', deg, htime)
         self.keys.send('RollRightButton', hold=htime)
 
     def pitchDown(self, deg):
         htime = deg/self.pitchrate
+        self._last_turn = ('pitch', deg, htime)
         self.keys.send('PitchDownButton', htime)
 
     def pitchUp(self, deg):
         htime = deg/self.pitchrate
+        self._last_turn = ('pitch', deg, htime)
         self.keys.send('PitchUpButton', htime)
 
     def yawLeft(self, deg):
         htime = deg/self.yawrate
+        self._last_turn = ('yaw', deg, htime)
         self.keys.send('YawLeftButton', hold=htime)
 
     def yawRight(self, deg):
         htime = deg / self.yawrate
+        self._last_turn = ('yaw', deg, htime)
         self.keys.send('YawRightButton', hold=htime)
 
+    def learn_turn_rate(self, off_before, off_after):
+        """ Measure the rate of the last timed turn from the nav offsets before and after it.
+        @param off_before: The nav offset the turn was calculated from.
+        @param off_after: The nav offset after the turn.
+        """
+        if not self.config['LearnTurnRates'] or self._last_turn is None:
+            return
+        axis, deg, htime = self._last_turn
+        self._last_turn = None
+        # The offsets are not comparable if the nav point moved between ahead and behind
+        if off_before['z'] != off_after['z']:
+            return
+        key = {'roll': 'roll', 'pitch': 'pit', 'yaw': 'yaw'}[axis]
+        self.rate_learner.observe(axis, deg, htime, off_before[key], off_after[key])
+
+    def apply_learned_rates(self):
+        """ Use the learned turn rates that are confident and differ from the current ones, and save
+        them to the ship config. """
+        if not self.config['LearnTurnRates']:
+            return
+        changed = False
+        for axis, attr in [('roll', 'rollrate'), ('pitch', 'pitchrate'), ('yaw', 'yawrate')]:
+            est = self.rate_learner.estimators[axis]
+            est.configured = getattr(self, attr)  # May have been changed in the GUI
+            if self.rate_learner.changed(axis):
+                rate = round(est.rate, 1)
+                logger.info(f"Learned {axis} rate {rate} (was {est.configured}), {self.rate_learner.stats()[axis]}")
+                setattr(self, attr, rate)
+                est.configured = rate
+                changed = True
+        if changed:
+            self.update_ship_configs()
+            self.ap_ckb('update_ship_cfg')
+
     def refuel(self, scr_reg):
         """ Check if refueling needed, ensure correct start type. """
         # Check if we have a fuel scoop
@@ -1900,7 +2134,8 @@ class EDAutopilot:
         self.vce.say("Avoiding star")
         self.update_ap_status("Avoiding star")
         self.ap_ckb('log', 'Avoiding star')
-        self.sun_avoid(scr_reg)
+        with self.jump_timer.span('sun_avoid'):
+            self.sun_avoid(scr_reg)
 
         if self.jn.ship_state()['fuel_percent'] < self.config['RefuelThreshold'] and is_star_scoopable and has_fuel_scoop:
             logger.debug('refuel= start refuel')
@@ -2198,6 +2433,7 @@ class EDAutopilot:
             self.update_overlay()
 
             if self.jn.ship_state()['status'] == 'in_space' or self.jn.ship_state()['status'] == 'in_supercruise':
+                self.jump_timer.begin_jump()
                 self.update_ap_status("Align")
 
                 self.mnvr_to_target(scr_reg)
@@ -2227,11 +2463,14 @@ class EDAutopilot:
                 self.honk_thread.start()
 
                 # Refuel
-                refueled = self.refuel(scr_reg)
+                with self.jump_timer.span('refuel'):
+                    refueled = self.refuel(scr_reg)
 
                 self.update_ap_status("Maneuvering")
 
-                position_ok = self.position(scr_reg, refueled)
+                with self.jump_timer.span('position'):
+                    position_ok = self.position(scr_reg, refueled)
+                self.end_jump_timing()
                 if not position_ok:
                     # This now only happens on a disengage or other critical event (not interdiction).
                     # We should abort the FSD assist sequence.
@@ -2260,6 +2499,15 @@ class EDAutopilot:
             sleep(1)
             return False
 
+    def end_jump_timing(self):
+        """ Finish timing the jump cycle and write the timings to JumpTimingFile if set. """
+        self.jump_timer.end_jump(self.current_ship_type, self.jn.ship_state()['star_class'])
+        if self.config['JumpTimingFile']:
+            try:
+                self.jump_timer.export(self.config['JumpTimingFile'])
+            except Exception as e:
+                logger.warning(f"Unable to write jump timings: {e}")
+
     # Supercruise Assist loop to travel to target in system and perform autodock
     #
     def sc_assist(self, scr_reg, do_docking=True):
@@ -2539,8 +2787,7 @@ class EDAutopilot:
             self.cv_view_x = x
             self.cv_view_y = y
         else:
-            cv2.destroyAllWindows()
-            cv2.waitKey(50)
+            self.debug_viewer.close_windows()
 
     def set_randomness(self, enable=False):
         self.config["EnableRandomness"] = enable
@@ -2592,6 +2839,12 @@ class EDAutopilot:
     def quit(self):
         if self.vce != None:
             self.vce.quit()
+        if self.vision_worker is not None:
+            self.vision_worker.stop()
+        self.hazard_monitor.stop()
+        self.debug_viewer.stop()
+        self.ocr.close()
+        self.scr.stop_capture_thread()
         if self.overlay != None:
             self.overlay.overlay_quit()
         self.terminate = True
@@ -2796,15 +3049,16 @@ class EDAutopilot:
 
                         # Load ship configuration with proper hierarchy
                         self.load_ship_configuration(ship)
+                        self.rate_learner.reset(self.rollrate, self.pitchrate, self.yawrate)
 
                         # Update GUI with ship config
                         self.ap_ckb('update_ship_cfg')
 
                         # Reload templates
                         self.templ.reload_templates(self.scr.scaleX, self.scr.scaleY, self.compass_scale)
+                        self.scrReg.tracker.reset()
 
             self.update_overlay()
-            cv2.waitKey(10)
             sleep(1)
 
     def ship_tst_pitch(self):
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+
+"""
+File:Fuzzy_Index.py
+
+Description:
+  Index of a vocabulary (i.e. commodity names or mission name prefixes) for fuzzy matching of OCR
+  text. Each entry is normalized for common OCR errors and split into shingles (k character
+  substrings) once, when the index is built. A shingle maps to the entries holding it, so a query
+  only scores the entries sharing at least one shingle, not the whole vocabulary. The score is the
+  Sorensen-Dice similarity of the shingle sets, the same as OCR.string_similarity().
+
+  index = Fuzzy_Index(['Gold', 'Silver', 'Bertrandite'])
+  index.best('G0LD', threshold=0.7)  -> 'Gold'
+"""
+
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_ocr_text(text: str, strip_spaces: bool = True) -> str:
+    """ Upper case the text and replace the letters OCR confuses with digits, so 'Gold' and 'G0LD'
+    are the same. """
+    text = text.upper().replace("O", "0").replace("L", "1")
+    if strip_spaces:
+        text = text.replace(" ", "")
+    return text
+
+
+def shingles(text: str, k: int = 3) -> set[str]:
+    """ Get the set of k character substrings of the text, with runs of white space as one space. """
+    text = _SPACE_PATTERN.sub(" ", text)
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def dice_similarity(a: set[str], b: set[str]) -> float:
+    """ Get the Sorensen-Dice similarity of two shingle sets, see shingles(). """
+    if a == b:
+        return 1.0
+    total = len(a) + len(b)
+    return 2.0 * len(a & b) / total if total else 0.0
+
+
+class Fuzzy_Index:
+    def __init__(self, vocabulary: list[str], strip_spaces: bool = True, k: int = 3):
+        """
+        @param vocabulary: The strings to match against. Matches return the original string.
+        @param strip_spaces: Ignore spaces when comparing.
+        @param k: The shingle length.
+        """
+        self.strip_spaces = strip_spaces
+        self.k = k
+        self.entries = []  # The original strings
+        self._sizes = []  # The number of shingles of each entry
+        self._postings = defaultdict(list)  # Shingle -> entry indexes
+        self._exact = defaultdict(list)  # Normalized string -> entry indexes, for entries too short to shingle
+        self._by_length = defaultdict(set)  # Original string length -> entry indexes, see best_prefix()
+        for text in vocabulary:
+            self.add(text)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, text: str):
+        i = len(self.entries)
+        key = normalize_ocr_text(text, self.strip_spaces)
+        profile = shingles(key, self.k)
+        self.entries.append(text)
+        self._sizes.append(len(profile))
+        self._exact[key].append(i)
+        self._by_length[len(text)].add(i)
+        for shingle in profile:
+            self._postings[shingle].append(i)
+
+    def top_k(self, query: str, k: int = 5, threshold: float = 0.0) -> list[tuple[str, float]]:
+        """ Get the best matches of the query.
+        @param query: The text to match, i.e. from OCR.
+        @param k: The maximum number of matches.
+        @param threshold: The minimum similarity of a match.
+        @return: The (entry, similarity) of the matches, best first. Equal scores keep vocabulary order.
+        """
+        scores = self._score(normalize_ocr_text(query, self.strip_spaces))
+        matches = sorted((i for i, score in scores.items() if score >= threshold), key=lambda i: (-scores[i], i))
+        return [(self.entries[i], scores[i]) for i in matches[:k]]
+
+    def best(self, query: str, threshold: float = 0.6) -> str | None:
+        """ Get the best match of the query, or None if no entry is at least threshold similar. """
+        matches = self.top_k(query, 1, threshold)
+        return matches[0][0] if matches and matches[0][1] > 0.0 else None
+
+    def best_prefix(self, text_body: str, threshold: float = 0.8) -> str | None:
+        """ Get the entry best matching the start of a text, each entry compared with the same number of
+        characters of the text (i.e. a mission name prefix against the mission details).
+        @param text_body: The text to match the start of.
+        @param threshold: The minimum similarity of a match.
+        @return: The best entry, or None if no entry is at least threshold similar.
+        """
+        scores = {}
+        for length, ids in self._by_length.items():
+            scores.update(self._score(normalize_ocr_text(text_body[:length], self.strip_spaces), ids))
+
+        # Equal scores keep vocabulary order
+        best_i = min(scores, key=lambda i: (-scores[i], i), default=None)
+        best_score = scores[best_i] if best_i is not None else 0.0
+        if best_score > 0.0 and best_score >= threshold:
+            return self.entries[best_i]
+        return None
+
+    def _score(self, key: str, only: set[int] | None = None) -> dict[int, float]:
+        """ Get the Sorensen-Dice similarity of the normalized query with each entry sharing a shingle
+        with it, or equal to it. """
+        profile = shingles(key, self.k)
+        common = defaultdict(int)
+        for shingle in profile:
+            for i in self._postings.get(shingle, ()):
+                common[i] += 1
+
+        scores = {}
+        for i, count in common.items():
+            if only is None or i in only:
+                scores[i] = 2.0 * count / (len(profile) + self._sizes[i])
+        for i in self._exact.get(key, ()):
+            if only is None or i in only:
+                scores[i] = 1.0
+        return scores
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from EDAP_data import FlagsBeingInterdicted
+from EDlogger import logger
+
+"""
+File:Hazard_Monitor.py
+
+Description:
+  Background thread that watches for the events that should interrupt a timed wait: interdiction
+  (from the Status file flags, cheap) and the target being occluded (a template match, expensive).
+  Callers block in wait() on a condition with a timeout, and are woken as soon as a hazard is seen
+  instead of at the next poll.
+
+  The status flags are read every min_period. The occlusion check starts at min_period and backs off
+  towards max_period while the target stays clear, so a long wait costs a few matches per second
+  instead of one every 50ms. The monitor only checks while someone is waiting.
+
+  A wait shorter than min_period (i.e. the 20ms sleep of an alignment loop) would end before the
+  monitor's check, so the checks are done once on the caller's thread instead.
+"""
+
+INTERDICTED = 'interdicted'
+OCCLUDED = 'occluded'
+
+
+class Hazard_Monitor:
+    def __init__(self, ap, min_period: float = 0.1, max_period: float = 0.5):
+        """
+        @param ap: The EDAutopilot, which provides the status and occlusion checks.
+        @param min_period: The status flag check period and the starting occlusion check period (s).
+        @param max_period: The longest occlusion check period (s).
+        """
+        self.ap = ap
+        self.min_period = min_period
+        self.max_period = max_period
+
+        self._cond = threading.Condition()
+        self._scr_reg = None  # The screen regions of the current wait, None when not waiting
+        self._wait_id = 0  # Count of waits, to tell a new wait from the last
+        self._hazard = None
+        self._thread = None
+        self._run = False
+        self.checks = {INTERDICTED: 0, OCCLUDED: 0}  # Number of checks done, for profiling
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._run = True
+        self._thread = threading.Thread(target=self._loop, name="Hazard_Monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._run = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, duration: float, scr_reg) -> str | None:
+        """ Wait for the duration, or until a hazard is seen.
+        @param duration: The time to wait in seconds.
+        @param scr_reg: The Screen_Regions to check for occlusion with.
+        @return: None if the wait completed, else the hazard seen (INTERDICTED or OCCLUDED).
+        """
+        end = time.perf_counter() + duration
+        if duration < self.min_period:
+            hazard = self._check(scr_reg)
+            remaining = end - time.perf_counter()
+            if hazard is None and remaining > 0:
+                time.sleep(remaining)
+            return hazard
+
+        with self._cond:
+            self._hazard = None
+            self._scr_reg = scr_reg
+            self._wait_id += 1
+            self._cond.notify_all()
+            try:
+                while self._hazard is None:
+                    remaining = end - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    # Short slices, as an async exception (EDAP_Interrupt) is only taken between waits
+                    self._cond.wait(min(remaining, 0.05))
+                return self._hazard
+            finally:
+                self._scr_reg = None
+                self._cond.notify_all()
+
+    def _check(self, scr_reg) -> str | None:
+        """ Check for interdiction then occlusion, once. """
+        try:
+            self.checks[INTERDICTED] += 1
+            if self.ap.status.get_flag(FlagsBeingInterdicted):
+                return INTERDICTED
+            self.checks[OCCLUDED] += 1
+            if self.ap.is_destination_occluded(scr_reg):
+                return OCCLUDED
+        except Exception as e:
+            logger.warning(f"Hazard_Monitor error: {e}")
+        return None
+
+    def _loop(self):
+        while self._run:
+            with self._cond:
+                while self._run and self._scr_reg is None:
+                    self._cond.wait()
+                scr_reg = self._scr_reg
+                wait_id = self._wait_id
+            if not self._run:
+                break
+
+            # New wait, check everything now
+            occl_period = self.min_period
+            next_occl = 0.0
+            while self._run:
+                start = time.perf_counter()
+                hazard = None
+                try:
+                    self.checks[INTERDICTED] += 1
+                    if self.ap.status.get_flag(FlagsBeingInterdicted):
+                        hazard = INTERDICTED
+                    elif start >= next_occl:
+                        self.checks[OCCLUDED] += 1
+                        if self.ap.is_destination_occluded(scr_reg):
+                            hazard = OCCLUDED
+                        else:
+                            # Still clear, check less often
+                            occl_period = min(occl_period * 2, self.max_period)
+                            next_occl = start + occl_period
+                except Exception as e:
+                    logger.warning(f"Hazard_Monitor error: {e}")
+
+                with self._cond:
+                    if self._scr_reg is None or self._wait_id != wait_id:
+                        break  # The wait ended, or a new one started
+                    if hazard is not None:
+                        logger.debug(f"Hazard_Monitor: {hazard}")
+                        self._hazard = hazard
+                        self._cond.notify_all()
+                        # Wait for the waiter to return
+                        while self._run and self._scr_reg is not None and self._wait_id == wait_id:
+                            self._cond.wait()
+                        break
+                    remaining = self.min_period - (time.perf_counter() - start)
+                    if remaining > 0:
+                        self._cond.wait(remaining)
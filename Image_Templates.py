@@ -1,4 +1,8 @@
+import hashlib
 import sys
+import threading
+from collections import OrderedDict
+from os import stat
 from os.path import abspath, getmtime, isfile, join, dirname
 
 import cv2
@@ -10,9 +14,95 @@ File:Image_Templates.py
 Description:
   Class defines template images that will be used with opencv to match in screen regions
 
+  The scaled templates are cached in memory, keyed by the template file hash and the scale, so
+  reloading the templates (i.e. on a ship change or each step of a calibration) is a lookup
+  rather than a read from disk and a resize. The least recently used are dropped when full.
+
 Author: sumzer0@yahoo.com
 """
 
+# Max number of scaled templates kept. Calibration sweeps a few hundred scales of one template.
+TEMPLATE_CACHE_SIZE = 512
+
+
+class Template_Cache:
+    """ Cache of the template source images and the scaled templates, shared by all Image_Templates. """
+    def __init__(self, max_size: int = TEMPLATE_CACHE_SIZE):
+        self.max_size = max_size
+        self._sources = {}  # file path -> (mtime, size, hash, image)
+        self._scaled = OrderedDict()  # (hash, scaleX, scaleY) -> template dict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_source(self, path):
+        """ Get the greyscale image and hash of the file, reading the file only if it changed.
+        @param path: The absolute path of the image file.
+        @return: A tuple of (hash, image).
+        """
+        st = stat(path)
+        entry = self._sources.get(path)
+        if entry is None or entry[0] != st.st_mtime or entry[1] != st.st_size:
+            with open(path, 'rb') as f:
+                data = f.read()
+            file_hash = hashlib.sha1(data).hexdigest()
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            entry = (st.st_mtime, st.st_size, file_hash, image)
+            self._sources[path] = entry
+        return entry[2], entry[3]
+
+    def get_scaled(self, path, scaleX, scaleY):
+        """ Get the template scaled by the given factors, from the cache if possible.
+        The returned dict is shared, so the image must not be modified.
+        @param path: The absolute path of the image file.
+        @return: A dict of the image, width and height.
+        """
+        with self._lock:
+            file_hash, image = self.get_source(path)
+            key = (file_hash, scaleX, scaleY)
+            templ = self._scaled.get(key)
+            if templ is not None:
+                self._scaled.move_to_end(key)
+                self.hits += 1
+                return templ
+
+            self.misses += 1
+            scaled = cv2.resize(image, (0, 0), fx=scaleX, fy=scaleY)
+            width, height = scaled.shape[::-1]
+            templ = {'image': scaled, 'width': width, 'height': height}
+            self._scaled[key] = templ
+            while len(self._scaled) > self.max_size:
+                self._scaled.popitem(last=False)
+            return templ
+
+    def clear(self):
+        with self._lock:
+            self._sources.clear()
+            self._scaled.clear()
+
+
+template_cache = Template_Cache()
+
+# The template files, default templates assumed 3440x1440 screen resolution
+TEMPLATE_FILES = {
+    'elw': "templates/elw-template.png",
+    'elw_sig': "templates/elw-sig-template.png",
+    'navpoint': "templates/navpoint.png",
+    'navpoint-behind': "templates/navpoint-behind.png",
+    'compass': "templates/compass.png",
+    'target': "templates/destination.png",
+    'target_occluded': "templates/target_occluded.png",
+    'disengage': "templates/sc-disengage.png",
+    'missions': "templates/completed-missions.png",
+    'dest_sirius': "templates/dest-sirius-atmos-HL.png",
+    'robigo_mines': "templates/robigo-mines-selected.png",
+    'sirius_atmos': "templates/sirius-atmos-selected.png",
+}
+
+# The templates scaled by the compass scale rather than the screen scale
+COMPASS_TEMPLATES = ('navpoint', 'navpoint-behind', 'compass')
+
+
 class Image_Templates:
     def __init__(self, scaleX, scaleY, compass_scale: float):
    
@@ -36,27 +126,23 @@ class Image_Templates:
         """ Load the template image in color. If we need grey scale for matching, we can apply that later as needed.
         Resize the image, as the templates are based on 3440x1440 resolution, so scale to current screen resolution
          return image and size info. """
-        template = cv2.imread(self.resource_path(file_name), cv2.IMREAD_GRAYSCALE)
         #logger.debug("File:"+self.resource_path(file_name)+" template:"+str(template))
-        template = cv2.resize(template, (0, 0), fx=scaleX, fy=scaleY)
-        width, height = template.shape[::-1]
-        return {'image': template, 'width': width, 'height': height}
+        return template_cache.get_scaled(self.resource_path(file_name), scaleX, scaleY)
 
     def reload_templates(self, scaleX, scaleY, compass_scale: float):
         """ Load the full set of image templates. """
-        self.template['elw']       = self.load_template("templates/elw-template.png", scaleX, scaleY) 
-        self.template['elw_sig']   = self.load_template("templates/elw-sig-template.png", scaleX, scaleY) 
-        self.template['navpoint']  = self.load_template("templates/navpoint.png", compass_scale, compass_scale)
-        self.template['navpoint-behind']  = self.load_template("templates/navpoint-behind.png", compass_scale, compass_scale)
-        self.template['compass']   = self.load_template("templates/compass.png", compass_scale,compass_scale)
-        self.template['target']    = self.load_template("templates/destination.png", scaleX, scaleY) 
-        self.template['target_occluded']    = self.load_template("templates/target_occluded.png", scaleX, scaleY) 
-        self.template['disengage'] = self.load_template("templates/sc-disengage.png", scaleX, scaleY) 
-        self.template['missions']  = self.load_template("templates/completed-missions.png", scaleX, scaleY) 
-        self.template['dest_sirius'] = self.load_template("templates/dest-sirius-atmos-HL.png", scaleX, scaleY)
-        self.template['robigo_mines']  = self.load_template("templates/robigo-mines-selected.png", scaleX, scaleY) 
-        self.template['sirius_atmos']  = self.load_template("templates/sirius-atmos-selected.png", scaleX, scaleY)        
-        
+        for templ_name, file_name in TEMPLATE_FILES.items():
+            self.template[templ_name] = self.load_scaled_template(templ_name, scaleX, scaleY, compass_scale)
+
+    def load_scaled_template(self, templ_name, scaleX, scaleY, compass_scale: float):
+        """ Load a single template with the scale it would use in reload_templates(), without
+        changing the current template. The image is shared, so must not be modified.
+        @param templ_name: The template name, i.e. 'compass' or 'target'.
+        @return: A dict of the image, width and height.
+        """
+        if templ_name in COMPASS_TEMPLATES:
+            return self.load_template(TEMPLATE_FILES[templ_name], compass_scale, compass_scale)
+        return self.load_template(TEMPLATE_FILES[templ_name], scaleX, scaleY)
 
     def resource_path(self,relative_path):
         """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from EDlogger import logger
+
+"""
+File:Jump_Timing.py
+
+Description:
+  Timing of the phases of the FSD assist jump cycle (sun avoid, target align, FSD charge, jump,
+  refuel, honk and position). Each jump cycle is a record of the time spent in each phase with the
+  ship and the class of the star jumped to. The last max_jumps records are kept, to give histograms
+  and summaries per phase, broken down by ship or star class, and can be exported as CSV or JSON.
+
+  Usage:
+    timer.begin_jump()
+    with timer.span('sun_avoid'):
+        ...
+    timer.end_jump(ship='python', star_class='K')
+
+  Time spent in a phase more than once in a cycle is added up. A span nested in another on the same
+  thread is not counted in the outer span, i.e. refuel does not include its sun_avoid. Spans may be
+  timed on another thread, i.e. honk, in which case they overlap the other phases, so the phases of
+  a cycle can add up to more than its total. A span is added to the cycle it started in, even if it
+  ends after that cycle has ended or the next has begun.
+"""
+
+PHASES = ['sun_avoid', 'fsd_target_align', 'fsd_charge', 'jump', 'refuel', 'honk', 'position']
+
+
+class Jump_Timer:
+    def __init__(self, max_jumps: int = 500):
+        """
+        @param max_jumps: The number of jump records to keep.
+        """
+        self.records = deque(maxlen=max_jumps)
+        self._current = None
+        self._count = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Per thread stack of the time spent in nested spans
+
+    def begin_jump(self):
+        """ Start timing a new jump cycle, discarding any unfinished one. """
+        with self._lock:
+            self._current = {'start': time.time(), 'phases': {}}
+
+    def end_jump(self, ship: str | None = None, star_class: str | None = None) -> dict | None:
+        """ Finish the jump cycle and keep its record.
+        @param ship: The ship type.
+        @param star_class: The class of the star jumped to.
+        @return: The record, or None if no cycle was started.
+        """
+        with self._lock:
+            if self._current is None:
+                return None
+            self._count += 1
+            record = {
+                'jump': self._count,
+                'start': self._current['start'],
+                'total': time.time() - self._current['start'],
+                'ship': ship or '',
+                'star_class': star_class or '',
+                'phases': self._current['phases'],
+            }
+            self.records.append(record)
+            self._current = None
+
+        logger.debug("Jump timing: total {:.1f}s, ".format(record['total']) +
+                     ", ".join(f"{k} {v:.1f}s" for k, v in record['phases'].items()))
+        return record
+
+    def add(self, phase: str, seconds: float, cycle: dict | None = None):
+        """ Add time to a phase of a jump cycle.
+        @param phase: The phase.
+        @param seconds: The time to add.
+        @param cycle: The cycle to add to, which may have ended. None for the current cycle, ignored if
+        no cycle is being timed.
+        """
+        with self._lock:
+            if cycle is None:
+                cycle = self._current
+            if cycle is not None:
+                phases = cycle['phases']
+                phases[phase] = phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def span(self, phase: str):
+        """ Time the code in the with block as part of the phase, in the cycle current at the start. """
+        with self._lock:
+            cycle = self._current
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            if cycle is not None:
+                self.add(phase, elapsed - nested, cycle)
+
+    def phase_times(self, phase: str, group_by: str | None = None, value=None) -> list[float]:
+        """ Get the times of a phase from the records, optionally only those where the record
+        field group_by ('ship' or 'star_class') equals value. Phase 'total' gives the cycle times. """
+        times = []
+        with self._lock:
+            for rec in self.records:
+                if group_by is not None and rec[group_by] != value:
+                    continue
+                if phase == 'total':
+                    times.append(rec['total'])
+                elif phase in rec['phases']:
+                    times.append(rec['phases'][phase])
+        return times
+
+    def histogram(self, phase: str, bin_width: float = 1.0) -> tuple[np.ndarray, np.ndarray]:
+        """ Get the histogram of a phase's times.
+        @return: The counts and the bin edges in seconds, as numpy.histogram().
+        """
+        times = self.phase_times(phase)
+        if not times:
+            return np.zeros(0, dtype=int), np.zeros(1)
+        top = max(max(times), bin_width)
+        edges = np.arange(0.0, top + bin_width, bin_width)
+        return np.histogram(times, bins=edges)
+
+    def summary(self, group_by: str | None = None) -> dict:
+        """ Get the count, mean, median, 90th percentile and max of each phase.
+        @param group_by: None for all jumps, or 'ship' or 'star_class' to break down by it.
+        @return: {phase: stats} or for a breakdown {group: {phase: stats}}.
+        """
+        if group_by is None:
+            return self._summary()
+
+        with self._lock:
+            groups = sorted({rec[group_by] for rec in self.records})
+        return {group: self._summary(group_by, group) for group in groups}
+
+    def _summary(self, group_by=None, value=None) -> dict:
+        result = {}
+        for phase in PHASES + ['total']:
+            times = self.phase_times(phase, group_by, value)
+            if not times:
+                continue
+            result[phase] = {
+                'count': len(times),
+                'mean': float(np.mean(times)),
+                'p50': float(np.percentile(times, 50)),
+                'p90': float(np.percentile(times, 90)),
+                'max': float(np.max(times)),
+            }
+        return result
+
+    def export_csv(self, path: str):
+        """ Write the records as CSV, one row per jump and one column per phase. The honk column overlaps
+        the others (it runs during refuel and position), so the phases can add up to more than total. """
+        records = self._copy_records()
+        with open(path, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['jump', 'start', 'ship', 'star_class', 'total'] + PHASES)
+            for rec in records:
+                writer.writerow([rec['jump'], round(rec['start'], 3), rec['ship'], rec['star_class'],
+                                 round(rec['total'], 3)] +
+                                [round(rec['phases'][p], 3) if p in rec['phases'] else '' for p in PHASES])
+
+    def export_json(self, path: str):
+        """ Write the records and the summaries as JSON, with a note of the overlapping phases. """
+        records = self._copy_records()
+        data = {
+            'notes': "honk runs on its own thread during refuel and position, so the phases of a jump "
+                     "can add up to more than its total.",
+            'jumps': records,
+            'summary': self.summary(),
+            'by_ship': self.summary('ship'),
+            'by_star_class': self.summary('star_class'),
+        }
+        with open(path, 'w') as fp:
+            json.dump(data, fp, indent=4)
+
+    def _copy_records(self) -> list[dict]:
+        """ Copy the records, as a span on another thread may still add to a record's phases. """
+        with self._lock:
+            return [dict(rec, phases=dict(rec['phases'])) for rec in self.records]
+
+    def export(self, path: str):
+        """ Write the records as JSON if the path ends in .json, else as CSV. """
+        if path.lower().endswith('.json'):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
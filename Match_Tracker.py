@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import threading
+
+"""
+File:Match_Tracker.py
+
+Description:
+  Class to track where a template last matched in a region, so the next match can search a small
+  window around that location instead of the whole region. Objects such as the compass and the
+  target barely move between consecutive measurements. When the match in the window is below the
+  threshold, the caller searches the whole region again and the tracker is updated from that.
+  The tracker is thread safe, as the Vision_Worker thread and the AP thread both match.
+"""
+
+
+class Match_Tracker:
+    def __init__(self, margin: float = 1.0, enabled: bool = True):
+        """ Track the last match location of templates in regions.
+        @param margin: The size of the search window around the last match, each side, as a multiple
+        of the template size. 1.0 gives a window of 3x the template size.
+        @param enabled: Tracking is enabled. When disabled, get_window() always returns None.
+        """
+        self.margin = margin
+        self.enabled = enabled
+        self.tracks = {}  # (region name, template name) -> (x, y) last match location in the region
+        self.stats = {}  # (region name, template name) -> {'hits', 'misses', 'full'}
+        self._lock = threading.Lock()
+
+    def get_window(self, region_name, templ_name, region_w, region_h, templ_w, templ_h):
+        """ Get the window to search in, around the last match location.
+        @param region_w: The width of the region in pixels.
+        @param region_h: The height of the region in pixels.
+        @param templ_w: The width of the template in pixels.
+        @param templ_h: The height of the template in pixels.
+        @return: The window rect ([L, T, R, B]) in pixels relative to the region, or None to search the whole region.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            loc = self.tracks.get((region_name, templ_name))
+        if loc is None:
+            return None
+
+        pad_x = int(templ_w * self.margin)
+        pad_y = int(templ_h * self.margin)
+        left = max(loc[0] - pad_x, 0)
+        top = max(loc[1] - pad_y, 0)
+        right = min(loc[0] + templ_w + pad_x, region_w)
+        bottom = min(loc[1] + templ_h + pad_y, region_h)
+
+        # The window must hold the template and be worth the effort
+        if right - left < templ_w or bottom - top < templ_h:
+            return None
+        if (right - left) * (bottom - top) >= region_w * region_h:
+            return None
+        return [left, top, right, bottom]
+
+    def hit(self, region_name, templ_name, loc):
+        """ The match in the window cleared the threshold. """
+        with self._lock:
+            self.tracks[(region_name, templ_name)] = (loc[0], loc[1])
+            self._count(region_name, templ_name, 'hits')
+
+    def miss(self, region_name, templ_name):
+        """ The match in the window was below the threshold, so the whole region will be searched. """
+        with self._lock:
+            self._count(region_name, templ_name, 'misses')
+
+    def full(self, region_name, templ_name, loc, matched: bool):
+        """ The whole region was searched.
+        @param loc: The best match location in the region.
+        @param matched: The match cleared the threshold. If not, the track is dropped.
+        """
+        with self._lock:
+            if matched and self.enabled:
+                self.tracks[(region_name, templ_name)] = (loc[0], loc[1])
+            else:
+                self.tracks.pop((region_name, templ_name), None)
+            self._count(region_name, templ_name, 'full')
+
+    def reset(self):
+        """ Forget all the tracks, i.e. when the template scale or screen changes. """
+        with self._lock:
+            self.tracks.clear()
+
+    def _count(self, region_name, templ_name, name):
+        """ Count a match. Call holding the lock. """
+        stat = self.stats.setdefault((region_name, templ_name), {'hits': 0, 'misses': 0, 'full': 0})
+        stat[name] += 1
+
+    def hit_rate(self, region_name, templ_name) -> float:
+        """ The fraction of matches that were found in the window (0.0 - 1.0). """
+        with self._lock:
+            stat = self.stats.get((region_name, templ_name))
+            if stat is None:
+                return 0.0
+            total = stat['hits'] + stat['full']
+            return stat['hits'] / total if total else 0.0
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
 import cv2
 import numpy as np
-from paddleocr import PaddleOCR
-import logging
 from strsimpy import SorensenDice
 from strsimpy.jaro_winkler import JaroWinkler
 
 from EDlogger import logger
+from OCR_Cache import OCR_Cache
+from OCR_Lines import split_text_lines, rec_to_ocr_data
+from OCR_Service import OCR_Service, paddle_engine, recognize, ocr_textlist
+from Debug_Recorder import Debug_Recorder
+from Digit_Reader import Digit_Reader
+from Fuzzy_Index import Fuzzy_Index, dice_similarity, normalize_ocr_text, shingles
 
 """
 File:OCR.py    
@@ -16,19 +23,116 @@ File:OCR.py
 Description:
   Class for OCR processing using PaddleOCR. 
 
+  The OCR model is made on first use, as it takes a few seconds. warm_up() makes it and runs a first
+  OCR in the background, so it is ready before it is needed. See state for the model state.
+
 Author: Stumpii
 """
 
 
+class _Change_Gate:
+    """ Tells if a polled image differs from the one of the last poll, so an unchanged region is not
+    searched or OCR'd again. """
+    def __init__(self):
+        self._last = None
+
+    def changed(self, image) -> bool:
+        last = self._last
+        self._last = image
+        return last is None or last.shape != image.shape or not np.array_equal(last, image)
+
+
 class OCR:
-    def __init__(self, screen, language: str = 'en', use_gpu: bool = False):
+    def __init__(self, screen, language: str = 'en', use_gpu: bool = False, cache_size: int = 256,
+                 cache_ttl: float = 30.0, cache_mode: str = 'exact', rec_only: bool = True,
+                 rec_min_conf: float = 0.8, rec_batch_size: int = 6, workers: int = 0,
+                 engine_factory=paddle_engine):
         self.screen = screen
-        self.paddleocr = PaddleOCR(use_angle_cls=False, lang=language, use_gpu=use_gpu, show_log=False, use_dilation=True,
-                                   use_space_char=True)
-        logging.getLogger('ppocr').setLevel(logging.ERROR)
+        self.language = language
+        self.use_gpu = use_gpu
+        self.engine_factory = engine_factory  # Makes the OCR model, see OCR_Service.paddle_engine()
+        # With workers, the OCR runs in worker processes (see OCR_Service), else in this process.
+        # Neither starts or loads the model until first used.
+        self.service = None
+        if workers > 0:
+            self.service = OCR_Service(workers, language, use_gpu, rec_batch_size, engine_factory)
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self.state = 'not loaded'  # 'not loaded', 'loading', 'ready' or 'error'
+        self.on_state = None  # Function called with the new state when it changes
+        self._warm_up_thread = None
+        # Recognition batch timing, see rec_batch()
+        self.rec_batch_size = rec_batch_size
+        self.rec_stats = {'batches': 0, 'images': 0, 'total_ms': 0.0, 'last_ms': 0.0, 'last_images': 0}
+        # Cache of OCR results by image, see OCR_Cache
+        self.cache = OCR_Cache(cache_size, cache_ttl, cache_mode)
+        # Use recognition only OCR for highlighted items, see image_rec_ocr()
+        self.rec_only = rec_only
+        self.rec_min_conf = rec_min_conf
+        # Saves the highlighted item search images, off unless set up, see Debug_Recorder
+        self.debug_recorder = Debug_Recorder()
+        # Reads digit only fields without the OCR model once calibrated, see image_digits_ocr()
+        self.digit_reader = Digit_Reader()
+        self.digit_stats = {'glyph': 0, 'ocr': 0}
         # Class for text similarity metrics
         self.jarowinkler = JaroWinkler()
         self.sorensendice = SorensenDice()
+        # Fuzzy match indexes by vocabulary, see fuzzy_index()
+        self._fuzzy_indexes = OrderedDict()
+        self._fuzzy_lock = threading.Lock()
+
+    @property
+    def paddleocr(self):
+        """ The PaddleOCR model of this process, made on first use. """
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    self._set_state('loading')
+                    start = time.perf_counter()
+                    try:
+                        self._engine = self.engine_factory(self.language, self.use_gpu, self.rec_batch_size)
+                    except Exception:
+                        self._set_state('error')
+                        raise
+                    logger.info(f"OCR model loaded in {time.perf_counter() - start:.1f}s")
+                    self._set_state('ready')
+        return self._engine
+
+    def is_ready(self) -> bool:
+        return self.state == 'ready'
+
+    def warm_up(self):
+        """ Load the model and run a first OCR on a background thread, so the first real OCR is fast. """
+        if self._warm_up_thread is not None or self.is_ready():
+            return
+        self._warm_up_thread = threading.Thread(target=self._warm_up, name="OCR_Warm_Up", daemon=True)
+        self._warm_up_thread.start()
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        image = np.full((48, 160, 3), 255, dtype=np.uint8)
+        cv2.putText(image, 'WARM UP', (8, 34), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        try:
+            if self.service is not None:
+                self._set_state('loading')
+                self._ocr_model(image)  # Starts the workers, which load their models
+                self._set_state('ready')
+            else:
+                self._ocr_model(image)
+            logger.info(f"OCR warm up done in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            self._set_state('error')
+            logger.warning(f"OCR warm up failed: {e}")
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_state is not None:
+            try:
+                self.on_state(state)
+            except Exception as e:
+                logger.debug(f"OCR on_state error: {e}")
 
     def string_similarity(self, s1, s2) -> float:
         """ Performs a string similarity check and returns the result.
@@ -39,9 +143,30 @@ class OCR:
         #return self.jarowinkler.similarity(s1, s2)
         return self.sorensendice.similarity(s1, s2)
 
+    def fuzzy_index(self, vocabulary: list[str], strip_spaces: bool = True) -> Fuzzy_Index:
+        """ Get the fuzzy match index of a fixed vocabulary (i.e. the commodity names or mission prefixes
+        of a scan loop), built on first use and kept for the next calls with the same vocabulary. Not
+        for one-off lists such as OCR output, which would push the fixed vocabularies out.
+        @param vocabulary: The strings to match against.
+        @param strip_spaces: Ignore spaces when comparing.
+        """
+        key = (tuple(vocabulary), strip_spaces)
+        with self._fuzzy_lock:
+            index = self._fuzzy_indexes.get(key)
+            if index is not None:
+                self._fuzzy_indexes.move_to_end(key)
+                return index
+        index = Fuzzy_Index(vocabulary, strip_spaces)
+        with self._fuzzy_lock:
+            self._fuzzy_indexes[key] = index
+            while len(self._fuzzy_indexes) > 32:
+                self._fuzzy_indexes.popitem(last=False)
+        return index
+
     def find_best_match_in_list(self, ocr_textlist: list[str], target_text: str, threshold: float = 0.6) -> str | None:
         """
         Finds the best fuzzy match for a target string in a list of OCR results.
+        The list changes with every read, so it is scanned rather than indexed.
         """
         best_match_score = 0
         best_match_text = None
@@ -49,12 +174,9 @@ class OCR:
         if not ocr_textlist:
             return None
 
+        target = shingles(normalize_ocr_text(target_text))
         for ocr_text in ocr_textlist:
-            # Pre-process strings
-            s1 = ocr_text.upper().replace("O", "0").replace(" ", "").replace("L", "1")
-            s2 = target_text.upper().replace("O", "0").replace(" ", "").replace("L", "1")
-            
-            score = self.string_similarity(s1, s2)
+            score = dice_similarity(shingles(normalize_ocr_text(ocr_text)), target)
             if score > best_match_score:
                 best_match_score = score
                 best_match_text = ocr_text
@@ -64,34 +186,122 @@ class OCR:
         else:
             return None
 
+    def find_best_match_in_vocabulary(self, vocabulary: list[str], text: str, threshold: float = 0.6) -> str | None:
+        """
+        Finds the entry of a fixed vocabulary (i.e. commodity names) that best matches an OCR'd string,
+        using the cached index of the vocabulary, see fuzzy_index().
+        """
+        if not vocabulary or not text:
+            return None
+        return self.fuzzy_index(vocabulary).best(text, threshold)
+
     def find_fuzzy_pattern_in_text(self, text_body: str, patterns: list[str], threshold: float = 0.8) -> str | None:
         """
         Finds the best fuzzy matching pattern from a list that matches the start of a text body.
         """
-        best_match_score = 0
-        best_match_pattern = None
-
         if not text_body or not patterns:
             return None
-
-        for pattern in patterns:
-            # Get substring of text_body to compare against
-            candidate_substring = text_body[:len(pattern)]
-            
-            # Pre-process for better comparison
-            s1 = candidate_substring.upper().replace("O", "0").replace("L", "1")
-            s2 = pattern.upper().replace("O", "0").replace("L", "1")
-
-            score = self.string_similarity(s1, s2)
-            
-            if score > best_match_score:
-                best_match_score = score
-                best_match_pattern = pattern
-        
-        if best_match_score >= threshold:
-            return best_match_pattern
+        return self.fuzzy_index(patterns, strip_spaces=False).best_prefix(text_body, threshold)
+
+    def _ocr(self, image):
+        """ Run the OCR model on the image, or get the result from the cache if the same image was
+        done recently. """
+        return self.cache.lookup(image, 'ocr', self._ocr_model)
+
+    def _ocr_model(self, image):
+        if self.service is not None:
+            return self.service.submit_ocr(image).result()
+        return self.paddleocr.ocr(image)
+
+    def _rec_model(self, images: list) -> list[tuple[str, float]]:
+        """ Run the recognition model on a list of single line images, batched rec_batch_size at a time.
+        Returns the text and confidence of each. """
+        start = time.perf_counter()
+        if self.service is not None:
+            results = self.service.submit_rec(images).result()
         else:
-            return None
+            results = recognize(self.paddleocr, images)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.rec_stats['batches'] += 1
+        self.rec_stats['images'] += len(images)
+        self.rec_stats['total_ms'] += elapsed
+        self.rec_stats['last_ms'] = elapsed
+        self.rec_stats['last_images'] = len(images)
+        logger.debug(f"OCR rec batch: {len(images)} images in {elapsed:.1f}ms")
+        return results
+
+    def rec_batch(self, images: list) -> list[tuple[str, float]]:
+        """ Run only the recognition model on a list of images of a single line of text each, as one
+        batch. Cached images are not run again. See rec_stats for the timings.
+        @param images: The images.
+        @return: The text and confidence of each image, in order.
+        """
+        return self.cache.lookup_batch(images, 'rec', self._rec_model)
+
+    def submit(self, image) -> Future:
+        """ Start OCR of the image, as image_simple_ocr(), without waiting for the result. With OCR
+        workers, the caller can carry on (i.e. press the next key) while the image is recognized.
+        Without workers the OCR is done before returning.
+        @param image: The image.
+        @return: A Future of the list of strings, or None if no text.
+        """
+        future = Future()
+        key = self.cache.key(image, 'ocr') if self.cache.enabled else None
+        missing = object()
+        cached = self.cache.get(key, missing) if key is not None else missing
+        if cached is not missing:
+            future.set_result(ocr_textlist(cached))
+        elif self.service is None:
+            future.set_result(self.image_simple_ocr(image))
+        else:
+            def done(f):
+                try:
+                    ocr_data = f.result()
+                    if key is not None:
+                        self.cache.put(key, ocr_data)
+                    future.set_result(ocr_textlist(ocr_data))
+                except Exception as e:
+                    future.set_exception(e)
+
+            self.service.submit_ocr(image).add_done_callback(done)
+        return future
+
+    def close(self):
+        """ Stop the OCR worker processes. """
+        if self.service is not None:
+            self.service.shutdown(wait=False)
+            self.service = None
+
+    def image_rec_ocr(self, image):
+        """ Perform recognition only OCR on an image of one or a few lines of text, i.e. a highlighted
+        item, skipping the text detection which is most of the OCR time. Multiple lines are split and
+        recognized separately. Falls back to image_ocr() if any line is below rec_min_conf.
+        Returns the OCR data and a simplified list of strings in the same format as image_ocr().
+        """
+        return self.image_rec_ocr_batch([image])[0]
+
+    def image_rec_ocr_batch(self, images: list) -> list:
+        """ Perform image_rec_ocr() on a list of images, recognizing all the lines of all the images as
+        one batch.
+        @param images: The images.
+        @return: The (OCR data, list of strings) of each image, in order.
+        """
+        all_lines = [split_text_lines(image) for image in images]
+        crops = [image[top:bottom] for image, lines in zip(images, all_lines) for top, bottom in lines]
+        recs = self.rec_batch(crops)
+
+        results = []
+        pos = 0
+        for image, lines in zip(images, all_lines):
+            image_recs = recs[pos:pos + len(lines)]
+            pos += len(lines)
+            if not any(text for text, conf in image_recs) or any(conf < self.rec_min_conf for text, conf in image_recs):
+                logger.debug(f"image_rec_ocr: low confidence {image_recs}, using full OCR")
+                results.append(self.image_ocr(image))
+            else:
+                results.append(rec_to_ocr_data(lines, image.shape[1], image_recs))
+        return results
 
     def image_ocr(self, image):
         """ Perform OCR with no filtering. Returns the full OCR data and a simplified list of strings.
@@ -100,7 +310,7 @@ class OCR:
         OCR Data is returned in the following format, or (None, None):
         [[[[[86.0, 8.0], [208.0, 8.0], [208.0, 34.0], [86.0, 34.0]], ('ROBIGO 1 A', 0.9815958738327026)]]]
         """
-        ocr_data = self.paddleocr.ocr(image)
+        ocr_data = self._ocr(image)
 
         # print(ocr_data)
 
@@ -125,7 +335,7 @@ class OCR:
         OCR Data is returned in the following format, or None:
         [[[[[86.0, 8.0], [208.0, 8.0], [208.0, 34.0], [86.0, 34.0]], ('ROBIGO 1 A', 0.9815958738327026)]]]
         """
-        ocr_data = self.paddleocr.ocr(image)
+        ocr_data = self._ocr(image)
 
         # print(f"image_simple_ocr: {ocr_data}")
 
@@ -144,6 +354,29 @@ class OCR:
             # logger.info(f"image_simple_ocr: {ocr_textlist}")
             return ocr_textlist
 
+    def image_digits_ocr(self, image) -> list[str] | None:
+        """ Read a field holding only digits and a slash (i.e. the commodity quantity '12/200').
+        Uses the glyph templates of the digit reader, falling back to the OCR model when the reader is
+        not sure. A confident OCR model result is learned by the reader, so it is calibrated from the
+        game's own font as it is used.
+        @param image: The image of one line of text.
+        @return: A list of strings as image_simple_ocr(), or None if no text.
+        """
+        if self.digit_reader.enabled:
+            text, conf = self.digit_reader.read(image)
+            if text and conf >= self.digit_reader.min_conf:
+                self.digit_stats['glyph'] += 1
+                return [text]
+
+        self.digit_stats['ocr'] += 1
+        ocr_data = self._ocr(image)
+        textlist = ocr_textlist(ocr_data)
+        if self.digit_reader.enabled and textlist and len(textlist) == 1:
+            conf = ocr_data[0][0][1][1]
+            if conf >= self.digit_reader.min_conf:
+                self.digit_reader.learn(image, textlist[0])
+        return textlist
+
     def get_highlighted_item_data(self, image, min_w, min_h):
         """ Attempts to find a selected item in an image. The selected item is identified by being solid orange or blue
             rectangle with dark text, instead of orange/blue text on a dark background.
@@ -157,7 +390,10 @@ class OCR:
         if img_selected is not None:
             # cv2.imshow("img", img_selected)
 
-            ocr_data, ocr_textlist = self.image_ocr(img_selected)
+            if self.rec_only:
+                ocr_data, ocr_textlist = self.image_rec_ocr(img_selected)
+            else:
+                ocr_data, ocr_textlist = self.image_ocr(img_selected)
 
             if ocr_data is not None:
                 return img_selected, ocr_data, ocr_textlist
@@ -176,32 +412,36 @@ class OCR:
         @param min_h: Minimum height in pixels.
         @param min_w: Minimum width in pixels.
         """
+        sample = self.debug_recorder.sample('highlighted_item')
+
         # Perform HSV mask
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         lower_range = np.array([0, 100, 180])
         upper_range = np.array([255, 255, 255])
         mask = cv2.inRange(hsv, lower_range, upper_range)
         masked_image = cv2.bitwise_and(image, image, mask=mask)
-        cv2.imwrite('test/nav-panel/out/1-masked.png', masked_image)
+        sample.add('1-masked', masked_image)
 
         # Convert to gray scale and invert
         gray = cv2.cvtColor(masked_image, cv2.COLOR_BGR2GRAY)
-        cv2.imwrite('test/nav-panel/out/2-gray.png', gray)
+        sample.add('2-gray', gray)
 
         # Blur slightly to remove thin lines
         blur = cv2.GaussianBlur(gray, (3, 3), cv2.BORDER_DEFAULT)
-        cv2.imwrite('test/nav-panel/out/3-blur.png', blur)
+        sample.add('3-blur', blur)
 
         # Convert to B&W to allow FindContours to find rectangles.
         ret, thresh1 = cv2.threshold(blur, 0, 255, cv2.THRESH_OTSU)  # | cv2.THRESH_BINARY_INV)
-        cv2.imwrite('test/nav-panel/out/4-thresh1.png', thresh1)
+        sample.add('4-thresh1', thresh1)
 
         # Finding contours in B&W image. White are the areas detected
         contours, hierarchy = cv2.findContours(thresh1, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        output = image
-        cv2.drawContours(output, contours, -1, (0, 255, 0), 2)
-        cv2.imwrite('test/nav-panel/out/5-contours.png', output)
+        if sample.active:
+            # Draw on a copy, the caller's image is not changed
+            output = image.copy()
+            cv2.drawContours(output, contours, -1, (0, 255, 0), 2)
+            sample.add('5-contours', output)
 
         # bounds = image
         cropped = image
@@ -216,10 +456,13 @@ class OCR:
                 cropped = image[y:y + h, x:x + w]
 
                 # cv2.imshow("cropped", cropped)
-                cv2.imwrite('test/nav-panel/out/6-selected_item.png', cropped)
+                if sample.active:
+                    sample.add('6-selected_item', cropped.copy())  # The crop is a view of the caller's image
+                sample.finish(True)
                 return cropped, x, y
 
         # No good matches, then return None
+        sample.finish(False)
         return None, 0, 0
 
     def capture_region_pct(self, region):
@@ -245,7 +488,10 @@ class OCR:
             logger.debug(f"Did not find a selected item in the region.")
             return None
 
-        ocr_textlist = self.image_simple_ocr(img_selected)
+        if self.rec_only:
+            ocr_data, ocr_textlist = self.image_rec_ocr(img_selected)
+        else:
+            ocr_textlist = self.image_simple_ocr(img_selected)
         # print(str(ocr_textlist))
 
         if text.upper() in str(ocr_textlist).upper():
@@ -322,22 +568,30 @@ class OCR:
 
         start_time = time.time()
         text_found = False
+        gate = _Change_Gate()
         while True:
             # Check for timeout.
             if time.time() > (start_time + timeout):
                 break
 
-            # Check if screen has appeared.
-            for text in texts:
-                text_found, ocr_text = self.is_text_in_region(text, region)
+            # Check if screen has appeared. One OCR per poll for all the texts, none if the region is unchanged.
+            img = self.capture_region_pct(region)
+            if img is not None and gate.changed(img):
+                ocr_textlist = self.image_simple_ocr(img)
+                ocr_text = str(ocr_textlist)
 
                 # Over OCR result
                 if ap.debug_overlay:
                     ap.overlay.overlay_floating_text('wait_for_text', f'{ocr_text}', abs_rect[0], abs_rect[1] - 25, (0, 255, 0))
                     ap.overlay.overlay_paint()
 
-                if text_found:
-                    break
+                for text in texts:
+                    if text.upper() in ocr_text.upper():
+                        logger.debug(f"Found '{text}' text in item text '{ocr_text}'.")
+                        text_found = True
+                        break
+                else:
+                    logger.debug(f"Did not find '{texts}' text in item text '{ocr_text}'.")
 
             if text_found:
                 break
@@ -367,16 +621,17 @@ class OCR:
 
         start_time = time.time()
         text_found = False
+        gate = _Change_Gate()
         while True:
             # Check for timeout.
             if time.time() > (start_time + timeout):
                 break
 
             img = self.capture_region_pct(region)
-            if img is None:
+            if img is None or not gate.changed(img):
                 time.sleep(0.25)
                 continue
-            
+
             ocr_textlist = self.image_simple_ocr(img)
 
             # Over OCR result
@@ -416,14 +671,15 @@ class OCR:
 
         start_time = time.time()
         text_found = False
+        gate = _Change_Gate()
         while True:
             # Check for timeout.
             if time.time() > (start_time + timeout):
                 break
 
-            # Check if screen has appeared.
+            # Check if screen has appeared. Not searched again if the region is unchanged.
             img = self.capture_region_pct(region)
-            if img is None:
+            if img is None or not gate.changed(img):
                 time.sleep(0.25)
                 continue
 
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+"""
+File:OCR_Cache.py
+
+Description:
+  LRU cache of OCR results keyed by a hash of the image, so the same crop OCR'd again (i.e. while
+  scrolling a list, or waiting for a panel to change) returns the cached text without running the
+  OCR model. Entries older than ttl seconds are not used.
+
+  The key is an exact hash of the image pixels by default. The 'perceptual' mode uses a difference
+  hash of a small gray scale copy of the image instead, so crops that differ only by noise share
+  an entry, at the risk of small text changes (i.e. a single digit) being missed.
+"""
+
+_MISS = object()
+
+
+def exact_hash(image) -> str:
+    """ Get a hash of the image pixels, shape and type. """
+    image = np.ascontiguousarray(image)
+    h = hashlib.blake2b(image.data, digest_size=16)
+    h.update(str((image.shape, image.dtype.str)).encode())
+    return h.hexdigest()
+
+
+def perceptual_hash(image, size: tuple[int, int] = (32, 16)) -> str:
+    """ Get a difference hash of the image: each bit is whether a pixel of a small gray scale copy is
+    brighter than the one to its right.
+    @param size: The (width, height) of the copy. Larger is more sensitive to small changes.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (size[0] + 1, size[1]), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return f"{image.shape[1]}x{image.shape[0]}:" + np.packbits(bits).tobytes().hex()
+
+
+class OCR_Cache:
+    def __init__(self, max_size: int = 256, ttl: float = 30.0, mode: str = 'exact'):
+        """
+        @param max_size: The maximum number of results kept, 0 to disable the cache.
+        @param ttl: Results older than this many seconds are not used.
+        @param mode: 'exact' or 'perceptual', see the description.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (time added, result)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key(self, image, kind: str = '') -> str:
+        """ Get the cache key of the image.
+        @param kind: The kind of OCR, so different OCR of the same image have different keys.
+        """
+        if self.mode == 'perceptual':
+            return kind + ':' + perceptual_hash(image)
+        return kind + ':' + exact_hash(image)
+
+    def get(self, key, default=None):
+        """ Get a copy of the cached result, or default if not cached or expired. """
+        with self._lock:
+            entry = self._entries.get(key, _MISS)
+            if entry is not _MISS and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = _MISS
+            if entry is _MISS:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[1]
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def lookup(self, image, kind: str, func):
+        """ Get the result of func(image) from the cache, or run it and cache the result.
+        @param image: The image.
+        @param kind: The kind of OCR, see key().
+        @param func: The function to run on a miss.
+        """
+        if not self.enabled:
+            return func(image)
+        key = self.key(image, kind)
+        result = self.get(key, _MISS)
+        if result is _MISS:
+            result = func(image)
+            self.put(key, result)
+        return result
+
+    def lookup_batch(self, images: list, kind: str, func_batch) -> list:
+        """ Get the results of a list of images, running func_batch() once on the list of the images
+        not cached (each distinct image once) and caching their results.
+        @param images: The images.
+        @param kind: The kind of OCR, see key().
+        @param func_batch: The function to run on the list of missed images, returning a list of results.
+        @return: The results in the order of the images.
+        """
+        if not self.enabled:
+            return list(func_batch(images)) if images else []
+
+        results = [_MISS] * len(images)
+        missed = {}  # key -> indexes of the images with that key
+        for i, image in enumerate(images):
+            key = self.key(image, kind)
+            if key in missed:
+                missed[key].append(i)
+                continue
+            results[i] = self.get(key, _MISS)
+            if results[i] is _MISS:
+                missed[key] = [i]
+
+        if missed:
+            keys = list(missed)
+            batch = func_batch([images[missed[key][0]] for key in keys])
+            for key, result in zip(keys, batch):
+                self.put(key, result)
+                for i in missed[key]:
+                    results[i] = copy.deepcopy(result)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / total if total else 0.0}
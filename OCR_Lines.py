@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+"""
+File:OCR_Lines.py
+
+Description:
+  Helpers for recognition only OCR of pre-cropped text, i.e. a highlighted list row, where the
+  text detector can be skipped. The crop is split into text lines with a horizontal projection
+  profile (only when there is more than one line) and the recognizer results are put into the
+  same format as the full detection + recognition OCR data.
+"""
+
+
+def split_text_lines(image, margin: int = 3, min_gap: int = 2, min_height_frac: float = 0.4) -> list[tuple[int, int]]:
+    """ Find the text lines in an image of one or more lines of text.
+    @param image: The image, BGR or gray.
+    @param margin: Pixels at the edges to ignore, i.e. the highlight box border.
+    @param min_gap: Blank rows between two bands of text for them to be separate lines.
+    @param min_height_frac: Bands shorter than this fraction of the tallest are noise, not lines.
+    @return: The (top, bottom) rows of each line, or the whole image if one line or none found.
+    """
+    h, w = image.shape[:2]
+    whole = [(0, h)]
+    if h <= 2 * margin or w <= 2 * margin:
+        return whole
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # Text is the minority class, dark on a highlight or light on a dark background
+    if np.count_nonzero(binary) > binary.size / 2:
+        binary = 255 - binary
+    inner = binary[margin:h - margin, margin:w - margin]
+    has_text = np.count_nonzero(inner, axis=1) > 0
+
+    # Bands of rows with text, joining bands separated by small gaps
+    bands = []
+    start = None
+    gap = 0
+    for row, text in enumerate(has_text):
+        if text:
+            if start is None:
+                start = row
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap >= min_gap:
+                bands.append((start, row - gap + 1))
+                start = None
+                gap = 0
+    if start is not None:
+        bands.append((start, len(has_text) - gap))
+
+    if not bands:
+        return whole
+    tallest = max(b - t for t, b in bands)
+    lines = [(t, b) for t, b in bands if b - t >= tallest * min_height_frac]
+    if len(lines) < 2:
+        return whole
+
+    # Back to image rows, splitting the space between lines
+    result = []
+    for i, (t, b) in enumerate(lines):
+        top = 0 if i == 0 else (lines[i - 1][1] + t) // 2 + margin
+        bottom = h if i == len(lines) - 1 else (b + lines[i + 1][0]) // 2 + margin
+        result.append((top, bottom))
+    return result
+
+
+def rec_to_ocr_data(lines: list[tuple[int, int]], width: int, recs: list[tuple[str, float]]):
+    """ Put recognition only results in the format of the full OCR data, with each line's box being
+    the full width of its rows.
+    @param lines: The (top, bottom) rows of each line.
+    @param width: The image width.
+    @param recs: The (text, confidence) of each line.
+    @return: The OCR data and the list of strings.
+    """
+    res = []
+    textlist = []
+    for (top, bottom), (text, conf) in zip(lines, recs):
+        if not text:
+            continue
+        box = [[0.0, float(top)], [float(width), float(top)], [float(width), float(bottom)], [0.0, float(bottom)]]
+        res.append([box, (text, conf)])
+        textlist.append(text)
+    return [res], textlist
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+"""
+File:OCR_Service.py
+
+Description:
+  Runs OCR in worker processes, each holding its own OCR model, so OCR does not hold the GIL of the
+  AP process and key sending, status polling and the overlay carry on while it runs. Images are
+  passed to the workers in shared memory, and each request returns a Future, so a caller can carry
+  on (i.e. press the scroll key) while the last image is recognized.
+
+  future = service.submit(image)
+  ...
+  textlist = future.result()
+
+  The model is made in each worker by engine_factory(language, use_gpu, rec_batch_size), which by
+  default makes a PaddleOCR. PaddleOCR is only imported in the workers.
+"""
+
+
+def paddle_engine(language: str = 'en', use_gpu: bool = False, rec_batch_size: int = 6):
+    """ Make the PaddleOCR model, with the settings used by the OCR class. """
+    from paddleocr import PaddleOCR
+    engine = PaddleOCR(use_angle_cls=False, lang=language, use_gpu=use_gpu, show_log=False, use_dilation=True,
+                       use_space_char=True, rec_batch_num=rec_batch_size)
+    logging.getLogger('ppocr').setLevel(logging.ERROR)
+    return engine
+
+
+def recognize(engine, images: list) -> list[tuple[str, float]]:
+    """ Run only the recognition model of the engine on a list of single line images, as one batch.
+    Returns the text and confidence of each. """
+    images = [cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img for img in images]
+    recognizer = getattr(engine, 'text_recognizer', None)
+    if recognizer is not None:
+        rec_res, _ = recognizer(images)
+        return [(text, float(conf)) for text, conf in rec_res]
+
+    # No access to the recognizer, one call per image
+    results = []
+    for img in images:
+        result = engine.ocr(img, det=False, cls=False)
+        # [[('ROBIGO 1 A', 0.98)]]
+        item = result[0] if result and result[0] else ('', 0.0)
+        if isinstance(item, list):
+            item = item[0]
+        results.append((item[0], float(item[1])))
+    return results
+
+
+def ocr_textlist(ocr_data) -> list[str] | None:
+    """ Get the list of strings from the full OCR data, or None if no text. """
+    if ocr_data is None:
+        return None
+    textlist = []
+    for res in ocr_data:
+        if res is None:
+            return None
+        for line in res:
+            textlist.append(line[1][0])
+    return textlist
+
+
+# The model of this worker process
+_engine = None
+
+
+def _init_worker(engine_factory, language, use_gpu, rec_batch_size):
+    global _engine
+    _engine = engine_factory(language, use_gpu, rec_batch_size)
+
+
+def _read_shared(desc):
+    """ Copy an image out of shared memory. """
+    name, shape, dtype = desc
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def _worker_ocr(desc):
+    return _engine.ocr(_read_shared(desc))
+
+
+def _worker_rec(descs):
+    return recognize(_engine, [_read_shared(desc) for desc in descs])
+
+
+class OCR_Service:
+    def __init__(self, workers: int = 1, language: str = 'en', use_gpu: bool = False, rec_batch_size: int = 6,
+                 engine_factory=paddle_engine, mp_context: str = 'spawn'):
+        """
+        @param workers: The number of worker processes, each with a model.
+        @param language: The OCR language.
+        @param use_gpu: Use the GPU for OCR.
+        @param rec_batch_size: The recognition batch size.
+        @param engine_factory: Top level function to make the model in each worker.
+        @param mp_context: The multiprocessing start method.
+        """
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(mp_context),
+                                         initializer=_init_worker,
+                                         initargs=(engine_factory, language, use_gpu, rec_batch_size))
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def submit_ocr(self, image) -> Future:
+        """ Run full OCR (detection and recognition) on the image.
+        @return: A Future of the OCR data, as PaddleOCR.ocr().
+        """
+        blocks, desc = self._share([image])
+        return self._submit(blocks, _worker_ocr, desc[0])
+
+    def submit_rec(self, images: list) -> Future:
+        """ Run recognition only on a list of single line images, as one batch.
+        @return: A Future of the list of (text, confidence), in order.
+        """
+        blocks, descs = self._share(images)
+        return self._submit(blocks, _worker_rec, descs)
+
+    def submit(self, image) -> Future:
+        """ Run full OCR on the image.
+        @return: A Future of the list of strings, or None if no text, as OCR.image_simple_ocr().
+        """
+        result = Future()
+        inner = self.submit_ocr(image)
+
+        def done(f):
+            try:
+                result.set_result(ocr_textlist(f.result()))
+            except Exception as e:
+                result.set_exception(e)
+
+        inner.add_done_callback(done)
+        return result
+
+    def _share(self, images):
+        """ Copy the images into shared memory. Returns the blocks and their descriptions. """
+        blocks = []
+        descs = []
+        try:
+            for image in images:
+                image = np.ascontiguousarray(image)
+                shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+                blocks.append(shm)
+                np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+                descs.append((shm.name, image.shape, image.dtype.str))
+        except Exception:
+            self._release(blocks)
+            raise
+        return blocks, descs
+
+    @staticmethod
+    def _release(blocks):
+        for shm in blocks:
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _submit(self, blocks, func, arg) -> Future:
+        try:
+            future = self._pool.submit(func, arg)
+        except Exception:
+            self._release(blocks)
+            raise
+        # The worker has copied the image once done, so free the shared memory
+        future.add_done_callback(lambda f: self._release(blocks))
+        return future
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+
+from EDlogger import logger
+
+"""
+File:PerceptionFrame.py
+
+Description:
+  Class to hold everything the alignment loops need to know about the screen, worked out from a
+  single screen grab: compass presence, nav point offset, target offset, target occlusion and
+  optionally the supercruise disengage label. All the checks see the same moment in time, the
+  compass is matched only once, and the time of each stage is kept for profiling.
+"""
+
+
+class PerceptionFrame:
+    def __init__(self):
+        self.frame = None  # The Screen_Frame all the checks used
+        self.compass_found = False
+        self.nav_offset = None  # As get_nav_offset(), None if the compass was not found
+        self.target_offset = None  # As get_destination_offset(), None if not found or not checked
+        self.occluded = False
+        self.disengage_up = False
+        self.timings = {}  # Stage name -> time taken in ms
+        self.seq = 0  # Sequence number, set by the Vision_Worker that published it
+
+    @property
+    def timestamp(self) -> float:
+        """ The time the screen was grabbed. """
+        return self.frame.timestamp if self.frame is not None else 0.0
+
+    @classmethod
+    def capture(cls, ap, scr_reg, target: bool = True, occlusion: bool = True,
+                disengage: bool = False) -> PerceptionFrame:
+        """ Grab the screen once and work out the state of the compass and target from it.
+        @param ap: The EDAutopilot, which provides the checks.
+        @param scr_reg: The Screen_Regions.
+        @param target: Get the target offset.
+        @param occlusion: Check if the target is occluded.
+        @param disengage: Check for the supercruise disengage label.
+        @return: The PerceptionFrame.
+        """
+        pf = cls()
+        regions = ['compass']
+        if target:
+            regions.append('target')
+        if occlusion:
+            regions.append('target_occluded')
+        if disengage:
+            regions.append('disengage')
+
+        start = time.perf_counter()
+        stage_start = start
+        pf.frame = scr_reg.capture_frame(regions)
+        stage_start = pf._stage('capture', stage_start)
+
+        compass_match = ap.match_compass(scr_reg, pf.frame)
+        pf.compass_found = ap.have_destination(scr_reg, pf.frame, compass_match)
+        stage_start = pf._stage('compass', stage_start)
+
+        if pf.compass_found:
+            pf.nav_offset = ap.get_nav_offset(scr_reg, pf.frame, compass_match)
+            stage_start = pf._stage('nav', stage_start)
+
+        if target:
+            pf.target_offset = ap.get_destination_offset(scr_reg, pf.frame)
+            stage_start = pf._stage('target', stage_start)
+
+        if occlusion:
+            pf.occluded = ap.is_destination_occluded(scr_reg, pf.frame)
+            stage_start = pf._stage('occluded', stage_start)
+
+        if disengage:
+            pf.disengage_up = ap.sc_disengage_label_up(scr_reg, pf.frame)
+            pf._stage('disengage', stage_start)
+
+        pf.timings['total'] = (time.perf_counter() - start) * 1000
+        logger.debug("Perception: " + ", ".join(f"{k} {v:.1f}ms" for k, v in pf.timings.items()))
+        return pf
+
+    def _stage(self, name, stage_start) -> float:
+        """ Record the time of a stage and return the start time of the next. """
+        now = time.perf_counter()
+        self.timings[name] = (now - stage_start) * 1000
+        return now
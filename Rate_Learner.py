@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from collections import deque
+
+import numpy as np
+
+from EDlogger import logger
+
+"""
+File:Rate_Learner.py
+
+Description:
+  Learns the effective roll, pitch and yaw rates of the ship from the compass. Each timed turn in
+  nav_align is followed by a new nav offset, so the degrees actually turned divided by the key
+  hold time is a measurement of the rate. The last window measurements of each axis give the
+  learned rate (the mean) and a 95% confidence interval. A learned rate is only used once there
+  are min_samples measurements and the interval is within max_rel_ci of the rate.
+
+  The rate is the effective rate for a timed hold, so includes the ship's spin up and down, which
+  is what the hold time calculation needs.
+"""
+
+AXES = ['roll', 'pitch', 'yaw']
+
+
+def angle_diff(a: float, b: float) -> float:
+    """ Get the difference a - b of two angles in degrees, in the range -180 to 180. """
+    return (a - b + 180.0) % 360.0 - 180.0
+
+
+class Rate_Estimator:
+    def __init__(self, rate: float, window: int = 20, min_samples: int = 3, max_rel_ci: float = 0.15):
+        """
+        @param rate: The configured rate (deg/s), used until the learned rate is confident.
+        @param window: The number of recent measurements to use.
+        @param min_samples: The number of measurements needed before the learned rate is used.
+        @param max_rel_ci: The 95% confidence interval must be within this fraction of the rate.
+        """
+        self.configured = rate
+        self.min_samples = min_samples
+        self.max_rel_ci = max_rel_ci
+        self.samples = deque(maxlen=window)
+
+    def add(self, commanded: float, moved: float, hold: float) -> bool:
+        """ Add a measurement.
+        @param commanded: The degrees the turn was meant to move.
+        @param moved: The degrees it actually moved.
+        @param hold: The key hold time in seconds.
+        @return: True if used, False if rejected as a bad measurement.
+        """
+        if hold <= 0 or commanded <= 0:
+            return False
+        # A bad match or the nav point moving behind us gives a wild value
+        if not 0.25 * commanded <= moved <= 4 * commanded:
+            return False
+        self.samples.append(moved / hold)
+        return True
+
+    def estimate(self) -> tuple[float, float] | None:
+        """ Get the learned rate and the half width of its 95% confidence interval.
+        @return: (rate, ci), or None if there are no measurements.
+        """
+        if not self.samples:
+            return None
+        samples = np.array(self.samples)
+        mean = float(np.mean(samples))
+        if len(samples) < 2:
+            return mean, float('inf')
+        ci = 1.96 * float(np.std(samples, ddof=1)) / np.sqrt(len(samples))
+        return mean, ci
+
+    def is_confident(self) -> bool:
+        est = self.estimate()
+        if est is None or len(self.samples) < self.min_samples:
+            return False
+        rate, ci = est
+        return rate > 0 and ci <= self.max_rel_ci * rate
+
+    @property
+    def rate(self) -> float:
+        """ The learned rate if confident, else the configured rate. """
+        if self.is_confident():
+            return self.estimate()[0]
+        return self.configured
+
+
+class Rate_Learner:
+    def __init__(self, roll_rate: float = 80.0, pitch_rate: float = 33.0, yaw_rate: float = 8.0):
+        self.estimators = {}
+        self.reset(roll_rate, pitch_rate, yaw_rate)
+
+    def reset(self, roll_rate: float, pitch_rate: float, yaw_rate: float):
+        """ Start learning again from the configured rates, i.e. on a ship change. """
+        self.estimators = {'roll': Rate_Estimator(roll_rate),
+                           'pitch': Rate_Estimator(pitch_rate),
+                           'yaw': Rate_Estimator(yaw_rate)}
+
+    def observe(self, axis: str, commanded: float, hold: float, before: float, after: float) -> bool:
+        """ Add a measurement from the nav offsets before and after a timed turn.
+        @param axis: 'roll', 'pitch' or 'yaw'.
+        @param commanded: The degrees the turn was meant to move.
+        @param hold: The key hold time in seconds.
+        @param before: The axis offset (deg) before the turn.
+        @param after: The axis offset (deg) after the turn.
+        @return: True if the measurement was used.
+        """
+        moved = abs(angle_diff(after, before))
+        used = self.estimators[axis].add(commanded, moved, hold)
+        logger.debug(f"rate learn: {axis} commanded {commanded:.1f} moved {moved:.1f} "
+                     f"in {hold:.2f}s {'used' if used else 'rejected'}")
+        return used
+
+    def rate(self, axis: str) -> float:
+        return self.estimators[axis].rate
+
+    def changed(self, axis: str, rel: float = 0.05) -> bool:
+        """ Check if the learned rate is confident and differs from the configured one by more than rel. """
+        est = self.estimators[axis]
+        return est.is_confident() and abs(est.rate - est.configured) > rel * est.configured
+
+    def stats(self) -> dict:
+        """ Get the learned rate, confidence interval and number of measurements of each axis. """
+        result = {}
+        for axis, est in self.estimators.items():
+            rate_ci = est.estimate()
+            result[axis] = {
+                'rate': round(rate_ci[0], 2) if rate_ci else None,
+                'ci': round(rate_ci[1], 2) if rate_ci and np.isfinite(rate_ci[1]) else None,
+                'count': len(est.samples),
+            }
+        return result
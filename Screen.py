@@ -1,13 +1,20 @@
 from __future__ import annotations
+import threading
 import typing
 import cv2
-import win32con
-import win32gui
-from numpy import array
-import mss
 import json
 
 from EDlogger import logger
+from Screen_Capture import CaptureSource, MssCapture, CaptureThread
+
+# win32 is only available on Windows. Without it, the ED window cannot be found, which is
+# fine when using a replay capture source (i.e. testing on Linux).
+try:
+    import win32con
+    import win32gui
+except ImportError:
+    win32con = None
+    win32gui = None
 
 
 """
@@ -32,6 +39,8 @@ def set_focus_elite_window():
     """ set focus to the ED window, if ED does not have focus then the keystrokes will go to the window
     that does have focus. """
     ed_title = "Elite - Dangerous (CLIENT)"
+    if win32gui is None:
+        return
 
     # TODO - determine if GetWindowText is faster than FindWindow if ED is in foreground
     if win32gui.GetWindowText(win32gui.GetForegroundWindow()) == ed_title:
@@ -48,29 +57,39 @@ def set_focus_elite_window():
 
 
 class Screen:
-    def __init__(self, cb):
+    def __init__(self, cb, capture: CaptureSource | None = None):
+        """
+        @param cb: The callback.
+        @param capture: The capture source. Defaults to live capture of the screen using mss.
+            Use a replay source from Screen_Capture to run from recorded images or video.
+        """
         self.ap_ckb = cb
-        self.mss = mss.mss()
+        self.capture = capture if capture is not None else MssCapture()
         self.using_screen = True  # True to use screen, false to use an image. Set screen_image to the image
         self._screen_image = None  # Screen image captured from screen, or loaded by user for testing.
+        self.capture_thread = None  # Optional background capture, see start_capture_thread()
+        self._local = threading.local()  # Per thread state, see last_timestamp
 
         # Find ED window position to determine which monitor it is on
-        ed_rect = self.get_elite_window_rect()
-        if ed_rect is None:
-            self.ap_ckb('log', f"ERROR: Could not find window {elite_dangerous_window}.")
-            logger.error(f'Could not find window {elite_dangerous_window}.')
-        else:
-            logger.debug(f'Found Elite Dangerous window position: {ed_rect}')
+        # A replay source is a single 'monitor' the size of the recorded frames.
+        ed_rect = None
+        if isinstance(self.capture, MssCapture):
+            ed_rect = self.get_elite_window_rect()
+            if ed_rect is None:
+                self.ap_ckb('log', f"ERROR: Could not find window {elite_dangerous_window}.")
+                logger.error(f'Could not find window {elite_dangerous_window}.')
+            else:
+                logger.debug(f'Found Elite Dangerous window position: {ed_rect}')
 
         # Examine all monitors to determine match with ED
-        self.mons = self.mss.monitors
+        self.mons = self.capture.get_monitors()
         mon_num = 0
         for item in self.mons:
             if mon_num > 0:  # ignore monitor 0 as it is the complete desktop (dims of all monitors)
                 logger.debug(f'Found monitor {mon_num} with details: {item}')
                 if ed_rect is None:
                     self.monitor_number = mon_num
-                    self.mon = self.mss.monitors[self.monitor_number]
+                    self.mon = self.mons[self.monitor_number]
                     logger.debug(f'Defaulting to monitor {mon_num}.')
                     self.screen_width = item['width']
                     self.screen_height = item['height']
@@ -79,7 +98,7 @@ class Screen:
                     if item['left'] == ed_rect[0] and item['top'] == ed_rect[1]:
                         # Get information of monitor 2
                         self.monitor_number = mon_num
-                        self.mon = self.mss.monitors[self.monitor_number]
+                        self.mon = self.mons[self.monitor_number]
                         logger.debug(f'Elite Dangerous is on monitor {mon_num}.')
                         self.screen_width = item['width']
                         self.screen_height = item['height']
@@ -139,6 +158,8 @@ class Screen:
         """ Gets the ED window rectangle.
         Returns (left, top, right, bottom) or None.
         """
+        if win32gui is None:
+            return None
         hwnd = win32gui.FindWindow(None, elite_dangerous_window)
         if hwnd:
             rect = win32gui.GetWindowRect(hwnd)
@@ -150,6 +171,8 @@ class Screen:
     def elite_window_exists() -> bool:
         """ Does the ED Client Window exist (i.e. is ED running)
         """
+        if win32gui is None:
+            return False
         hwnd = win32gui.FindWindow(None, elite_dangerous_window)
         if hwnd:
             return True
@@ -175,25 +198,83 @@ class Screen:
 
         return s
 
+    @property
+    def last_timestamp(self) -> float:
+        """ Capture time of the last image returned by get_screen() on the calling thread. """
+        return getattr(self._local, 'timestamp', 0.0)
+
+    @last_timestamp.setter
+    def last_timestamp(self, value: float):
+        self._local.timestamp = value
+
     # reg defines a box as a percentage of screen width and height
     def get_screen_region(self, reg, rgb=True):
         image = self.get_screen(int(reg[0]), int(reg[1]), int(reg[2]), int(reg[3]), rgb)
         return image
 
     def get_screen(self, x_left, y_top, x_right, y_bot, rgb=True):    # if absolute need to scale??
-        monitor = {
-            "top": self.mon["top"] + y_top,
-            "left": self.mon["left"] + x_left,
-            "width": x_right - x_left,
-            "height": y_bot - y_top,
-            "mon": self.monitor_number,
-        }
-        image = array(self.mss.grab(monitor))
+        image = None
+        # Use the latest frame from the capture thread if running and the frame covers the area
+        if self.capture_thread is not None:
+            frame = self.capture_thread.latest([x_left, y_top, x_right, y_bot])
+            if frame is not None:
+                image = frame.image
+                self.last_timestamp = frame.timestamp
+
+        if image is None:
+            try:
+                image = self.capture.grab(self.mon["left"] + x_left, self.mon["top"] + y_top,
+                                          x_right - x_left, y_bot - y_top)
+            except EOFError as e:
+                logger.error(f"Screen capture source has ended: {e}")
+                raise
+            if image is None:
+                raise EOFError("Screen capture source returned no image")
+            self.last_timestamp = self.capture.timestamp
         # TODO - mss.grab returns the image in BGR format, so no need to convert to RGB2BGR
         if rgb:
             image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
         return image
         
+    def start_capture_thread(self, rect=None, buffer_size=3, fps=30.0):
+        """ Start grabbing the screen continuously on a background thread. While running, get_screen()
+        returns the area from the latest captured frame, instead of grabbing the screen, if the area is
+        within the captured rect.
+        @param rect: The rect ([L, T, R, B] in pixels) to capture. Defaults to the full screen.
+        @param buffer_size: The number of frames to keep.
+        @param fps: The maximum capture rate. 0 for as fast as possible.
+        """
+        self.stop_capture_thread()
+        if rect is None:
+            rect = [0, 0, self.screen_width, self.screen_height]
+
+        # mss must be created on the thread that uses it, other sources are shared.
+        def source_factory():
+            if isinstance(self.capture, MssCapture):
+                return MssCapture()
+            return self.capture
+
+        self.capture_thread = CaptureThread(source_factory, rect, self.mon["left"], self.mon["top"],
+                                            buffer_size, fps)
+        self.capture_thread.start()
+        logger.debug(f'Started capture thread for {rect} at {fps} fps.')
+
+    def stop_capture_thread(self):
+        """ Stop the background capture thread. """
+        if self.capture_thread is not None:
+            self.capture_thread.stop()
+            self.capture_thread = None
+
+    def wait_for_new_frame(self, timestamp: float, timeout: float = 1.0) -> bool:
+        """ Wait until the capture thread has a frame newer than the timestamp (i.e. the timestamp
+        of the last image used), so the next get_screen() returns a fresh image.
+        Returns immediately if the capture thread is not running, as get_screen() will grab the screen.
+        @return: True if a newer frame is available, False on timeout.
+        """
+        if self.capture_thread is None:
+            return True
+        return self.capture_thread.wait(timestamp, timeout)
+
     def get_screen_rect_pct(self, rect):
         """ Grabs a screenshot and returns the selected region as an image.
         @param rect: A rect array ([L, T, R, B]) in percent (0.0 - 1.0)
@@ -201,9 +282,8 @@ class Screen:
         """
         if self.using_screen:
             abs_rect = self.screen_rect_to_abs(rect)
-            image = self.get_screen(abs_rect[0], abs_rect[1], abs_rect[2], abs_rect[3])
-            # TODO delete this line when COLOR_RGB2BGR is removed from get_screen()
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            image = self.get_screen(abs_rect[0], abs_rect[1], abs_rect[2], abs_rect[3], rgb=False)
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
             return image
         else:
             if self._screen_image is None:
@@ -225,9 +305,8 @@ class Screen:
         """ Grabs a full screenshot and returns the image.
         """
         if self.using_screen:
-            image = self.get_screen(0, 0, self.screen_width, self.screen_height)
-            # TODO delete this line when COLOR_RGB2BGR is removed from get_screen()
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            image = self.get_screen(0, 0, self.screen_width, self.screen_height, rgb=False)
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
             return image
         else:
             if self._screen_image is None:
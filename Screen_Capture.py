@@ -0,0 +1,472 @@
+from __future__ import annotations
+
+import glob
+import os
+import threading
+import time
+
+import cv2
+import mss
+import numpy as np
+from numpy import array
+
+from EDlogger import logger
+from Screen_Frame import Screen_Frame
+
+"""
+File:Screen_Capture.py
+
+Description:
+  Capture sources used by Screen to get images. MssCapture grabs the live screen. The replay
+  sources play back a folder of PNG images or a video file instead, so the vision code can be
+  run and benchmarked without Elite Dangerous running (i.e. on a headless Linux box).
+
+  All sources return images in BGRA format, the same as mss.
+
+  Replay sources support two playback modes:
+    realtime=True  - The current frame follows the wall clock from the first grab, using the
+                     frame timestamps. Frames are skipped or held as they would be on a live screen.
+    realtime=False - As fast as possible. The current frame only changes when next_frame()
+                     is called, so a test can process every frame in turn.
+
+  CaptureThread is an opt-in producer thread that keeps the latest frames from a source in a
+  FrameRingBuffer, so consumers never wait on a grab.
+"""
+
+
+class CaptureSource:
+    """ Base class for a capture source. """
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+
+    def get_monitors(self) -> list[dict]:
+        """ Returns the monitors in the mss format. Item 0 is the whole desktop. """
+        mon = {'left': 0, 'top': 0, 'width': self.width, 'height': self.height}
+        return [mon, mon]
+
+    def grab(self, left: int, top: int, width: int, height: int):
+        """ Grab the rectangle (in pixels) and return the image in BGRA format. """
+        raise NotImplementedError
+
+    @property
+    def timestamp(self) -> float:
+        """ The timestamp (in seconds) of the most recent grab. """
+        return time.time()
+
+    def close(self):
+        pass
+
+
+class MssCapture(CaptureSource):
+    """ Live screen capture using mss. An mss instance must be used on the thread that created it,
+    so each thread grabbing from this source gets its own instance. """
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()  # The mss instance and last grab time of each thread
+
+    @property
+    def mss(self):
+        """ The mss instance for the calling thread. """
+        sct = getattr(self._local, 'mss', None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.mss = sct
+        return sct
+
+    def get_monitors(self) -> list[dict]:
+        return self.mss.monitors
+
+    def grab(self, left: int, top: int, width: int, height: int):
+        monitor = {"top": top, "left": left, "width": width, "height": height}
+        image = array(self.mss.grab(monitor))
+        self._local.timestamp = time.time()
+        return image
+
+    @property
+    def timestamp(self) -> float:
+        """ The time of the most recent grab by the calling thread. """
+        return getattr(self._local, 'timestamp', 0.0)
+
+    def close(self):
+        """ Close the mss instance of the calling thread. """
+        sct = getattr(self._local, 'mss', None)
+        if sct is not None:
+            sct.close()
+            self._local.mss = None
+
+
+class ReplayCapture(CaptureSource):
+    """ Base class for sources that play back recorded frames. """
+    def __init__(self, realtime: bool = False, loop: bool = False):
+        super().__init__()
+        self.realtime = realtime
+        self.loop = loop
+        self.frame_index = -1
+        self.eof = False
+        self._image = None
+        self._timestamp = 0.0
+        self._start_time = None
+
+    def _read_frame(self, index: int):
+        """ Read the frame at the index. Returns (image in BGRA, timestamp in seconds) or (None, 0.0)
+        past the end. """
+        raise NotImplementedError
+
+    def _frame_at_time(self, media_time: float) -> int:
+        """ Returns the index of the frame to show at the media time. """
+        raise NotImplementedError
+
+    def _load(self, index: int) -> bool:
+        if index == self.frame_index and self._image is not None:
+            return True
+        image, timestamp = self._read_frame(index)
+        if image is None:
+            self.eof = True
+            return False
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        self._image = image
+        self._timestamp = timestamp
+        self.frame_index = index
+        self.height, self.width = image.shape[:2]
+        return True
+
+    def next_frame(self) -> bool:
+        """ Move to the next frame. Returns False when there are no more frames. """
+        if self._load(self.frame_index + 1):
+            return True
+        if self.loop and self.frame_index >= 0:
+            self.eof = False
+            self._image = None
+            return self._load(0)
+        return False
+
+    def frames(self):
+        """ Step through every frame from the start, as fast as possible.
+        Yields the frame index and timestamp, with the frame being the current frame for grabs.
+        """
+        self.rewind()
+        while not self.eof:
+            yield self.frame_index, self._timestamp
+            if not self.next_frame():
+                break
+
+    def rewind(self):
+        """ Go back to the first frame and restart the real time clock. """
+        self.eof = False
+        self._image = None
+        self._start_time = None
+        self._load(0)
+
+    def _update_realtime(self):
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+        media_time = time.perf_counter() - self._start_time
+        index = self._frame_at_time(media_time)
+        if not self._load(index) and self.loop:
+            self._start_time = time.perf_counter()
+            self._load(0)
+
+    def get_frame(self):
+        """ Returns the whole current frame in BGRA format. """
+        if self.realtime:
+            self._update_realtime()
+        elif self._image is None:
+            self._load(0)
+        return self._image
+
+    def grab(self, left: int, top: int, width: int, height: int):
+        """ Grab from the current frame. Past the end of a replay that does not loop, the last frame
+        is held. Raises EOFError if there is no frame at all (an empty or unreadable source). """
+        image = self.get_frame()
+        if image is None:
+            raise EOFError("Replay source has no frame to grab (no frames, or the first frame could not be read)")
+        return image[top:top + height, left:left + width].copy()
+
+    @property
+    def timestamp(self) -> float:
+        return self._timestamp
+
+
+class ImageSequenceCapture(ReplayCapture):
+    """ Plays back a folder (or glob pattern) of images, in file name order. """
+    def __init__(self, path: str, fps: float = 30.0, timestamps: list[float] | None = None,
+                 realtime: bool = False, loop: bool = False):
+        """
+        @param path: A folder of PNG images, or a glob pattern such as 'test/compass/*.png'.
+        @param fps: The frame rate used to timestamp the images, when timestamps are not provided.
+        @param timestamps: Optional timestamp (in seconds) for each image.
+        @param realtime: True to play back in real time, False to play as fast as possible.
+        @param loop: True to restart from the first image at the end.
+        """
+        super().__init__(realtime, loop)
+        if os.path.isdir(path):
+            path = os.path.join(path, '*.png')
+        self.files = sorted(glob.glob(path))
+        if len(self.files) == 0:
+            logger.error(f'ImageSequenceCapture: No images found for {path}.')
+        self.fps = fps
+        self.timestamps = timestamps
+        self._load(0)
+
+    def _read_frame(self, index: int):
+        if index < 0 or index >= len(self.files):
+            return None, 0.0
+        image = cv2.imread(self.files[index], cv2.IMREAD_UNCHANGED)
+        if self.timestamps is not None:
+            timestamp = self.timestamps[index]
+        else:
+            timestamp = index / self.fps
+        return image, timestamp
+
+    def _frame_at_time(self, media_time: float) -> int:
+        if self.timestamps is None:
+            return int(media_time * self.fps)
+        index = 0
+        for i, t in enumerate(self.timestamps):
+            if t > media_time:
+                break
+            index = i
+        if media_time > self.timestamps[-1] + (1 / self.fps):
+            return len(self.timestamps)  # Past the end
+        return index
+
+
+class VideoCapture(ReplayCapture):
+    """ Plays back a video file using OpenCV. """
+    def __init__(self, file_name: str, realtime: bool = False, loop: bool = False):
+        """
+        @param file_name: The video file.
+        @param realtime: True to play back in real time, False to play as fast as possible.
+        @param loop: True to restart from the first frame at the end.
+        """
+        super().__init__(realtime, loop)
+        self.file_name = file_name
+        self.video = cv2.VideoCapture(file_name)
+        if not self.video.isOpened():
+            logger.error(f'VideoCapture: Could not open {file_name}.')
+        self.fps = self.video.get(cv2.CAP_PROP_FPS) or 30.0
+        self._pos = 0  # The index of the next frame the decoder will return
+        self._load(0)
+
+    def _read_frame(self, index: int):
+        if index < 0:
+            return None, 0.0
+        if self._pos < index <= self._pos + self.fps:
+            # Skip forward by decoding, which is quicker than seeking for short distances
+            while self._pos < index:
+                self.video.grab()
+                self._pos += 1
+        elif index != self._pos:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._pos = index
+        ok, image = self.video.read()
+        if not ok:
+            return None, 0.0
+        self._pos = index + 1
+        # The position after reading is the timestamp of the frame just read
+        timestamp = self.video.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if timestamp <= 0.0 and index > 0:
+            timestamp = index / self.fps
+        return image, timestamp
+
+    def _frame_at_time(self, media_time: float) -> int:
+        # Decode forward without seeking where possible, as seeking is slow
+        index = max(self.frame_index, 0)
+        while (index + 1) / self.fps <= media_time:
+            index += 1
+        return index
+
+    def close(self):
+        self.video.release()
+
+
+class FrameRingBuffer:
+    """ A fixed number of preallocated frame slots, holding the most recent frames.
+    One producer thread writes frames with put(). Consumers take copies of the latest frame, so
+    they never block on a screen grab. The producer never writes to the slot holding the latest
+    frame, so a size of at least 2 is required.
+    """
+    def __init__(self, size: int, shape, left: int = 0, top: int = 0, dtype=np.uint8):
+        """
+        @param size: The number of frames to keep (minimum 2).
+        @param shape: The shape of each frame, i.e. (height, width, 4).
+        @param left: The X position (pixels) of the frames relative to the monitor.
+        @param top: The Y position (pixels) of the frames relative to the monitor.
+        """
+        self.size = max(size, 2)
+        self.left = left
+        self.top = top
+        self._images = [np.zeros(shape, dtype) for _ in range(self.size)]
+        self._timestamps = [0.0] * self.size
+        self._count = 0  # Total number of frames written
+        self._cond = threading.Condition()
+
+    @property
+    def count(self) -> int:
+        """ Total number of frames written. """
+        return self._count
+
+    def put(self, image, timestamp: float):
+        """ Write a frame to the oldest slot and make it the latest frame. """
+        slot = self._count % self.size
+        np.copyto(self._images[slot], image)
+        self._timestamps[slot] = timestamp
+        with self._cond:
+            self._count += 1
+            self._cond.notify_all()
+
+    def _copy_latest(self, rect) -> Screen_Frame | None:
+        """ Copy the latest frame, or the rect ([L, T, R, B] relative to the monitor) within it.
+        Must be called with the lock held. """
+        if self._count == 0:
+            return None
+        slot = (self._count - 1) % self.size
+        image = self._images[slot]
+        if rect is None:
+            return Screen_Frame(image.copy(), self.left, self.top, self._timestamps[slot])
+
+        h, w = image.shape[:2]
+        x0 = int(rect[0]) - self.left
+        y0 = int(rect[1]) - self.top
+        x1 = int(rect[2]) - self.left
+        y1 = int(rect[3]) - self.top
+        if x0 < 0 or y0 < 0 or x1 > w or y1 > h:
+            return None
+        return Screen_Frame(image[y0:y1, x0:x1].copy(), int(rect[0]), int(rect[1]), self._timestamps[slot])
+
+    def latest(self, rect=None) -> Screen_Frame | None:
+        """ Returns a copy of the latest frame, or None if there are no frames yet, or
+        the rect is not within the frame.
+        @param rect: Optional rect ([L, T, R, B] relative to the monitor) to copy instead of the whole frame.
+        """
+        with self._cond:
+            return self._copy_latest(rect)
+
+    def _is_newer(self, timestamp: float) -> bool:
+        return self._count > 0 and self._timestamps[(self._count - 1) % self.size] > timestamp
+
+    def wait(self, timestamp: float, timeout: float = 1.0) -> bool:
+        """ Wait for a frame captured after the timestamp, without copying it.
+        Returns True if there is a newer frame, False on timeout. """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._is_newer(timestamp), timeout)
+
+    def wait_for_newer(self, timestamp: float, rect=None, timeout: float = 1.0) -> Screen_Frame | None:
+        """ Wait for a frame captured after the timestamp and return a copy of it.
+        Returns None on timeout.
+        @param timestamp: The timestamp the frame must be newer than.
+        @param rect: Optional rect ([L, T, R, B] relative to the monitor) to copy instead of the whole frame.
+        @param timeout: Maximum time to wait in seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._is_newer(timestamp), timeout):
+                return None
+            return self._copy_latest(rect)
+
+
+class CaptureThread:
+    """ Background thread that continuously grabs a rectangle of the screen into a ring buffer.
+    Vision code then takes the freshest frame from the buffer instead of grabbing the screen
+    itself, which decouples the capture time from the matching time.
+    """
+    def __init__(self, source_factory, rect, left: int = 0, top: int = 0, buffer_size: int = 3,
+                 fps: float = 30.0):
+        """
+        @param source_factory: A function returning the CaptureSource to use. It is called on the
+            capture thread, as mss must be used on the thread that created it.
+        @param rect: The rect ([L, T, R, B] in pixels relative to the monitor) to capture.
+        @param left: The X position of the monitor in pixels.
+        @param top: The Y position of the monitor in pixels.
+        @param buffer_size: The number of frames to keep.
+        @param fps: The maximum capture rate. 0 for as fast as possible.
+        """
+        self.source_factory = source_factory
+        self.rect = [int(v) for v in rect]
+        self.mon_left = left
+        self.mon_top = top
+        self.fps = fps
+        self.width = self.rect[2] - self.rect[0]
+        self.height = self.rect[3] - self.rect[1]
+        self.buffer = FrameRingBuffer(buffer_size, (self.height, self.width, 4), self.rect[0], self.rect[1])
+
+        self._thread = None
+        self._run = False
+        self._rate_count = 0
+        self._rate_start = time.perf_counter()
+        self.capture_fps = 0.0  # Measured capture rate (frames per second)
+        self.consumed_fps = 0.0  # Measured rate that new frames are taken by consumers
+        self._consumed_count = 0
+        self._consumed_last_ts = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._run = True
+        self._thread = threading.Thread(target=self._capture_loop, name="CaptureThread", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._run = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _capture_loop(self):
+        source = self.source_factory()
+        period = 1.0 / self.fps if self.fps > 0 else 0.0
+        while self._run:
+            start = time.perf_counter()
+            try:
+                image = source.grab(self.mon_left + self.rect[0], self.mon_top + self.rect[1],
+                                    self.width, self.height)
+                if image is not None and image.shape == self.buffer._images[0].shape:
+                    self.buffer.put(image, source.timestamp)
+                    self._update_rates()
+            except Exception as e:
+                logger.warning(f"CaptureThread grab error: {e}")
+                time.sleep(0.5)
+
+            # Limit the capture rate
+            elapsed = time.perf_counter() - start
+            if period > elapsed:
+                time.sleep(period - elapsed)
+
+        # Only close a source created for this thread
+        if isinstance(source, MssCapture):
+            source.close()
+
+    def _update_rates(self):
+        self._rate_count += 1
+        elapsed = time.perf_counter() - self._rate_start
+        if elapsed >= 1.0:
+            self.capture_fps = self._rate_count / elapsed
+            self.consumed_fps = self._consumed_count / elapsed
+            self._rate_count = 0
+            self._consumed_count = 0
+            self._rate_start = time.perf_counter()
+
+    def _consumed(self, frame: Screen_Frame | None) -> Screen_Frame | None:
+        # Count each frame once, to measure the effective vision frame rate
+        if frame is not None and frame.timestamp != self._consumed_last_ts:
+            self._consumed_last_ts = frame.timestamp
+            self._consumed_count += 1
+        return frame
+
+    def latest(self, rect=None) -> Screen_Frame | None:
+        """ Returns a copy of the freshest frame (or the rect within it), see FrameRingBuffer.latest(). """
+        return self._consumed(self.buffer.latest(rect))
+
+    def wait(self, timestamp: float, timeout: float = 1.0) -> bool:
+        """ Wait for a frame newer than the timestamp, see FrameRingBuffer.wait(). """
+        return self.buffer.wait(timestamp, timeout)
+
+    def wait_for_newer(self, timestamp: float, rect=None, timeout: float = 1.0) -> Screen_Frame | None:
+        """ Wait for a frame newer than the timestamp, see FrameRingBuffer.wait_for_newer(). """
+        return self._consumed(self.buffer.wait_for_newer(timestamp, rect, timeout))
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import time
+
+import cv2
+
+"""
+File:Screen_Frame.py
+
+Description:
+  Class to hold a single screen grab that covers one or more screen regions. The grab is the
+  union bounding box of the regions, and each region is handed out as a view into the grab, so
+  several checks in the same tick share one capture instead of each grabbing the screen.
+
+  A frame knows its colour space (BGRA from mss) and caches the colour conversions of each region,
+  so a conversion is done at most once per frame however many checks use it.
+
+  The '_SWAP' colour spaces are calculated with the red and blue channels swapped. This is what
+  the region filters have always used (Screen.get_screen() with rgb=True returns RGB, which the
+  filters then convert as BGR), so the filter colour ranges are tuned for them.
+"""
+
+# cv2 conversion codes from the frame colour space to the wanted colour space.
+_CONVERSIONS = {
+    ('BGRA', 'BGR'): cv2.COLOR_BGRA2BGR,
+    ('BGRA', 'RGB'): cv2.COLOR_BGRA2RGB,
+    ('BGRA', 'HSV'): cv2.COLOR_BGR2HSV,
+    ('BGRA', 'GRAY'): cv2.COLOR_BGRA2GRAY,
+    ('BGRA', 'HSV_SWAP'): cv2.COLOR_RGB2HSV,
+    ('BGRA', 'GRAY_SWAP'): cv2.COLOR_RGBA2GRAY,
+    ('BGR', 'BGRA'): cv2.COLOR_BGR2BGRA,
+    ('BGR', 'RGB'): cv2.COLOR_BGR2RGB,
+    ('BGR', 'HSV'): cv2.COLOR_BGR2HSV,
+    ('BGR', 'GRAY'): cv2.COLOR_BGR2GRAY,
+    ('BGR', 'HSV_SWAP'): cv2.COLOR_RGB2HSV,
+    ('BGR', 'GRAY_SWAP'): cv2.COLOR_RGB2GRAY,
+}
+
+
+def union_rect(rects) -> list[int]:
+    """ Returns the bounding box of all the given rects.
+    @param rects: A list of rect arrays ([L, T, R, B]) in pixels.
+    @return: A rect array ([L, T, R, B]) in pixels enclosing all the rects.
+    """
+    left = min(int(r[0]) for r in rects)
+    top = min(int(r[1]) for r in rects)
+    right = max(int(r[2]) for r in rects)
+    bottom = max(int(r[3]) for r in rects)
+    return [left, top, right, bottom]
+
+
+class Screen_Frame:
+    def __init__(self, image, left: int = 0, top: int = 0, timestamp: float | None = None,
+                 color_space: str = 'BGRA'):
+        """ A captured image and its position on the screen.
+        @param image: The image, in BGRA format as returned by mss by default.
+        @param left: The screen X position (pixels) of the left edge of the image.
+        @param top: The screen Y position (pixels) of the top edge of the image.
+        @param timestamp: The time the image was captured. Defaults to now.
+        @param color_space: The colour space of the image, 'BGRA' or 'BGR'.
+        """
+        self.image = image
+        self.left = left
+        self.top = top
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.color_space = color_space
+        self._cache = {}  # Converted regions keyed by (rect, colour space)
+
+        h, w = image.shape[:2]
+        self.rect = [left, top, left + w, top + h]
+
+    def contains(self, rect) -> bool:
+        """ Is the rect ([L, T, R, B] in pixels) fully within this frame. """
+        return (int(rect[0]) >= self.rect[0] and int(rect[1]) >= self.rect[1] and
+                int(rect[2]) <= self.rect[2] and int(rect[3]) <= self.rect[3])
+
+    def get_region(self, rect, rgb=True):
+        """ Get the part of the frame defined by the rect.
+        With rgb=False, a view (no copy) into the frame in BGRA format is returned, so
+        callers must copy the image before drawing on it.
+        With rgb=True, the region is converted the same as Screen.get_screen() does.
+        @param rect: A rect array ([L, T, R, B]) in screen pixels.
+        @param rgb: Convert the colour, as per Screen.get_screen().
+        @return: The image of the region.
+        """
+        if rgb:
+            return self.get_region_as(rect, 'RGB')
+        return self._view(rect)
+
+    def get_region_as(self, rect, color_space: str):
+        """ Get the part of the frame defined by the rect in the colour space. The conversion is
+        cached, so the returned image is shared and must not be modified by the caller.
+        @param rect: A rect array ([L, T, R, B]) in screen pixels.
+        @param color_space: 'BGRA', 'BGR', 'RGB', 'HSV', 'GRAY', 'HSV_SWAP' or 'GRAY_SWAP'.
+        @return: The image of the region.
+        """
+        if color_space == self.color_space:
+            return self._view(rect)
+
+        key = (int(rect[0]), int(rect[1]), int(rect[2]), int(rect[3]), color_space)
+        image = self._cache.get(key)
+        if image is None:
+            image = cv2.cvtColor(self._view(rect), _CONVERSIONS[(self.color_space, color_space)])
+            self._cache[key] = image
+        return image
+
+    def _view(self, rect):
+        x0 = int(rect[0]) - self.left
+        y0 = int(rect[1]) - self.top
+        x1 = int(rect[2]) - self.left
+        y1 = int(rect[3]) - self.top
+        return self.image[y0:y1, x0:x1]
@@ -1,8 +1,13 @@
+from __future__ import annotations
 import numpy as np
 from numpy import array, sum
 import cv2
 import json
 import os
+import threading
+
+from Match_Tracker import Match_Tracker
+from Screen_Frame import Screen_Frame, union_rect
 
 
 """
@@ -87,10 +92,60 @@ def size_scale_for_station(width: int, height: int, w: int, h: int) -> (int, int
     return new_width, new_height
 
 
+def match_template_pyramid(image, templ, level: int, templ_small=None):
+    """ Coarse to fine template match. The image and template are scaled down by 2^level and matched,
+    then the best coarse match is refined at full resolution in a small neighbourhood around it.
+    The max value and location are as a full resolution match would give, unless a different peak
+    wins at the coarse scale. The min value and location are from the coarse match.
+    @param image: The image to search.
+    @param templ: The template image.
+    @param level: The pyramid level, 1 for 1/2 scale, 2 for 1/4 scale.
+    @param templ_small: Optional template already scaled down by 2^level.
+    @return: The detail of match (minVal, maxVal, minLoc, maxLoc) and the coarse match mask.
+    """
+    f = 2 ** level
+    if templ_small is None:
+        templ_small = cv2.resize(templ, (0, 0), fx=1 / f, fy=1 / f, interpolation=cv2.INTER_AREA)
+    small = cv2.resize(image, (0, 0), fx=1 / f, fy=1 / f, interpolation=cv2.INTER_AREA)
+
+    t_hgt, t_wid = templ.shape[:2]
+    if (min(templ_small.shape[:2]) < 8 or small.shape[0] < templ_small.shape[0] or
+            small.shape[1] < templ_small.shape[1]):
+        # Too small to match at the coarse scale
+        match = cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED)
+        return cv2.minMaxLoc(match), match
+
+    coarse = cv2.matchTemplate(small, templ_small, cv2.TM_CCOEFF_NORMED)
+    (minVal, c_maxVal, minLoc, c_maxLoc) = cv2.minMaxLoc(coarse)
+
+    # Refine within a couple of coarse pixels of the coarse match
+    pad = 2 * f
+    x0 = max(c_maxLoc[0] * f - pad, 0)
+    y0 = max(c_maxLoc[1] * f - pad, 0)
+    x1 = min(c_maxLoc[0] * f + t_wid + pad, image.shape[1])
+    y1 = min(c_maxLoc[1] * f + t_hgt + pad, image.shape[0])
+    fine = cv2.matchTemplate(image[y0:y1, x0:x1], templ, cv2.TM_CCOEFF_NORMED)
+    (f_minVal, maxVal, f_minLoc, maxLoc) = cv2.minMaxLoc(fine)
+
+    return (minVal, maxVal, (minLoc[0] * f, minLoc[1] * f), (maxLoc[0] + x0, maxLoc[1] + y0)), coarse
+
+
 class Screen_Regions:
     def __init__(self, screen, templ):
         self.screen = screen
         self.templates = templ
+        self.tracker = Match_Tracker()  # Last match locations, to search near them first
+        # Regions to match with match_template_pyramid(), region name -> pyramid level (1 = 1/2, 2 = 1/4 scale)
+        self.pyramid_levels = {}
+        self._pyramid_templates = {}  # (template name, level) -> (template, scaled down template)
+        # Guards the pyramid templates and x3 stats, as the Vision_Worker thread and the AP thread both match
+        self._lock = threading.Lock()
+
+        # HSV channel matching (x3). The channel that most often wins for a template is matched first,
+        # and the others are skipped if it clears the template's threshold by the margin.
+        self.x3_adaptive = True
+        self.x3_early_exit_margin = 0.1
+        self.x3_stats = {}  # template name -> {'wins': [H, S, V], 'matches', 'early_exits'}
 
         # Define the thresholds for template matching to be consistent throughout the program
         self.compass_match_thresh = 0.35
@@ -121,6 +176,14 @@ class Screen_Regions:
         self.reg['mission_dest']  = {'rect': [0.46, 0.38, 0.65, 0.86], 'width': 1, 'height': 1, 'filterCB': self.equalize, 'filter': None}    
         self.reg['missions']    = {'rect': [0.50, 0.78, 0.65, 0.85], 'width': 1, 'height': 1, 'filterCB': self.equalize, 'filter': None}   
         
+        # The colour space each filter works in and the filter operation on an image already in that
+        # colour space. Used to share the colour conversions between checks using the same frame.
+        self.filter_ops = {
+            self.filter_by_color: ('HSV', self.filter_hsv_by_color),
+            self.equalize: ('GRAY', self.equalize_gray),
+            self.filter_sun: ('GRAY', self.filter_sun_gray),
+        }
+
         self.load_calibrated_regions()
 
         # convert rect from percent of screen into pixel location, calc the width/height of the area
@@ -142,62 +205,157 @@ class Screen_Regions:
                 if calibrated_key in calibrated_regions:
                     self.reg[key]['rect'] = calibrated_regions[calibrated_key]['rect']
 
-    def capture_region(self, screen, region_name):
+    def capture_frame(self, region_names) -> Screen_Frame:
+        """ Grab the screen once for all the named regions.
+        The grab covers the bounding box of the regions. Pass the returned frame to the capture
+        and match functions to use it instead of grabbing the screen again.
+        @param region_names: List of region names, i.e. ['compass', 'target'].
+        @return: The frame in BGRA format.
+        """
+        rect = union_rect([self.reg[name]['rect'] for name in region_names])
+        image = self.screen.get_screen(rect[0], rect[1], rect[2], rect[3], rgb=False)
+        return Screen_Frame(image, rect[0], rect[1], self.screen.last_timestamp)
+
+    def get_region_image(self, screen, region_name, rgb=True, frame: Screen_Frame | None = None):
+        """ Get the image of the region from the frame if provided and the frame covers the region,
+        else grab it from the screen. """
+        rect = self.reg[region_name]['rect']
+        if frame is not None and frame.contains(rect):
+            return frame.get_region(rect, rgb)
+        return screen.get_screen_region(rect, rgb)
+
+    def capture_region(self, screen, region_name, frame: Screen_Frame | None = None):
         """ Just grab the screen based on the region name/rect.
         Returns an unfiltered image. """
-        return screen.get_screen_region(self.reg[region_name]['rect'])
+        return self.get_region_image(screen, region_name, frame=frame)
 
-    def capture_region_filtered(self, screen, region_name, inv_col=True):
+    def capture_region_filtered(self, screen, region_name, inv_col=True, frame: Screen_Frame | None = None):
         """ Grab screen region and call its filter routine.
         Returns the filtered image. """
-        scr = screen.get_screen_region(self.reg[region_name]['rect'], inv_col)
-        if self.reg[region_name]['filterCB'] is None:
+        return self.capture_rect_filtered(screen, region_name, self.reg[region_name]['rect'], inv_col, frame)
+
+    def capture_rect_filtered(self, screen, region_name, rect, inv_col=True, frame: Screen_Frame | None = None):
+        """ Grab the rect (i.e. part of the region) and call the region's filter routine.
+        Returns the filtered image. """
+        filter_cb = self.reg[region_name]['filterCB']
+        if frame is not None and frame.contains(rect) and filter_cb in self.filter_ops:
+            # Filter the frame's cached conversion, see Screen_Frame for the '_SWAP' colour spaces.
+            color_space, filter_op = self.filter_ops[filter_cb]
+            if inv_col:
+                color_space = color_space + '_SWAP'
+            return filter_op(frame.get_region_as(rect, color_space), self.reg[region_name]['filter'])
+
+        if frame is not None and frame.contains(rect):
+            scr = frame.get_region(rect, inv_col)
+        else:
+            scr = screen.get_screen_region(rect, inv_col)
+        if filter_cb is None:
             # return the screen region untouched in BGRA format.
             return scr
         else:
             # return the screen region in the format returned by the filter.
-            return self.reg[region_name]['filterCB'](scr, self.reg[region_name]['filter'])
+            return filter_cb(scr, self.reg[region_name]['filter'])
 
-    def match_template_in_region(self, region_name, templ_name, inv_col=True):
+    def match_template_in_region(self, region_name, templ_name, inv_col=True, frame: Screen_Frame | None = None):
         """ Attempt to match the given template in the given region which is filtered using the region filter.
+        If the region has a pyramid level set (see pyramid_levels), a coarse to fine match is used and the
+        match mask is the coarse one.
         Returns the filtered image, detail of match and the match mask. """
-        img_region = self.capture_region_filtered(self.screen, region_name, inv_col)    # which would call, reg.capture_region('compass') and apply defined filter
+        img_region = self.capture_region_filtered(self.screen, region_name, inv_col, frame)    # which would call, reg.capture_region('compass') and apply defined filter
+        level = self.pyramid_levels.get(region_name, 0)
+        if level > 0:
+            (minVal, maxVal, minLoc, maxLoc), match = match_template_pyramid(
+                img_region, self.templates.template[templ_name]['image'], level,
+                self.get_pyramid_template(templ_name, level))
+            return img_region, (minVal, maxVal, minLoc, maxLoc), match
+
         match = cv2.matchTemplate(img_region, self.templates.template[templ_name]['image'], cv2.TM_CCOEFF_NORMED)
         (minVal, maxVal, minLoc, maxLoc) = cv2.minMaxLoc(match)
         return img_region, (minVal, maxVal, minLoc, maxLoc), match
 
-    def match_template_in_region_x3(self, region_name, templ_name, inv_col=True):
+    def get_pyramid_template(self, templ_name, level: int):
+        """ Get the template scaled down for match_template_pyramid(), scaling it only when the
+        template has changed (i.e. reloaded at a new scale). """
+        templ = self.templates.template[templ_name]['image']
+        with self._lock:
+            entry = self._pyramid_templates.get((templ_name, level))
+        if entry is None or entry[0] is not templ:
+            f = 2 ** level
+            entry = (templ, cv2.resize(templ, (0, 0), fx=1 / f, fy=1 / f, interpolation=cv2.INTER_AREA))
+            with self._lock:
+                self._pyramid_templates[(templ_name, level)] = entry
+        return entry[1]
+
+    def match_template_in_region_x3(self, region_name, templ_name, inv_col=True, frame: Screen_Frame | None = None):
         """ Attempt to match the given template in the given region which is unfiltered.
         The region's image is split into separate HSV channels, each channel tested and the best result kept.
         Returns the image, detail of match and the match mask. """
-        img_region = self.screen.get_screen_region(self.reg[region_name]['rect'], rgb=False)
+        img_region = self.get_region_image(self.screen, region_name, rgb=False, frame=frame)
         templ = self.templates.template[templ_name]['image']
 
-        # Convert to HSV and split.
-        img_hsv = cv2.cvtColor(img_region, cv2.COLOR_BGR2HSV)
-        h, s, v = cv2.split(img_hsv)
-        # hsv_comb = np.concatenate((h, s, v), axis=1)  # Combine 3 images
-        # cv2.imshow("Split HSV", hsv_comb)
-
-        # Perform matches
-        match_h = cv2.matchTemplate(h, templ, cv2.TM_CCOEFF_NORMED)
-        match_s = cv2.matchTemplate(s, templ, cv2.TM_CCOEFF_NORMED)
-        match_v = cv2.matchTemplate(v, templ, cv2.TM_CCOEFF_NORMED)
-        (minVal_h, maxVal_h, minLoc_h, maxLoc_h) = cv2.minMaxLoc(match_h)
-        (minVal_s, maxVal_s, minLoc_s, maxLoc_s) = cv2.minMaxLoc(match_s)
-        (minVal_v, maxVal_v, minLoc_v, maxLoc_v) = cv2.minMaxLoc(match_v)
-        # match_comb = np.concatenate((match_h, match_s, match_v), axis=1)  # Combine 3 images
-        # cv2.imshow("Split Matches", match_comb)
-
-        # Get best result
-        # V is likely the best match, so check it first
-        if maxVal_v > maxVal_s and maxVal_v > maxVal_h:
-            return img_region, (minVal_v, maxVal_v, minLoc_v, maxLoc_v), match_v
-        # S is likely the 2nd best match, so check it
-        if maxVal_s > maxVal_h:
-            return img_region, (minVal_s, maxVal_s, minLoc_s, maxLoc_s), match_s
-        # H must be the best match
-        return img_region, (minVal_h, maxVal_h, minLoc_h, maxLoc_h), match_h
+        # Convert to HSV
+        rect = self.reg[region_name]['rect']
+        if frame is not None and frame.contains(rect):
+            img_hsv = frame.get_region_as(rect, 'HSV')
+        else:
+            img_hsv = cv2.cvtColor(img_region, cv2.COLOR_BGR2HSV)
+
+        return (img_region,) + self.match_template_in_hsv_x3(img_hsv, templ, templ_name)
+
+    def match_template_in_region_tracked(self, region_name, templ_name, threshold: float, x3=False, inv_col=True,
+                                         frame: Screen_Frame | None = None):
+        """ Attempt to match the given template in the given region as match_template_in_region(), or
+        match_template_in_region_x3() with x3=True, but first search a window around where the
+        template last matched (see Match_Tracker). If the match in the window is below the threshold,
+        the whole region is searched.
+        Returns the image, detail of match, the match mask and the origin (x, y) of the match mask
+        within the region. The match locations are relative to the region as if the whole region was
+        searched. With x3=True the image is the whole unfiltered region, otherwise it is the filtered
+        image of the part searched, also at the origin.
+        @param threshold: The minimum match (0.0 - 1.0) for the template to be found.
+        """
+        rect = self.reg[region_name]['rect']
+        templ = self.templates.template[templ_name]
+        window = self.tracker.get_window(region_name, templ_name, rect[2] - rect[0], rect[3] - rect[1],
+                                         templ['width'], templ['height'])
+        img_region = None
+        if x3:
+            img_region = self.get_region_image(self.screen, region_name, rgb=False, frame=frame)
+
+        if window is not None:
+            win_rect = [rect[0] + window[0], rect[1] + window[1], rect[0] + window[2], rect[1] + window[3]]
+            if x3:
+                if frame is not None and frame.contains(win_rect):
+                    img_hsv = frame.get_region_as(win_rect, 'HSV')
+                else:
+                    img_hsv = cv2.cvtColor(img_region[window[1]:window[3], window[0]:window[2]], cv2.COLOR_BGR2HSV)
+                image = img_region
+                (minVal, maxVal, minLoc, maxLoc), match = self.match_template_in_hsv_x3(img_hsv, templ['image'], templ_name)
+            else:
+                image = self.capture_rect_filtered(self.screen, region_name, win_rect, inv_col, frame)
+                match = cv2.matchTemplate(image, templ['image'], cv2.TM_CCOEFF_NORMED)
+                (minVal, maxVal, minLoc, maxLoc) = cv2.minMaxLoc(match)
+
+            if maxVal >= threshold:
+                minLoc = (minLoc[0] + window[0], minLoc[1] + window[1])
+                maxLoc = (maxLoc[0] + window[0], maxLoc[1] + window[1])
+                self.tracker.hit(region_name, templ_name, maxLoc)
+                return image, (minVal, maxVal, minLoc, maxLoc), match, (window[0], window[1])
+            self.tracker.miss(region_name, templ_name)
+
+        # Search the whole region
+        if x3:
+            if frame is not None and frame.contains(rect):
+                img_hsv = frame.get_region_as(rect, 'HSV')
+            else:
+                img_hsv = cv2.cvtColor(img_region, cv2.COLOR_BGR2HSV)
+            image = img_region
+            (minVal, maxVal, minLoc, maxLoc), match = self.match_template_in_hsv_x3(img_hsv, templ['image'], templ_name)
+        else:
+            image, (minVal, maxVal, minLoc, maxLoc), match = self.match_template_in_region(region_name, templ_name,
+                                                                                          inv_col, frame)
+        self.tracker.full(region_name, templ_name, maxLoc, maxVal >= threshold)
+        return image, (minVal, maxVal, minLoc, maxLoc), match, (0, 0)
 
     def match_template_in_image(self, image, template):
         """ Attempt to match the given template in the (unfiltered) image.
@@ -206,41 +364,93 @@ class Screen_Regions:
         (minVal, maxVal, minLoc, maxLoc) = cv2.minMaxLoc(match)
         return image, (minVal, maxVal, minLoc, maxLoc), match     
 
-    def match_template_in_image_x3(self, image, templ_name):
+    def match_template_in_image_x3(self, image, templ_name, img_hsv=None):
         """ Attempt to match the given template in the (unfiltered) image.
         The image is split into separate HSV channels, each channel tested and the best result kept.
-        Returns the original image, detail of match and the match mask. """
+        Returns the original image, detail of match and the match mask.
+        @param img_hsv: Optional image already converted to HSV, to save converting it again.
+        """
         templ = self.templates.template[templ_name]['image']
 
-        # Convert to HSV and split.
-        img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        h, s, v = cv2.split(img_hsv)
-        # hsv_comb = np.concatenate((h, s, v), axis=1)  # Combine 3 images
+        # Convert to HSV
+        if img_hsv is None:
+            img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+        return (image,) + self.match_template_in_hsv_x3(img_hsv, templ, templ_name)
+
+    def match_template_in_hsv_x3(self, img_hsv, templ, templ_name=None):
+        """ Attempt to match the template in the HSV image.
+        The image is split into separate HSV channels, each channel tested and the best result kept.
+        With x3_adaptive set, the channels are tested in order of how often they have won for this
+        template, stopping early when a channel clears the template threshold by x3_early_exit_margin.
+        @param img_hsv: The image in HSV.
+        @param templ: The template image (greyscale).
+        @param templ_name: The template name, for the channel statistics and threshold.
+        @return: The detail of match and the match mask.
+        """
+        channels = cv2.split(img_hsv)
+        # hsv_comb = np.concatenate(channels, axis=1)  # Combine 3 images
         # cv2.imshow("Split HSV", hsv_comb)
 
-        # Perform matches
-        match_h = cv2.matchTemplate(h, templ, cv2.TM_CCOEFF_NORMED)
-        match_s = cv2.matchTemplate(s, templ, cv2.TM_CCOEFF_NORMED)
-        match_v = cv2.matchTemplate(v, templ, cv2.TM_CCOEFF_NORMED)
-        (minVal_h, maxVal_h, minLoc_h, maxLoc_h) = cv2.minMaxLoc(match_h)
-        (minVal_s, maxVal_s, minLoc_s, maxLoc_s) = cv2.minMaxLoc(match_s)
-        (minVal_v, maxVal_v, minLoc_v, maxLoc_v) = cv2.minMaxLoc(match_v)
-        # match_comb = np.concatenate((match_h, match_s, match_v), axis=1)  # Combine 3 images
-        # cv2.imshow("Split Matches", match_comb)
+        threshold = self.x3_threshold(templ_name) if self.x3_adaptive else None
+        early_exit = False
+        results = [None, None, None]  # H, S, V
+        for ch in self.x3_channel_order(templ_name):
+            match = cv2.matchTemplate(channels[ch], templ, cv2.TM_CCOEFF_NORMED)
+            results[ch] = (cv2.minMaxLoc(match), match)
+            if threshold is not None and results[ch][0][1] >= threshold + self.x3_early_exit_margin:
+                early_exit = True
+                break
 
         # Get best result
+        maxVal_h, maxVal_s, maxVal_v = [r[0][1] if r is not None else float('-inf') for r in results]
         # V is likely the best match, so check it first
         if maxVal_v > maxVal_s and maxVal_v > maxVal_h:
-            return image, (minVal_v, maxVal_v, minLoc_v, maxLoc_v), match_v
+            best = 2
         # S is likely the 2nd best match, so check it
-        if maxVal_s > maxVal_h:
-            return image, (minVal_s, maxVal_s, minLoc_s, maxLoc_s), match_s
+        elif maxVal_s > maxVal_h:
+            best = 1
         # H must be the best match
-        return image, (minVal_h, maxVal_h, minLoc_h, maxLoc_h), match_h
+        else:
+            best = 0
+
+        if templ_name is not None:
+            with self._lock:
+                stat = self.x3_stats.setdefault(templ_name, {'wins': [0, 0, 0], 'matches': 0, 'early_exits': 0})
+                stat['wins'][best] += 1
+                stat['matches'] += 1
+                if early_exit:
+                    stat['early_exits'] += 1
+
+        return results[best]
+
+    def x3_channel_order(self, templ_name) -> list[int]:
+        """ The HSV channel indexes in the order to match them. V, S then H, unless adaptive and
+        another channel has won more often for the template. """
+        order = [2, 1, 0]
+        with self._lock:
+            stat = self.x3_stats.get(templ_name)
+            wins = list(stat['wins']) if stat is not None else None
+        if not self.x3_adaptive or wins is None:
+            return order
+        # Stable sort, so ties keep the V, S, H order
+        return sorted(order, key=lambda ch: -wins[ch])
+
+    def x3_threshold(self, templ_name):
+        """ The match threshold of the template, or None if the template has no fixed threshold. """
+        if templ_name == 'compass':
+            return self.compass_match_thresh
+        if templ_name in ['navpoint', 'navpoint-behind']:
+            return self.navpoint_match_thresh
+        return None
 
     def equalize(self, image=None, noOp=None):
         # Load the image in greyscale
         img_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return self.equalize_gray(img_gray)
+
+    def equalize_gray(self, img_gray, noOp=None):
+        """ As equalize(), for an image already in greyscale. """
         # create a CLAHE object (Arguments are optional).  Histogram equalization, improves constrast
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
         img_out = clahe.apply(img_gray)
@@ -253,6 +463,10 @@ class Screen_Regions:
         their original color, otherwise black."""
         # converting from BGR to HSV color space
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        return self.filter_hsv_by_color(hsv, color_range)
+
+    def filter_hsv_by_color(self, hsv, color_range):
+        """ As filter_by_color(), for an image already in HSV. """
         # filter passed in color low, high
         filtered = cv2.inRange(hsv, color_range[0], color_range[1])
 
@@ -273,7 +487,10 @@ class Screen_Regions:
     # need to compare filter_sun with filter_bright
     def filter_sun(self, image=None, noOp=None):
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
+        return self.filter_sun_gray(hsv)
+
+    def filter_sun_gray(self, hsv, noOp=None):
+        """ As filter_sun(), for an image already in greyscale. """
         # set low end of filter to 25 to pick up the dull red Class L stars
         (thresh, blackAndWhiteImage) = cv2.threshold(hsv, self.sun_threshold, 255, cv2.THRESH_BINARY)
 
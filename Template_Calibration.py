@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+"""
+File:Template_Calibration.py
+
+Description:
+  Finds the scale of a template that best matches a region of the screen. The region is captured
+  once (or as a short burst) and converted to HSV once, then every candidate scale is matched against
+  those images in a thread pool. cv2.matchTemplate releases the GIL, so the matches run in parallel.
+
+  Matching follows Screen_Regions.match_template_in_region_x3(), each HSV channel is matched and
+  the best kept.
+"""
+
+
+def scale_range(range_low, range_high, range_step) -> list[float]:
+    """ The scales (in percent) from low to high inclusive, in steps.
+    Calculated from the step count, so float steps do not accumulate error.
+    """
+    count = int(round((range_high - range_low) / range_step)) + 1
+    return [round(range_low + n * range_step, 4) for n in range(count)]
+
+
+def match_planes_x3(planes, templ):
+    """ Match the template in each of the HSV planes and keep the best, as per
+    Screen_Regions.match_template_in_region_x3().
+    @param planes: The (h, s, v) images.
+    @param templ: The greyscale template.
+    @return: The best max value and its location.
+    """
+    h, s, v = planes
+    if templ.shape[0] > h.shape[0] or templ.shape[1] > h.shape[1]:
+        return 0.0, (0, 0)  # Template larger than the region, so cannot match
+
+    (minVal_h, maxVal_h, minLoc_h, maxLoc_h) = cv2.minMaxLoc(cv2.matchTemplate(h, templ, cv2.TM_CCOEFF_NORMED))
+    (minVal_s, maxVal_s, minLoc_s, maxLoc_s) = cv2.minMaxLoc(cv2.matchTemplate(s, templ, cv2.TM_CCOEFF_NORMED))
+    (minVal_v, maxVal_v, minLoc_v, maxLoc_v) = cv2.minMaxLoc(cv2.matchTemplate(v, templ, cv2.TM_CCOEFF_NORMED))
+
+    # V is likely the best match, so check it first
+    if maxVal_v > maxVal_s and maxVal_v > maxVal_h:
+        return maxVal_v, maxLoc_v
+    # S is likely the 2nd best match, so check it
+    if maxVal_s > maxVal_h:
+        return maxVal_s, maxLoc_s
+    # H must be the best match
+    return maxVal_h, maxLoc_h
+
+
+class Calibration_Result:
+    def __init__(self, scale, max_val, max_loc, width, height, curve):
+        """ The result of a calibration.
+        @param scale: The best scale in percent, or 0 if nothing matched over the threshold.
+        @param max_val: The match value at the best scale (0.0 - 1.0).
+        @param max_loc: The match location (x, y) within the region at the best scale.
+        @param width: The width of the template at the best scale.
+        @param height: The height of the template at the best scale.
+        @param curve: List of (scale, match value) for every scale tried, in scale order.
+        """
+        self.scale = scale
+        self.max_val = max_val
+        self.max_loc = max_loc
+        self.width = width
+        self.height = height
+        self.curve = curve
+
+
+class Template_Calibration:
+    def __init__(self, templates, max_workers: int | None = None):
+        """ Calibrate template scales against captured images.
+        @param templates: The Image_Templates to load the scaled templates from.
+        @param max_workers: The number of threads to use. Defaults to the number of CPUs.
+        """
+        self.templates = templates
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+    def _score(self, images_planes, templ_name, scale):
+        """ Score the template at a scale over all the images. The value is the average over the
+        images, so the HUD animating during a burst does not favour a lucky frame.
+        """
+        s = float(scale / 100)
+        templ = self.templates.load_scaled_template(templ_name, s, s, s)
+        total = 0.0
+        first_loc = (0, 0)
+        for i, planes in enumerate(images_planes):
+            val, loc = match_planes_x3(planes, templ['image'])
+            total += val
+            if i == 0:
+                first_loc = loc
+        return total / len(images_planes), first_loc, templ['width'], templ['height']
+
+    def calibrate(self, images_hsv, templ_name: str, scales, threshold: float) -> Calibration_Result:
+        """ Find the scale with the best match of the template in the images.
+        @param images_hsv: List of one or more images of the region in HSV.
+        @param templ_name: The template name, i.e. 'compass' or 'target'.
+        @param scales: The scales (in percent) to try.
+        @param threshold: The minimum match (0.0 - 1.0) for a scale to be picked.
+        @return: The Calibration_Result.
+        """
+        images_planes = [cv2.split(image) for image in images_hsv]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            scores = list(pool.map(lambda sc: self._score(images_planes, templ_name, sc), scales))
+
+        result = Calibration_Result(0, 0.0, (0, 0), 0, 0, [])
+        for scale, (val, loc, width, height) in zip(scales, scores):
+            result.curve.append((scale, val))
+            if val > threshold and val > result.max_val:
+                result.scale = scale
+                result.max_val = val
+                result.max_loc = loc
+                result.width = width
+                result.height = height
+        return result
+
+    def calibrate_coarse_fine(self, images_hsv, templ_name: str, threshold: float,
+                              range_low=30, range_high=200, coarse_step=1, fine_range=5,
+                              fine_step=0.1) -> Calibration_Result:
+        """ Calibrate over a wide range of scales, then a small range of scales around the best.
+        @return: The Calibration_Result of the fine pass, with the curves of both passes, or the
+        coarse result if nothing matched.
+        """
+        coarse = self.calibrate(images_hsv, templ_name, scale_range(range_low, range_high, coarse_step), threshold)
+        if coarse.scale == 0:
+            return coarse
+
+        fine = self.calibrate(images_hsv, templ_name,
+                              scale_range(coarse.scale - fine_range, coarse.scale + fine_range, fine_step), threshold)
+        fine.curve = sorted(coarse.curve + fine.curve)
+        if fine.max_val < coarse.max_val:
+            # Cannot happen as the coarse best is in the fine range, but keep the best regardless
+            coarse.curve = fine.curve
+            return coarse
+        return fine
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from EDlogger import logger
+from PerceptionFrame import PerceptionFrame
+
+"""
+File:Vision_Worker.py
+
+Description:
+  Background thread that keeps measuring the compass, target, occlusion and disengage state at a
+  fixed rate and publishes the latest PerceptionFrame. The alignment code reads the latest sample,
+  or waits for a fresh one, instead of measuring on demand, so the measuring carries on while keys
+  are held and there is no measure-after-sleep delay.
+
+  The worker only measures while it is being used. When nothing has asked for a sample for
+  idle_timeout seconds it waits until the next request, so it costs nothing outside of alignment.
+"""
+
+
+class Vision_Worker:
+    def __init__(self, ap, scr_reg, rate: float = 10.0, idle_timeout: float = 2.0):
+        """
+        @param ap: The EDAutopilot, which provides the checks.
+        @param scr_reg: The Screen_Regions.
+        @param rate: The maximum number of samples per second.
+        @param idle_timeout: Stop measuring after this many seconds without a request.
+        """
+        self.ap = ap
+        self.scr_reg = scr_reg
+        self.rate = rate
+        self.idle_timeout = idle_timeout
+
+        self._latest = None
+        self._latest_time = 0.0  # perf_counter() time the latest sample was published
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._last_request = 0.0
+        self._thread = None
+        self._run = False
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._run = True
+        self._thread = threading.Thread(target=self._loop, name="Vision_Worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._run = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self) -> PerceptionFrame | None:
+        """ Get the latest sample, which may be old if the worker was idle. """
+        with self._cond:
+            self._request()
+            return self._latest
+
+    def wait_for_new(self, seq: int, timeout: float = 1.0, captured_after: float = 0.0) -> PerceptionFrame | None:
+        """ Wait for a sample newer than the given sequence number.
+        @param seq: The sequence number of the last sample used, 0 for any.
+        @param timeout: The max time to wait in seconds.
+        @param captured_after: The sample's screen grab must be after this time (time.time(), as the
+        frame timestamps), i.e. when the last key was released, so it shows the ship after the move.
+        @return: The sample, or None on timeout.
+        """
+        end = time.perf_counter() + timeout
+        with self._cond:
+            self._request()
+            # A sample from before the worker went idle is stale
+            while (self._latest is None or self._latest.seq <= seq or self._stale() or
+                   self._latest.timestamp < captured_after):
+                remaining = end - time.perf_counter()
+                if remaining <= 0 or not self._run:
+                    return None
+                self._cond.wait(remaining)
+            return self._latest
+
+    def _request(self):
+        """ Note a consumer wants samples, waking the worker if idle. Call holding the lock. """
+        self._last_request = time.perf_counter()
+        self._cond.notify_all()
+
+    def _stale(self) -> bool:
+        return time.perf_counter() - self._latest_time > self.idle_timeout
+
+    def _loop(self):
+        period = 1.0 / self.rate if self.rate > 0 else 0.0
+        while self._run:
+            # Wait while no one is asking for samples
+            with self._cond:
+                while self._run and time.perf_counter() - self._last_request > self.idle_timeout:
+                    self._cond.wait()
+            if not self._run:
+                break
+
+            start = time.perf_counter()
+            try:
+                pf = PerceptionFrame.capture(self.ap, self.scr_reg, disengage=True)
+                with self._cond:
+                    self._seq += 1
+                    pf.seq = self._seq
+                    self._latest = pf
+                    self._latest_time = time.perf_counter()
+                    self._cond.notify_all()
+            except Exception as e:
+                logger.warning(f"Vision_Worker error: {e}")
+                time.sleep(0.5)
+
+            elapsed = time.perf_counter() - start
+            if period > elapsed:
+                time.sleep(period - elapsed)
@@ -0,0 +1,111 @@
+import time
+import unittest
+import sys
+import os
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Align_Controller import Align_Controller, PID, nav_axis_errors
+
+
+class FakeKeys:
+    """ Records the key states sent. """
+    def __init__(self):
+        self.events = []
+        self.down = set()
+
+    def send(self, key_binding, hold=None, repeat=1, repeat_delay=None, state=None, fast=False, delay=True):
+        self.events.append((key_binding, state))
+        if state == 1:
+            self.down.add(key_binding)
+        else:
+            self.down.discard(key_binding)
+
+
+class SlowKeys(FakeKeys):
+    """ Records the time of each key state and sleeps after it like EDKeys, 20 ms or a little with
+    no delay. """
+    def __init__(self):
+        super().__init__()
+        self.times = {}  # key -> [press time, release time]
+
+    def send(self, key_binding, hold=None, repeat=1, repeat_delay=None, state=None, fast=False, delay=True):
+        now = time.perf_counter()
+        if state == 1:
+            self.times[key_binding] = [now, None]
+        else:
+            self.times[key_binding][1] = now
+        super().send(key_binding, hold, repeat, repeat_delay, state, fast, delay)
+        time.sleep(0.02 if delay else 0.002)
+
+    def held(self, key_binding) -> float:
+        pressed, released = self.times[key_binding]
+        return released - pressed
+
+
+class TestAlignController(unittest.TestCase):
+
+    def test_pid(self):
+        pid = PID(2.0, ki=1.0, kd=0.5, i_limit=1.0)
+        self.assertAlmostEqual(pid.update(10.0, 0.1), 20.0 + 1.0)  # No derivative on the first update
+        # Integral limited to 1.0 of output, derivative (8 - 10) / 0.1 * 0.5
+        self.assertAlmostEqual(pid.update(8.0, 0.1), 16.0 + 1.0 - 10.0)
+
+    def test_axis_errors(self):
+        # Top right, outside the fine zone: roll right to the vertical, no yaw
+        errors = nav_axis_errors({'pit': 30.0, 'yaw': 20.0, 'roll': 34.0}, 3, 10)
+        self.assertEqual(errors, {'roll': 34.0, 'pitch': 30.0, 'yaw': 0.0})
+        # Bottom left: roll right to put it straight down
+        errors = nav_axis_errors({'pit': -30.0, 'yaw': -20.0, 'roll': -146.0}, 3, 10)
+        self.assertEqual(errors['roll'], 34.0)
+        # Inside the fine zone: pitch and yaw only, small errors ignored
+        errors = nav_axis_errors({'pit': 5.0, 'yaw': -2.0, 'roll': -20.0}, 3, 10)
+        self.assertEqual(errors, {'roll': 0.0, 'pitch': 5.0, 'yaw': 0.0})
+
+    def test_step_holds_and_releases(self):
+        keys = FakeKeys()
+        ctrl = Align_Controller(keys, period=0.01)
+        ctrl.set_ship(80.0, 33.0, 8.0, kp=2.5, ki=0.0, kd=0.0)
+
+        # Large pitch error, full duty, key stays held into the next period
+        self.assertFalse(ctrl.step({'pit': 60.0, 'yaw': 0.0, 'roll': 0.0}, 3))
+        self.assertEqual(keys.down, {'PitchUpButton'})
+
+        # Small pitch error, part duty, pressed and released in the period
+        self.assertFalse(ctrl.step({'pit': -6.0, 'yaw': 0.0, 'roll': 180.0}, 3))
+        self.assertEqual(keys.down, set())
+        self.assertIn(('PitchDownButton', 1), keys.events)
+        self.assertIn(('PitchDownButton', 0), keys.events)
+
+        # Aligned
+        self.assertTrue(ctrl.step({'pit': 1.0, 'yaw': -1.0, 'roll': 0.0}, 3))
+        self.assertEqual(keys.down, set())
+
+    def test_pulse_hold_times(self):
+        keys = SlowKeys()
+        ctrl = Align_Controller(keys, period=0.1)
+
+        # Three axes at 0.3 duty, each key held 30 ms from its own press
+        start = time.perf_counter()
+        ctrl._pulse({'roll': 0.3, 'pitch': -0.3, 'yaw': 0.3})
+        self.assertAlmostEqual(time.perf_counter() - start, 0.1, delta=0.01)
+        for key in ('RollRightButton', 'PitchDownButton', 'YawRightButton'):
+            self.assertAlmostEqual(keys.held(key), 0.03, delta=0.005)
+        self.assertEqual(keys.down, set())
+
+        # The minimum duty is held for its time
+        ctrl._pulse({'pitch': ctrl.min_duty})
+        self.assertAlmostEqual(keys.held('PitchUpButton'), 0.01, delta=0.005)
+
+    def test_reset_releases_keys(self):
+        keys = FakeKeys()
+        ctrl = Align_Controller(keys, period=0.01)
+        ctrl.step({'pit': 0.0, 'yaw': 90.0, 'roll': 90.0}, 3)
+        self.assertTrue(keys.down)
+        ctrl.reset()
+        self.assertEqual(keys.down, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
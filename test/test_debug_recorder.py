@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Debug_Recorder import Debug_Recorder
+
+
+class TestDebugRecorder(unittest.TestCase):
+
+    def test_off_by_default(self):
+        recorder = Debug_Recorder()
+        sample = recorder.sample('item')
+        self.assertFalse(sample.active)
+        sample.add('1-step', np.zeros((4, 4), dtype=np.uint8))
+        sample.finish(False)
+
+    def test_every_n_and_failure(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = Debug_Recorder(out_dir=tmp, every_n=3, on_failure=True)
+            img = np.zeros((8, 8), dtype=np.uint8)
+            for i in range(6):
+                sample = recorder.sample('item')
+                sample.add('1-step', img)
+                sample.finish(success=(i != 1))
+            recorder.flush()
+            files = sorted(os.listdir(tmp))
+            # Calls 3 and 6 sampled, call 2 failed
+            self.assertEqual(files, ['item_000002_fail_1-step.png', 'item_000003_ok_1-step.png',
+                                     'item_000006_ok_1-step.png'])
+
+    def test_disk_cap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = Debug_Recorder(out_dir=tmp, every_n=1, max_bytes=1)
+            rng = np.random.default_rng(0)
+            for i in range(3):
+                sample = recorder.sample('item')
+                sample.add('1-step', rng.integers(0, 255, (16, 16), dtype=np.uint8))
+                sample.finish()
+                recorder.flush()
+            # Everything over the cap is deleted, oldest first
+            self.assertEqual(os.listdir(tmp), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
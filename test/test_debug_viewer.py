@@ -0,0 +1,45 @@
+import glob
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Debug_Viewer import Debug_Viewer
+
+
+class TestDebugViewer(unittest.TestCase):
+
+    def test_show_does_not_block_and_drops(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            viewer = Debug_Viewer(record_dir=tmp, fps=5.0)
+            image = np.zeros((40, 60, 3), dtype=np.uint8)
+            start = time.perf_counter()
+            for i in range(50):
+                viewer.show('compass', image)
+            self.assertLess(time.perf_counter() - start, 0.1)
+            # Most of the images were replaced before they were written
+            self.assertGreater(viewer.dropped, 40)
+            time.sleep(0.3)
+            viewer.stop()
+            self.assertEqual(len(glob.glob(os.path.join(tmp, 'compass_*.avi'))), 1)
+
+    def test_rolling_segments(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            viewer = Debug_Viewer(record_dir=tmp, fps=50.0, keep_segments=2)
+            # A new file is started when the image size changes
+            for i in range(4):
+                viewer.show('target', np.zeros((20 + i * 2, 30, 3), dtype=np.uint8))
+                time.sleep(0.1)
+            viewer.stop()
+            files = sorted(os.path.basename(f) for f in glob.glob(os.path.join(tmp, 'target_*.avi')))
+            self.assertEqual(files, ['target_00002.avi', 'target_00003.avi'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Digit_Reader import Digit_Reader, segment, binarize
+from OCR import OCR
+
+
+def text_image(text, scale=0.7, inverted=False):
+    """ Light text on a dark background, or dark on light if inverted. """
+    img = np.full((30, 12 + 18 * len(text), 3), 30, dtype=np.uint8)
+    cv2.putText(img, text, (4, 22), cv2.FONT_HERSHEY_SIMPLEX, scale, (230, 230, 230), 2)
+    return 255 - img if inverted else img
+
+
+class FakeEngine:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def ocr(self, img, det=True, cls=False):
+        self.calls += 1
+        return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], (self.text, 0.99)]]]
+
+
+class TestDigitReader(unittest.TestCase):
+
+    def setUp(self):
+        self.reader = Digit_Reader(path='')
+        self.reader.learn(text_image('0123456789/'), '0123456789/')
+
+    def test_segment(self):
+        self.assertEqual(len(segment(binarize(text_image('12/200')))), 6)
+
+    def test_read(self):
+        self.assertTrue(self.reader.calibrated)
+        for text in ['12/200', '987', '0', '1/1']:
+            read, conf = self.reader.read(text_image(text))
+            self.assertEqual(read, text)
+            self.assertGreaterEqual(conf, self.reader.min_conf)
+
+    def test_read_inverted_and_separators(self):
+        read, conf = self.reader.read(text_image('4,560/9,999', inverted=True))
+        self.assertEqual(read, '4560/9999')
+        self.assertGreaterEqual(conf, self.reader.min_conf)
+
+    def test_not_calibrated(self):
+        reader = Digit_Reader(path='')
+        self.assertEqual(reader.read(text_image('12')), ('', 0.0))
+        # The count of glyphs does not match the text
+        self.assertFalse(reader.learn(text_image('12'), '123'))
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'glyphs.json')
+            self.reader.path = path
+            self.reader.save()
+            reader = Digit_Reader(path=path)
+            self.assertTrue(reader.calibrated)
+            self.assertEqual(reader.read(text_image('305/77'))[0], '305/77')
+
+    def test_ocr_fallback_and_learn(self):
+        engine = FakeEngine('56/78')
+        ocr = OCR(None, engine_factory=lambda *args: engine)
+        ocr.digit_reader = Digit_Reader(path='')
+        image = text_image('56/78')
+
+        # Not calibrated, read by the OCR model and learned
+        self.assertEqual(ocr.image_digits_ocr(image), ['56/78'])
+        self.assertEqual(engine.calls, 1)
+        # Then read from the glyphs, even when not cached
+        ocr.cache.clear()
+        self.assertEqual(ocr.image_digits_ocr(image), ['56/78'])
+        self.assertEqual(engine.calls, 1)
+        self.assertEqual(ocr.digit_stats, {'glyph': 1, 'ocr': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
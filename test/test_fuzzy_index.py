@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Fuzzy_Index import Fuzzy_Index, normalize_ocr_text
+from OCR import OCR
+
+
+class TestFuzzyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = Fuzzy_Index(["Gold", "Silver", "Bertrandite", "Indite", "Low Temperature Diamonds"])
+
+    def test_normalize(self):
+        self.assertEqual(normalize_ocr_text("Gold ore"), "G01D0RE")
+        self.assertEqual(normalize_ocr_text("Gold ore", strip_spaces=False), "G01D 0RE")
+
+    def test_best(self):
+        self.assertEqual(self.index.best("G0LD", 0.7), "Gold")
+        self.assertEqual(self.index.best("lowtemperature diamonds"), "Low Temperature Diamonds")
+        self.assertEqual(self.index.best("Bertrandlte", 0.6), "Bertrandite")
+        self.assertIsNone(self.index.best("Painite", 0.7))
+
+    def test_top_k(self):
+        matches = self.index.top_k("Indite", k=2)
+        self.assertEqual(matches[0], ("Indite", 1.0))
+        self.assertEqual(matches[1][0], "Bertrandite")
+        self.assertEqual(len(self.index.top_k("Indite", k=5, threshold=0.9)), 1)
+
+    def test_best_prefix(self):
+        patterns = Fuzzy_Index(["Mine", "Mining rush for", "Blast out"], strip_spaces=False)
+        self.assertEqual(patterns.best_prefix("Mining rush for 500 units of Gold"), "Mining rush for")
+        self.assertEqual(patterns.best_prefix("Blast 0ut 400 units of Silver"), "Blast out")
+        self.assertIsNone(patterns.best_prefix("Bring us 10 units of Gold"))
+
+    def test_ocr_matches(self):
+        ocr = OCR(None, engine_factory=lambda *args: None)
+        names = ["Gold", "Silver", "Bertrandite", "Indite"]
+        self.assertEqual(ocr.find_best_match_in_list(names, "silver", threshold=0.7), "Silver")
+        self.assertEqual(ocr.find_best_match_in_vocabulary(names, "SIL VER", threshold=0.7), "Silver")
+        self.assertIs(ocr.fuzzy_index(names), ocr.fuzzy_index(list(names)))
+        # One-off OCR lists are scanned, not indexed
+        ocr.find_best_match_in_list(["BUY", "GOLD 12"], "Gold")
+        self.assertEqual(len(ocr._fuzzy_indexes), 1)
+        self.assertEqual(ocr.find_fuzzy_pattern_in_text("Mine 300 units", ["Mine", "Blast out"]), "Mine")
+        self.assertIsNone(ocr.find_best_match_in_list([], "Gold"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import ctypes
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Hazard_Monitor import Hazard_Monitor, INTERDICTED, OCCLUDED
+
+
+class TestHazardMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.ap = MagicMock()
+        self.ap.status.get_flag.return_value = False
+        self.ap.is_destination_occluded.return_value = False
+        self.monitor = Hazard_Monitor(self.ap, min_period=0.02, max_period=0.1)
+        self.monitor.start()
+
+    def tearDown(self):
+        self.monitor.stop()
+
+    def test_wait_completes_with_backoff(self):
+        start = time.perf_counter()
+        self.assertIsNone(self.monitor.wait(0.5, MagicMock()))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.5)
+        # Status is read every period, the occlusion match backs off
+        self.assertLess(self.ap.is_destination_occluded.call_count, self.ap.status.get_flag.call_count)
+        self.assertLess(self.ap.is_destination_occluded.call_count, 10)
+
+    def test_occluded_interrupts(self):
+        self.ap.is_destination_occluded.return_value = True
+        start = time.perf_counter()
+        self.assertEqual(self.monitor.wait(5.0, MagicMock()), OCCLUDED)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_interdiction_interrupts(self):
+        scr_reg = MagicMock()
+        self.assertIsNone(self.monitor.wait(0.1, scr_reg))
+        self.ap.status.get_flag.return_value = True
+        self.assertEqual(self.monitor.wait(5.0, scr_reg), INTERDICTED)
+
+    def test_short_wait_checks_on_caller(self):
+        # Shorter than min_period, so checked once on this thread
+        self.ap.is_destination_occluded.return_value = True
+        self.assertEqual(self.monitor.wait(0.01, MagicMock()), OCCLUDED)
+        self.ap.is_destination_occluded.return_value = False
+        calls = self.ap.is_destination_occluded.call_count
+        self.assertIsNone(self.monitor.wait(0.01, MagicMock()))
+        self.assertEqual(self.ap.is_destination_occluded.call_count, calls + 1)
+
+    def test_async_interrupt(self):
+        # Stop raises an exception in the AP thread with PyThreadState_SetAsyncExc
+        result = {}
+
+        def waiter():
+            start = time.perf_counter()
+            try:
+                self.monitor.wait(5.0, MagicMock())
+            except KeyboardInterrupt:
+                result['elapsed'] = time.perf_counter() - start
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.1)
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread.ident), ctypes.py_object(KeyboardInterrupt))
+        thread.join(2.0)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(result['elapsed'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Screen_Regions import Screen_Regions
+from test_screen_frame import FakeScreen
+
+
+class TestHsvX3(unittest.TestCase):
+
+    def setUp(self):
+        self.templ = np.zeros((30, 30), dtype=np.uint8)
+        cv2.circle(self.templ, (15, 15), 10, 200, 3)
+        self.scr_reg = Screen_Regions(FakeScreen(), MagicMock())
+
+    def make_hsv(self, channel):
+        """ An HSV image with the template in one channel and noise in the others. """
+        rng = np.random.default_rng(2)
+        hsv = rng.integers(0, 60, (100, 120, 3), dtype=np.uint8)
+        hsv[40:70, 50:80, channel] = self.templ
+        return hsv
+
+    def test_same_result_as_all_channels(self):
+        for channel in [0, 1, 2]:
+            hsv = self.make_hsv(channel)
+            self.scr_reg.x3_adaptive = False
+            expected, _ = self.scr_reg.match_template_in_hsv_x3(hsv, self.templ, 'compass')
+            self.scr_reg.x3_adaptive = True
+            actual, _ = self.scr_reg.match_template_in_hsv_x3(hsv, self.templ, 'compass')
+            self.assertEqual(actual[3], expected[3])
+            self.assertEqual(actual[3], (50, 40))
+
+    def test_adaptive_order_and_early_exit(self):
+        hsv = self.make_hsv(1)  # Template in S
+        for i in range(3):
+            self.scr_reg.match_template_in_hsv_x3(hsv, self.templ, 'compass')
+
+        stat = self.scr_reg.x3_stats['compass']
+        self.assertEqual(stat['wins'], [0, 3, 0])
+        self.assertEqual(self.scr_reg.x3_channel_order('compass'), [1, 2, 0])
+        # The first match tested V first, then S cleared the threshold so H was skipped.
+        # After that S is tested first and clears the threshold alone.
+        self.assertEqual(stat['early_exits'], 3)
+        self.assertEqual(stat['matches'], 3)
+
+        # No threshold for the template, so no early exit
+        self.scr_reg.match_template_in_hsv_x3(hsv, self.templ, 'target')
+        self.assertEqual(self.scr_reg.x3_stats['target']['early_exits'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
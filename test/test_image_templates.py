@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Image_Templates import Template_Cache
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, 'templ.png')
+        cv2.imwrite(self.file_name, np.arange(40 * 20, dtype=np.uint8).reshape(20, 40))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_scaled_matches_resize(self):
+        cache = Template_Cache()
+        templ = cache.get_scaled(self.file_name, 0.5, 0.75)
+        expected = cv2.resize(cv2.imread(self.file_name, cv2.IMREAD_GRAYSCALE), (0, 0), fx=0.5, fy=0.75)
+        np.testing.assert_array_equal(templ['image'], expected)
+        self.assertEqual((templ['width'], templ['height']), (20, 15))
+
+    def test_hit_and_eviction(self):
+        cache = Template_Cache(max_size=2)
+        first = cache.get_scaled(self.file_name, 1.0, 1.0)
+        self.assertIs(cache.get_scaled(self.file_name, 1.0, 1.0), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.get_scaled(self.file_name, 0.5, 0.5)
+        cache.get_scaled(self.file_name, 0.25, 0.25)  # Evicts the 1.0 scale
+        self.assertIsNot(cache.get_scaled(self.file_name, 1.0, 1.0), first)
+        self.assertEqual(cache.misses, 4)
+
+    def test_changed_file_is_reloaded(self):
+        cache = Template_Cache()
+        first = cache.get_scaled(self.file_name, 1.0, 1.0)
+        cv2.imwrite(self.file_name, np.zeros((10, 10), dtype=np.uint8))
+        os.utime(self.file_name, (0, 0))  # Make sure the mtime differs
+        second = cache.get_scaled(self.file_name, 1.0, 1.0)
+        self.assertEqual(second['width'], 10)
+        self.assertIsNot(second, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
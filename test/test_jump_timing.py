@@ -0,0 +1,96 @@
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Jump_Timing import Jump_Timer
+
+
+class TestJumpTiming(unittest.TestCase):
+
+    def test_nested_spans(self):
+        timer = Jump_Timer()
+        timer.begin_jump()
+        with timer.span('refuel'):
+            time.sleep(0.02)
+            with timer.span('sun_avoid'):
+                time.sleep(0.05)
+        rec = timer.end_jump('python', 'K')
+        self.assertGreaterEqual(rec['phases']['sun_avoid'], 0.05)
+        # The outer span does not include the nested one
+        self.assertLess(rec['phases']['refuel'], 0.05)
+        self.assertGreaterEqual(rec['total'], 0.07)
+
+    def test_no_cycle(self):
+        timer = Jump_Timer()
+        with timer.span('honk'):
+            pass
+        self.assertIsNone(timer.end_jump())
+
+    def test_span_on_other_thread(self):
+        timer = Jump_Timer()
+        timer.begin_jump()
+        started = threading.Event()
+        finish = threading.Event()
+
+        def honk():
+            with timer.span('honk'):
+                started.set()
+                finish.wait(1.0)
+
+        thread = threading.Thread(target=honk, daemon=True)
+        thread.start()
+        started.wait(1.0)
+        first = timer.end_jump()
+        timer.begin_jump()
+        # Ends after its cycle has ended and the next has begun
+        finish.set()
+        thread.join(1.0)
+        second = timer.end_jump()
+        self.assertIn('honk', first['phases'])
+        self.assertNotIn('honk', second['phases'])
+
+    def test_summary_and_export(self):
+        timer = Jump_Timer(max_jumps=3)
+        for i, (ship, star) in enumerate([('python', 'K'), ('python', 'M'), ('anaconda', 'K'), ('anaconda', 'K')]):
+            timer.begin_jump()
+            timer.add('jump', 10.0 + i)
+            timer.end_jump(ship, star)
+
+        # Only the last 3 are kept
+        self.assertEqual(len(timer.records), 3)
+        self.assertEqual(timer.summary()['jump']['count'], 3)
+        self.assertEqual(timer.summary()['jump']['max'], 13.0)
+        by_ship = timer.summary('ship')
+        self.assertEqual(by_ship['anaconda']['jump']['mean'], 12.5)
+        self.assertEqual(timer.summary('star_class')['M']['jump']['count'], 1)
+        counts, edges = timer.histogram('jump', bin_width=5.0)
+        self.assertEqual(counts.sum(), 3)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'timing.csv')
+            timer.export(path)
+            with open(path) as fp:
+                rows = list(csv.DictReader(fp))
+            self.assertEqual(len(rows), 3)
+            self.assertEqual(rows[0]['jump'], '11.0')
+            self.assertEqual(rows[0]['refuel'], '')
+
+            path = os.path.join(tmp, 'timing.json')
+            timer.export(path)
+            with open(path) as fp:
+                data = json.load(fp)
+            self.assertEqual(len(data['jumps']), 3)
+            self.assertIn('K', data['by_star_class'])
+            self.assertIn('honk', data['notes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
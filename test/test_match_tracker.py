@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Match_Tracker import Match_Tracker
+from Screen_Regions import Screen_Regions
+from test_screen_frame import FakeScreen
+
+
+class TestMatchTracker(unittest.TestCase):
+
+    def test_window(self):
+        tracker = Match_Tracker(margin=1.0)
+        self.assertIsNone(tracker.get_window('compass', 'compass', 400, 300, 20, 20))
+
+        tracker.full('compass', 'compass', (100, 50), True)
+        self.assertEqual(tracker.get_window('compass', 'compass', 400, 300, 20, 20), [80, 30, 140, 90])
+        # Clipped to the region
+        tracker.hit('compass', 'compass', (5, 290))
+        self.assertEqual(tracker.get_window('compass', 'compass', 400, 300, 20, 20), [0, 270, 45, 300])
+
+        # Lost track
+        tracker.full('compass', 'compass', (5, 290), False)
+        self.assertIsNone(tracker.get_window('compass', 'compass', 400, 300, 20, 20))
+
+        tracker.enabled = False
+        tracker.full('compass', 'compass', (100, 50), True)
+        self.assertIsNone(tracker.get_window('compass', 'compass', 400, 300, 20, 20))
+
+
+class TestTrackedMatch(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = FakeScreen()
+        self.screen.desktop[:] = 0
+        # A grey ring, the template is the same ring on black
+        self.templ = np.zeros((40, 40), dtype=np.uint8)
+        cv2.circle(self.templ, (20, 20), 14, 200, 3)
+        cv2.line(self.templ, (20, 6), (20, 20), 200, 2)
+        templates = MagicMock()
+        templates.template = {'compass': {'image': self.templ, 'width': 40, 'height': 40}}
+        self.scr_reg = Screen_Regions(self.screen, templates)
+
+    def draw(self, x, y):
+        """ Draw the ring into the compass region at the region relative location. """
+        rect = self.scr_reg.reg['compass']['rect']
+        self.screen.desktop[:] = 0
+        self.screen.desktop[rect[1] + y:rect[1] + y + 40, rect[0] + x:rect[0] + x + 40, :3] = self.templ[:, :, None]
+
+    def test_tracked_matches_full_search(self):
+        self.draw(100, 60)
+        thresh = self.scr_reg.compass_match_thresh
+        _, full_vals, _ = self.scr_reg.match_template_in_region_x3('compass', 'compass')
+
+        _, vals, _, origin = self.scr_reg.match_template_in_region_tracked('compass', 'compass', thresh, x3=True)
+        self.assertEqual(origin, (0, 0))
+        self.assertEqual(vals[3], full_vals[3])
+
+        # Moved a little, found in the window
+        self.draw(110, 55)
+        frame = self.scr_reg.capture_frame(['compass'])
+        _, vals, match, origin = self.scr_reg.match_template_in_region_tracked('compass', 'compass', thresh,
+                                                                              x3=True, frame=frame)
+        self.assertNotEqual(origin, (0, 0))
+        self.assertEqual(vals[3], (110, 55))
+        self.assertAlmostEqual(vals[1], 1.0, places=3)
+        self.assertLess(match.size, 100 * 100)
+
+        # Moved out of the window, so the whole region is searched again
+        self.draw(10, 200)
+        _, vals, _, origin = self.scr_reg.match_template_in_region_tracked('compass', 'compass', thresh, x3=True)
+        self.assertEqual(origin, (0, 0))
+        self.assertEqual(vals[3], (10, 200))
+
+        self.assertEqual(self.scr_reg.tracker.stats[('compass', 'compass')], {'hits': 1, 'misses': 1, 'full': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
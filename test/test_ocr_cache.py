@@ -0,0 +1,89 @@
+import time
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from OCR_Cache import OCR_Cache
+
+
+class TestOCRCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+    def fake_ocr(self, image):
+        self.calls += 1
+        return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], (f'TEXT {int(image.sum())}', 0.99)]]]
+
+    def test_identical_crops_hit(self):
+        cache = OCR_Cache(max_size=8)
+        img = np.full((20, 40, 3), 10, dtype=np.uint8)
+        r1 = cache.lookup(img, 'ocr', self.fake_ocr)
+        r2 = cache.lookup(img.copy(), 'ocr', self.fake_ocr)
+        self.assertEqual(r1, r2)
+        self.assertEqual(self.calls, 1)
+        # Different kind or pixels miss
+        cache.lookup(img, 'rec', self.fake_ocr)
+        img2 = img.copy()
+        img2[0, 0, 0] = 11
+        cache.lookup(img2, 'ocr', self.fake_ocr)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_result_is_a_copy(self):
+        cache = OCR_Cache(max_size=8)
+        img = np.zeros((10, 10), dtype=np.uint8)
+        r1 = cache.lookup(img, 'ocr', self.fake_ocr)
+        r1[0].clear()
+        self.assertTrue(cache.lookup(img, 'ocr', self.fake_ocr)[0])
+
+    def test_lru_and_ttl(self):
+        cache = OCR_Cache(max_size=2, ttl=0.05)
+        imgs = [np.full((5, 5), i, dtype=np.uint8) for i in range(3)]
+        for img in imgs:
+            cache.lookup(img, 'ocr', self.fake_ocr)
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.lookup(imgs[0], 'ocr', self.fake_ocr)  # Evicted
+        self.assertEqual(self.calls, 4)
+        time.sleep(0.06)
+        cache.lookup(imgs[0], 'ocr', self.fake_ocr)  # Expired
+        self.assertEqual(self.calls, 5)
+
+    def test_perceptual(self):
+        cache = OCR_Cache(max_size=8, mode='perceptual')
+        img = np.tile(np.arange(0, 200, 5, dtype=np.uint8), (20, 1))
+        noisy = img.copy()
+        noisy[5, 5] += 1
+        self.assertEqual(cache.key(img), cache.key(noisy))
+
+    def test_batch(self):
+        cache = OCR_Cache(max_size=8)
+        batches = []
+
+        def fake_batch(images):
+            batches.append(len(images))
+            return [f'TEXT {int(img.sum())}' for img in images]
+
+        imgs = [np.full((5, 5), i, dtype=np.uint8) for i in range(3)]
+        cache.lookup_batch(imgs[:1], 'rec', fake_batch)
+        # One call for the images not cached, the repeated image only once
+        results = cache.lookup_batch(imgs + [imgs[2].copy()], 'rec', fake_batch)
+        self.assertEqual(batches, [1, 2])
+        self.assertEqual(results, ['TEXT 0', 'TEXT 25', 'TEXT 50', 'TEXT 50'])
+
+    def test_disabled(self):
+        cache = OCR_Cache(max_size=0)
+        img = np.zeros((10, 10), dtype=np.uint8)
+        cache.lookup(img, 'ocr', self.fake_ocr)
+        cache.lookup(img, 'ocr', self.fake_ocr)
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
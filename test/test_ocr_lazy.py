@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+import threading
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from OCR import OCR
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = 0
+
+    def ocr(self, img, det=True, cls=False):
+        self.calls += 1
+        return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], ('TEXT', 0.9)]]]
+
+
+class TestOCRLazy(unittest.TestCase):
+
+    def setUp(self):
+        self.made = 0
+        self.states = []
+
+    def factory(self, language, use_gpu, rec_batch_size):
+        self.made += 1
+        return FakeEngine()
+
+    def failing_factory(self, language, use_gpu, rec_batch_size):
+        raise RuntimeError("no model")
+
+    def test_model_made_on_first_use(self):
+        ocr = OCR(None, engine_factory=self.factory)
+        ocr.on_state = self.states.append
+        self.assertEqual(self.made, 0)
+        self.assertFalse(ocr.is_ready())
+
+        img = np.zeros((10, 20, 3), dtype=np.uint8)
+        self.assertEqual(ocr.image_simple_ocr(img), ['TEXT'])
+        ocr.image_simple_ocr(img + 1)
+        self.assertEqual(self.made, 1)
+        self.assertTrue(ocr.is_ready())
+        self.assertEqual(self.states, ['loading', 'ready'])
+
+    def test_warm_up(self):
+        ocr = OCR(None, engine_factory=self.factory)
+        ready = threading.Event()
+        ocr.on_state = lambda state: state == 'ready' and ready.set()
+        ocr.warm_up()
+        self.assertTrue(ready.wait(5))
+        ocr._warm_up_thread.join(5)
+        self.assertEqual(self.made, 1)
+        self.assertEqual(ocr.paddleocr.calls, 1)
+        self.assertEqual(ocr.cache.stats()['size'], 0)
+
+    def test_error_state(self):
+        ocr = OCR(None, engine_factory=self.failing_factory)
+        ocr.on_state = self.states.append
+        ocr.warm_up()
+        ocr._warm_up_thread.join(5)
+        self.assertEqual(ocr.state, 'error')
+        self.assertEqual(self.states, ['loading', 'error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
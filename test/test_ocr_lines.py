@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from OCR_Lines import split_text_lines, rec_to_ocr_data
+
+
+def highlighted_row(lines: list[str]):
+    """ Dark text on an orange highlight, as a selected list item. """
+    img = np.zeros((10 + 30 * len(lines), 300, 3), dtype=np.uint8)
+    img[:] = (0, 128, 255)
+    for i, text in enumerate(lines):
+        cv2.putText(img, text, (8, 30 + 30 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (20, 20, 20), 2)
+    return img
+
+
+class TestOCRLines(unittest.TestCase):
+
+    def test_single_line_is_whole_image(self):
+        img = highlighted_row(['ROBIGO 1 A'])
+        self.assertEqual(split_text_lines(img), [(0, img.shape[0])])
+
+    def test_two_lines(self):
+        img = highlighted_row(['ROBIGO 1 A', '12.5 LY'])
+        lines = split_text_lines(img)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0][0], 0)
+        self.assertEqual(lines[1][1], img.shape[0])
+        # The split is between the lines of text
+        self.assertTrue(28 < lines[0][1] < 45)
+
+    def test_blank(self):
+        img = np.full((30, 100, 3), 200, dtype=np.uint8)
+        self.assertEqual(split_text_lines(img), [(0, 30)])
+
+    def test_ocr_data_format(self):
+        ocr_data, textlist = rec_to_ocr_data([(0, 20), (20, 40)], 100, [('ROBIGO', 0.98), ('', 0.0)])
+        self.assertEqual(textlist, ['ROBIGO'])
+        self.assertEqual(ocr_data[0][0][1], ('ROBIGO', 0.98))
+        self.assertEqual(ocr_data[0][0][0][2], [100.0, 20.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
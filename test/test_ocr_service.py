@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from OCR_Service import OCR_Service, ocr_textlist
+
+
+class FakeEngine:
+    """ Returns the image size and sum as the text. """
+    def ocr(self, img, det=True, cls=False):
+        text = f'{img.shape[1]}x{img.shape[0]} {int(img.sum())}'
+        if not det:
+            return [[(text, 0.9)]]
+        return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], (text, 0.9)]]]
+
+
+def fake_engine(language, use_gpu, rec_batch_size):
+    return FakeEngine()
+
+
+class TestOCRService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = OCR_Service(workers=2, engine_factory=fake_engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.shutdown()
+
+    def test_submit(self):
+        img = np.full((10, 20, 3), 2, dtype=np.uint8)
+        futures = [self.service.submit(img * i) for i in range(4)]
+        self.assertEqual([f.result(timeout=60) for f in futures],
+                         [[f'20x10 {1200 * i}'] for i in range(4)])
+
+    def test_rec_batch(self):
+        imgs = [np.full((8, 16), i, dtype=np.uint8) for i in range(3)]
+        result = self.service.submit_rec(imgs).result(timeout=60)
+        # Gray images are converted to BGR for the model
+        self.assertEqual(result, [(f'16x8 {128 * 3 * i}', 0.9) for i in range(3)])
+
+    def test_textlist(self):
+        self.assertIsNone(ocr_textlist([None]))
+        self.assertEqual(ocr_textlist([[[[0, 0], ('A', 0.9)], [[0, 0], ('B', 0.8)]]]), ['A', 'B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
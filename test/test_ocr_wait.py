@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from OCR import OCR
+
+
+class FakeScreen:
+    """ Returns the images in turn, then the last one. """
+    def __init__(self, images):
+        self.images = list(images)
+        self.grabs = 0
+
+    def get_screen_rect_pct(self, rect):
+        self.grabs += 1
+        return self.images.pop(0).copy() if len(self.images) > 1 else self.images[0].copy()
+
+    def screen_rect_to_abs(self, rect):
+        return [0, 0, 10, 10]
+
+
+class FakeEngine:
+    """ Reads the first pixel value as the text. """
+    def __init__(self):
+        self.calls = 0
+
+    def ocr(self, img, det=True, cls=False):
+        self.calls += 1
+        text = {1: 'LOADING', 2: 'CARTOGRAPHICS'}.get(int(img.flat[0]))
+        if text is None:
+            return [None]
+        return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], (text, 0.99)]]]
+
+
+class FakeAP:
+    debug_overlay = False
+
+
+def image(value):
+    return np.full((10, 10, 3), value, dtype=np.uint8)
+
+
+class TestOCRWait(unittest.TestCase):
+
+    def make_ocr(self, images):
+        self.engine = FakeEngine()
+        # No cache, so every OCR reaches the engine
+        return OCR(FakeScreen(images), cache_size=0, engine_factory=lambda *args: self.engine)
+
+    def test_wait_for_text_one_ocr_per_change(self):
+        ocr = self.make_ocr([image(1), image(1), image(1), image(2)])
+        found = ocr.wait_for_text(FakeAP(), ['GALAXY MAP', 'SYSTEM MAP', 'CARTOGRAPHICS'], {'rect': [0, 0, 1, 1]}, timeout=5)
+        self.assertTrue(found)
+        self.assertEqual(ocr.screen.grabs, 4)
+        # Once for the first image and once when it changed, for all three texts
+        self.assertEqual(self.engine.calls, 2)
+
+    def test_wait_for_text_timeout(self):
+        ocr = self.make_ocr([image(1)])
+        self.assertFalse(ocr.wait_for_text(FakeAP(), ['CARTOGRAPHICS'], {'rect': [0, 0, 1, 1]}, timeout=0.6))
+        self.assertGreater(ocr.screen.grabs, 1)
+        self.assertEqual(self.engine.calls, 1)
+
+    def test_wait_for_any_text(self):
+        ocr = self.make_ocr([image(0), image(0), image(1)])
+        self.assertTrue(ocr.wait_for_any_text(FakeAP(), {'rect': [0, 0, 1, 1]}, timeout=5))
+        self.assertEqual(self.engine.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PerceptionFrame import PerceptionFrame
+
+
+class TestPerceptionFrame(unittest.TestCase):
+
+    def setUp(self):
+        self.ap = MagicMock()
+        self.ap.get_nav_offset.return_value = {'yaw': 1.0, 'pit': 2.0, 'roll': 0.0}
+        self.ap.get_destination_offset.return_value = {'x': 3.0, 'y': 4.0}
+        self.ap.is_destination_occluded.return_value = False
+        self.scr_reg = MagicMock()
+
+    def test_one_grab_one_compass_match(self):
+        self.ap.have_destination.return_value = True
+        pf = PerceptionFrame.capture(self.ap, self.scr_reg, disengage=True)
+
+        self.scr_reg.capture_frame.assert_called_once_with(['compass', 'target', 'target_occluded', 'disengage'])
+        self.ap.match_compass.assert_called_once()
+        compass_match = self.ap.match_compass.return_value
+        self.ap.have_destination.assert_called_once_with(self.scr_reg, pf.frame, compass_match)
+        self.ap.get_nav_offset.assert_called_once_with(self.scr_reg, pf.frame, compass_match)
+
+        self.assertTrue(pf.compass_found)
+        self.assertEqual(pf.nav_offset['pit'], 2.0)
+        self.assertEqual(pf.target_offset['x'], 3.0)
+        self.assertEqual(set(pf.timings), {'capture', 'compass', 'nav', 'target', 'occluded', 'disengage', 'total'})
+
+    def test_no_compass(self):
+        self.ap.have_destination.return_value = False
+        pf = PerceptionFrame.capture(self.ap, self.scr_reg, occlusion=False)
+
+        self.scr_reg.capture_frame.assert_called_once_with(['compass', 'target'])
+        self.ap.get_nav_offset.assert_not_called()
+        self.ap.is_destination_occluded.assert_not_called()
+        self.assertIsNone(pf.nav_offset)
+        self.assertFalse(pf.occluded)
+
+
+if __name__ == '__main__':
+    unittest.main()
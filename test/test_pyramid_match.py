@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+import cv2
+from numpy import array
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Screen_Regions import match_template_pyramid
+
+TEST_DIR = os.path.dirname(__file__)
+TEMPLATE_DIR = os.path.join(TEST_DIR, '..', 'templates')
+
+
+def load_template(file_name, scale):
+    templ = cv2.imread(os.path.join(TEMPLATE_DIR, file_name), cv2.IMREAD_GRAYSCALE)
+    return cv2.resize(templ, (0, 0), fx=scale, fy=scale)
+
+
+class TestPyramidMatch(unittest.TestCase):
+    """ The pyramid match must give the same result as the full resolution match on real screenshots. """
+
+    def assert_same_as_full(self, image, templ, threshold):
+        full = cv2.minMaxLoc(cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED))
+        for level in [1, 2]:
+            (minVal, maxVal, minLoc, maxLoc), match = match_template_pyramid(image, templ, level)
+            self.assertEqual(maxVal >= threshold, full[1] >= threshold, f'level {level}')
+            if full[1] >= threshold:
+                # Where there is no match, the location of the best (noise) value is not meaningful
+                self.assertEqual(maxLoc, full[3], f'level {level}')
+                self.assertAlmostEqual(maxVal, full[1], places=4, msg=f'level {level}')
+
+    def test_target(self):
+        # Screenshots are saved in BGR, the target filter ranges are for the swapped colour order
+        image = cv2.imread(os.path.join(TEST_DIR, 'target', 'Screenshot 2024-07-04 23-22-02.png'))
+        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        target_thresh = 0.54
+
+        filtered = cv2.inRange(hsv, array([16, 165, 220]), array([98, 255, 255]))
+        self.assert_same_as_full(filtered, load_template('destination.png', 0.99), target_thresh)
+        self.assert_same_as_full(filtered, load_template('destination.png', 1.2), target_thresh)
+
+        occluded = cv2.inRange(hsv, array([16, 31, 85]), array([26, 160, 212]))
+        self.assert_same_as_full(occluded, load_template('target_occluded.png', 0.99), 0.40)
+
+    def test_compass(self):
+        image = cv2.imread(os.path.join(TEST_DIR, 'compass', 'Screenshot 2024-07-04 20-01-49.png'))
+        h, s, v = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))
+        self.assert_same_as_full(v, load_template('compass.png', 1.01), 0.35)
+
+    def test_small_template_falls_back(self):
+        image = cv2.imread(os.path.join(TEST_DIR, 'compass', 'Screenshot 2024-07-04 20-01-49.png'),
+                           cv2.IMREAD_GRAYSCALE)
+        templ = load_template('navpoint.png', 0.5)
+        full = cv2.minMaxLoc(cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED))
+        vals, match = match_template_pyramid(image, templ, 2)
+        self.assertEqual(vals[3], full[3])
+        self.assertEqual(match.shape, (image.shape[0] - templ.shape[0] + 1, image.shape[1] - templ.shape[1] + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Rate_Learner import Rate_Learner, angle_diff
+
+
+class TestRateLearner(unittest.TestCase):
+
+    def test_angle_diff(self):
+        self.assertEqual(angle_diff(170.0, -170.0), -20.0)
+        self.assertEqual(angle_diff(-10.0, 10.0), -20.0)
+
+    def test_learns_rate(self):
+        learner = Rate_Learner(80.0, 33.0, 8.0)
+        # The ship actually pitches at about 25 deg/s, so a 33 deg/s hold undershoots
+        for before, after in [(20.0, 4.9), (-30.0, -7.3), (15.0, 3.5), (25.0, 6.2)]:
+            commanded = abs(before)
+            self.assertTrue(learner.observe('pitch', commanded, commanded / 33.0, before, after))
+
+        self.assertTrue(learner.changed('pitch'))
+        self.assertAlmostEqual(learner.rate('pitch'), 25.0, delta=0.5)
+        self.assertEqual(learner.stats()['pitch']['count'], 4)
+        # Nothing learned, so the configured rate
+        self.assertEqual(learner.rate('yaw'), 8.0)
+        self.assertFalse(learner.changed('yaw'))
+
+    def test_needs_confidence(self):
+        learner = Rate_Learner(80.0, 33.0, 8.0)
+        learner.observe('roll', 90.0, 1.0, 90.0, 10.0)
+        learner.observe('roll', 90.0, 1.0, 90.0, 60.0)
+        # Too few and too scattered
+        learner.observe('roll', 90.0, 1.0, 90.0, 0.0)
+        self.assertEqual(learner.rate('roll'), 80.0)
+
+    def test_rejects_bad_measurement(self):
+        learner = Rate_Learner(80.0, 33.0, 8.0)
+        # Moved far more than commanded, i.e. a bad compass match
+        self.assertFalse(learner.observe('yaw', 5.0, 0.6, 5.0, -60.0))
+        self.assertEqual(learner.stats()['yaw']['count'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+import sys
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Screen_Capture import ImageSequenceCapture, VideoCapture, FrameRingBuffer, CaptureThread
+from Screen import Screen
+
+
+class TestScreenCapture(unittest.TestCase):
+
+    def setUp(self):
+        # Three 64x48 frames, each filled with its frame number
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for i in range(3):
+            image = np.full((48, 64, 3), i * 10, dtype=np.uint8)
+            cv2.imwrite(os.path.join(self.tmp_dir.name, f'frame_{i:03d}.png'), image)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_image_sequence_fast_playback(self):
+        """ Every frame is visited in order with timestamps from the fps. """
+        src = ImageSequenceCapture(self.tmp_dir.name, fps=10.0)
+        seen = []
+        for index, timestamp in src.frames():
+            image = src.grab(0, 0, 8, 8)
+            self.assertEqual(image.shape, (8, 8, 4))
+            seen.append((index, round(timestamp, 3), int(image[0, 0, 0])))
+
+        self.assertEqual(seen, [(0, 0.0, 0), (1, 0.1, 10), (2, 0.2, 20)])
+        self.assertTrue(src.eof)
+
+    def test_image_sequence_realtime_frame_selection(self):
+        src = ImageSequenceCapture(self.tmp_dir.name, timestamps=[0.0, 0.5, 1.0], realtime=True)
+        self.assertEqual(src._frame_at_time(0.2), 0)
+        self.assertEqual(src._frame_at_time(0.7), 1)
+        self.assertEqual(src._frame_at_time(1.01), 2)
+        self.assertEqual(src._frame_at_time(5.0), 3)  # Past the end
+
+    def test_screen_with_replay_source(self):
+        """ Screen uses the replay frame size as the screen size and grabs from it. """
+        src = ImageSequenceCapture(self.tmp_dir.name)
+        scr = Screen(cb=None, capture=src)
+        self.assertEqual((scr.screen_width, scr.screen_height), (64, 48))
+
+        src.next_frame()
+        image = scr.get_screen(10, 10, 20, 30, rgb=False)
+        self.assertEqual(image.shape, (20, 10, 4))
+        self.assertEqual(int(image[0, 0, 0]), 10)
+
+    def test_screen_replay_end(self):
+        """ Past the end the last frame is held, a source with no frames raises EOFError. """
+        src = ImageSequenceCapture(self.tmp_dir.name)
+        scr = Screen(cb=None, capture=src)
+        for _ in range(5):
+            src.next_frame()
+        self.assertTrue(src.eof)
+        self.assertEqual(int(scr.get_screen(0, 0, 8, 8, rgb=False)[0, 0, 0]), 20)
+
+        empty = tempfile.TemporaryDirectory()
+        try:
+            src = ImageSequenceCapture(empty.name)
+            with self.assertRaises(EOFError):
+                src.grab(0, 0, 8, 8)
+        finally:
+            empty.cleanup()
+
+    def test_video_playback(self):
+        file_name = os.path.join(self.tmp_dir.name, 'test.avi')
+        writer = cv2.VideoWriter(file_name, cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (64, 48))
+        if not writer.isOpened():
+            self.skipTest("No video encoder available")
+        for i in range(5):
+            writer.write(np.full((48, 64, 3), i * 50, dtype=np.uint8))
+        writer.release()
+
+        src = VideoCapture(file_name)
+        frames = [(index, int(src.grab(0, 0, 4, 4)[0, 0, 0])) for index, timestamp in src.frames()]
+        src.close()
+
+        self.assertEqual([f[0] for f in frames], [0, 1, 2, 3, 4])
+        # MJPG is lossy, so allow a little difference in the pixel values
+        for index, value in frames:
+            self.assertAlmostEqual(value, index * 50, delta=3)
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+
+    def test_latest_and_wrap(self):
+        ring = FrameRingBuffer(3, (4, 4, 4), left=100, top=50)
+        self.assertIsNone(ring.latest())
+        for i in range(5):
+            ring.put(np.full((4, 4, 4), i, dtype=np.uint8), timestamp=float(i))
+
+        frame = ring.latest()
+        self.assertEqual(frame.timestamp, 4.0)
+        self.assertEqual(int(frame.image[0, 0, 0]), 4)
+        self.assertEqual(ring.count, 5)
+
+        # Crop within the frame uses monitor coordinates
+        frame = ring.latest([101, 51, 103, 54])
+        self.assertEqual(frame.image.shape, (3, 2, 4))
+        self.assertEqual((frame.left, frame.top), (101, 51))
+        # Outside of the frame
+        self.assertIsNone(ring.latest([0, 0, 2, 2]))
+
+    def test_wait_for_newer_timeout(self):
+        ring = FrameRingBuffer(2, (2, 2, 4))
+        ring.put(np.zeros((2, 2, 4), dtype=np.uint8), timestamp=1.0)
+        self.assertIsNone(ring.wait_for_newer(1.0, timeout=0.05))
+        self.assertIsNotNone(ring.wait_for_newer(0.5, timeout=0.05))
+
+    def test_capture_thread(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cv2.imwrite(os.path.join(tmp_dir, 'frame.png'), np.full((48, 64, 3), 7, dtype=np.uint8))
+            src = ImageSequenceCapture(tmp_dir)
+
+            thread = CaptureThread(lambda: src, [8, 8, 40, 40], buffer_size=2, fps=200)
+            thread.start()
+            try:
+                frame = thread.wait_for_newer(-1.0, timeout=2.0)
+                self.assertIsNotNone(frame)
+                self.assertEqual(frame.image.shape, (32, 32, 4))
+                self.assertEqual(int(frame.image[0, 0, 0]), 7)
+            finally:
+                thread.stop()
+            self.assertFalse(thread.is_running())
+
+
+if __name__ == '__main__':
+    unittest.main()
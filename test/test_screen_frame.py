@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Screen_Frame import Screen_Frame, union_rect
+from Screen_Regions import Screen_Regions
+
+
+class FakeScreen:
+    """ Returns crops of a fixed BGRA desktop image, counting the grabs. """
+    def __init__(self, width=1920, height=1080):
+        self.screen_width = width
+        self.screen_height = height
+        rng = np.random.default_rng(1)
+        self.desktop = rng.integers(0, 255, (height, width, 4), dtype=np.uint8)
+        self.grabs = 0
+        self.last_timestamp = 0.0
+
+    def get_screen(self, x_left, y_top, x_right, y_bot, rgb=True):
+        self.grabs += 1
+        self.last_timestamp += 1.0
+        image = self.desktop[y_top:y_bot, x_left:x_right].copy()
+        if rgb:
+            image = image[:, :, 2::-1].copy()
+        return image
+
+    def get_screen_region(self, reg, rgb=True):
+        return self.get_screen(int(reg[0]), int(reg[1]), int(reg[2]), int(reg[3]), rgb)
+
+
+class TestScreenFrame(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = FakeScreen()
+        self.scr_reg = Screen_Regions(self.screen, MagicMock())
+
+    def test_union_rect(self):
+        self.assertEqual(union_rect([[10, 20, 30, 40], [5, 25, 35, 38]]), [5, 20, 35, 40])
+
+    def test_region_view_matches_direct_grab(self):
+        """ A region taken from the frame is identical to grabbing the region directly. """
+        frame = self.scr_reg.capture_frame(['compass', 'target', 'target_occluded'])
+        self.assertEqual(self.screen.grabs, 1)
+
+        for name in ['compass', 'target', 'target_occluded']:
+            rect = self.scr_reg.reg[name]['rect']
+            self.assertTrue(frame.contains(rect))
+            np.testing.assert_array_equal(frame.get_region(rect, rgb=False), self.screen.get_screen_region(rect, rgb=False))
+            np.testing.assert_array_equal(frame.get_region(rect, rgb=True), self.screen.get_screen_region(rect, rgb=True))
+
+    def test_region_is_a_view(self):
+        frame = self.scr_reg.capture_frame(['compass', 'target'])
+        view = frame.get_region(self.scr_reg.reg['compass']['rect'], rgb=False)
+        self.assertTrue(np.shares_memory(view, frame.image))
+
+    def test_capture_uses_frame(self):
+        """ Capturing a region with a frame does not grab the screen again. """
+        frame = self.scr_reg.capture_frame(['compass', 'target'])
+        self.scr_reg.capture_region_filtered(self.screen, 'target', frame=frame)
+        self.scr_reg.capture_region_filtered(self.screen, 'compass', frame=frame)
+        self.assertEqual(self.screen.grabs, 1)
+
+        # A region outside the frame falls back to grabbing the screen
+        small = Screen_Frame(np.zeros((10, 10, 4), dtype=np.uint8))
+        self.scr_reg.capture_region(self.screen, 'target', frame=small)
+        self.assertEqual(self.screen.grabs, 2)
+
+    def test_conversion_is_cached(self):
+        frame = self.scr_reg.capture_frame(['compass'])
+        rect = self.scr_reg.reg['compass']['rect']
+        hsv = frame.get_region_as(rect, 'HSV')
+        self.assertIs(frame.get_region_as(rect, 'HSV'), hsv)
+        self.assertEqual(hsv.shape[2], 3)
+
+    def test_filtered_matches_legacy(self):
+        """ Filtering from the frame gives the same result as the legacy grab and convert. """
+        frame = self.scr_reg.capture_frame(['sun', 'target', 'disengage'])
+        for name in ['sun', 'target', 'disengage']:
+            for inv_col in [True, False]:
+                expected = self.scr_reg.capture_region_filtered(self.screen, name, inv_col)
+                actual = self.scr_reg.capture_region_filtered(self.screen, name, inv_col, frame=frame)
+                np.testing.assert_array_equal(actual, expected, err_msg=f'{name} inv_col={inv_col}')
+
+
+if __name__ == '__main__':
+    unittest.main()
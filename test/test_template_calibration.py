@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Template_Calibration import Template_Calibration, scale_range
+
+
+class FakeTemplates:
+    """ Serves a single synthetic template at any scale. """
+    def __init__(self, image):
+        self.image = image
+
+    def load_scaled_template(self, templ_name, scaleX, scaleY, compass_scale):
+        templ = cv2.resize(self.image, (0, 0), fx=scaleX, fy=scaleY)
+        width, height = templ.shape[::-1]
+        return {'image': templ, 'width': width, 'height': height}
+
+
+class TestTemplateCalibration(unittest.TestCase):
+
+    def test_scale_range(self):
+        self.assertEqual(scale_range(30, 33, 1), [30, 31, 32, 33])
+        scales = scale_range(95, 105, 0.1)
+        self.assertEqual(len(scales), 101)
+        self.assertEqual(scales[-1], 105.0)
+
+    def test_finds_scale(self):
+        # A ring template, drawn into the region at 80% scale
+        templ = np.zeros((100, 100), dtype=np.uint8)
+        cv2.circle(templ, (50, 50), 40, 255, 6)
+        cv2.line(templ, (50, 10), (50, 50), 255, 4)
+        scaled = cv2.resize(templ, (0, 0), fx=0.8, fy=0.8)
+
+        region = np.zeros((150, 200, 3), dtype=np.uint8)
+        region[30:30 + scaled.shape[0], 60:60 + scaled.shape[1], 2] = scaled  # In the V channel of HSV
+
+        cal = Template_Calibration(FakeTemplates(templ), max_workers=4)
+        result = cal.calibrate_coarse_fine([region], 'compass', 0.5, range_low=50, range_high=120)
+
+        self.assertAlmostEqual(result.scale, 80, delta=1)
+        self.assertGreater(result.max_val, 0.9)
+        self.assertEqual(result.max_loc, (60, 30))
+        # Curve covers the coarse and fine scales, in order
+        self.assertEqual([sc for sc, val in result.curve], sorted(sc for sc, val in result.curve))
+        self.assertGreater(len(result.curve), 71)
+
+    def test_no_match(self):
+        templ = np.zeros((20, 20), dtype=np.uint8)
+        cv2.circle(templ, (10, 10), 6, 255, 2)
+        cal = Template_Calibration(FakeTemplates(templ))
+        result = cal.calibrate([np.zeros((40, 40, 3), dtype=np.uint8)], 'compass', scale_range(50, 300, 50), 0.5)
+        self.assertEqual(result.scale, 0)
+        self.assertEqual(len(result.curve), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
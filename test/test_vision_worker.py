@@ -0,0 +1,57 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Vision_Worker import Vision_Worker
+
+
+class TestVisionWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.ap = MagicMock()
+        self.ap.have_destination.return_value = True
+        self.ap.get_nav_offset.return_value = {'yaw': 1.0, 'pit': 2.0, 'roll': 0.0}
+        self.scr_reg = MagicMock()
+        self.scr_reg.capture_frame.side_effect = lambda regions: MagicMock(timestamp=time.time())
+        self.worker = Vision_Worker(self.ap, self.scr_reg, rate=50.0, idle_timeout=0.2)
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def test_new_samples(self):
+        pf1 = self.worker.wait_for_new(0, timeout=2.0)
+        self.assertIsNotNone(pf1)
+        self.assertEqual(pf1.nav_offset['pit'], 2.0)
+        pf2 = self.worker.wait_for_new(pf1.seq, timeout=2.0)
+        self.assertIsNotNone(pf2)
+        self.assertGreater(pf2.seq, pf1.seq)
+
+    def test_captured_after(self):
+        pf1 = self.worker.wait_for_new(0, timeout=2.0)
+        released = time.time() + 0.1
+        pf2 = self.worker.wait_for_new(pf1.seq, timeout=2.0, captured_after=released)
+        self.assertIsNotNone(pf2)
+        self.assertGreaterEqual(pf2.timestamp, released)
+
+    def test_idle(self):
+        pf = self.worker.wait_for_new(0, timeout=2.0)
+        self.assertIsNotNone(pf)
+        # No requests, so the worker stops measuring
+        time.sleep(0.4)
+        calls = self.scr_reg.capture_frame.call_count
+        time.sleep(0.2)
+        self.assertEqual(self.scr_reg.capture_frame.call_count, calls)
+        # The old sample is stale, a new one is measured on request
+        pf2 = self.worker.wait_for_new(0, timeout=2.0)
+        self.assertIsNotNone(pf2)
+        self.assertGreater(pf2.seq, pf.seq)
+
+
+if __name__ == '__main__':
+    unittest.main()